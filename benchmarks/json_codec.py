@@ -0,0 +1,129 @@
+"""Benchmark the harness JSON codec against stdlib json.
+
+Builds a synthetic TRAPI message the size of a big merged ARS response and
+times decoding it, encoding it for a request and pretty printing it for the
+logs.
+
+    python -m benchmarks.json_codec --results 500 --edges 20000
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict
+
+from test_harness import json_codec
+
+
+def make_message(num_results: int, num_nodes: int, num_edges: int) -> Dict[str, Any]:
+    """TRAPI response with attribute heavy nodes and edges."""
+    rng = random.Random(0)
+    nodes = {
+        f"NODE:{idx}": {
+            "name": f"node {idx}",
+            "categories": ["biolink:NamedThing", "biolink:ChemicalEntity"],
+            "attributes": [
+                {
+                    "attribute_type_id": "biolink:same_as",
+                    "value": [f"ALIAS:{idx}-{alias}" for alias in range(5)],
+                }
+            ],
+        }
+        for idx in range(num_nodes)
+    }
+    edges = {
+        f"edge-{idx}": {
+            "subject": f"NODE:{rng.randrange(num_nodes)}",
+            "object": f"NODE:{rng.randrange(num_nodes)}",
+            "predicate": "biolink:related_to",
+            "sources": [
+                {
+                    "resource_id": "infores:aragorn",
+                    "resource_role": "primary_knowledge_source",
+                }
+            ],
+            "attributes": [
+                {
+                    "attribute_type_id": "biolink:publications",
+                    "value": [f"PMID:{rng.randrange(10**8)}" for _ in range(3)],
+                },
+                {"attribute_type_id": "biolink:score", "value": rng.random()},
+            ],
+        }
+        for idx in range(num_edges)
+    }
+    results = [
+        {
+            "node_bindings": {
+                "sn": [{"id": "MONDO:0005148", "attributes": []}],
+                "on": [{"id": f"NODE:{rng.randrange(num_nodes)}", "attributes": []}],
+            },
+            "analyses": [
+                {
+                    "resource_id": "infores:aragorn",
+                    "score": rng.random(),
+                    "edge_bindings": {
+                        "t_edge": [
+                            {"id": f"edge-{rng.randrange(num_edges)}", "attributes": []}
+                            for _ in range(10)
+                        ]
+                    },
+                }
+            ],
+        }
+        for _ in range(num_results)
+    ]
+    return {
+        "message": {
+            "query_graph": {"nodes": {}, "edges": {}},
+            "knowledge_graph": {"nodes": nodes, "edges": edges},
+            "results": results,
+        }
+    }
+
+
+def best_of(fn: Callable, repeat: int) -> float:
+    """Fastest of ``repeat`` runs, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--results", type=int, default=500)
+    parser.add_argument("--nodes", type=int, default=5000)
+    parser.add_argument("--edges", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    message = make_message(args.results, args.nodes, args.edges)
+    content = json.dumps(message).encode()
+    print(f"{len(content) / 1024 / 1024:.1f} MiB message, codec: {json_codec.BACKEND}")
+    cases = {
+        "decode": (lambda: json.loads(content), lambda: json_codec.loads(content)),
+        "encode": (
+            lambda: json.dumps(message).encode(),
+            lambda: json_codec.dumps_bytes(message),
+        ),
+        "encode, indented": (
+            lambda: json.dumps(message, indent=4),
+            lambda: json_codec.dumps(message, indent=4),
+        ),
+    }
+    print(f"{'':<20}{'stdlib':>10}{'codec':>10}{'speedup':>10}")
+    for name, (stdlib, codec) in cases.items():
+        stdlib_time = best_of(stdlib, args.repeat)
+        codec_time = best_of(codec, args.repeat)
+        print(
+            f"{name:<20}{stdlib_time:>9.3f}s{codec_time:>9.3f}s"
+            f"{stdlib_time / codec_time:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
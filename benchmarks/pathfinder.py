@@ -0,0 +1,118 @@
+"""Benchmark the Pathfinder pass fail analysis on large synthetic responses.
+
+Builds a response with ``--results`` results whose analyses bind
+``--paths`` auxiliary graphs of ``--edges`` edges each, and times the
+indexed analysis of the top result and of all results against a reference
+that rescans every expected path node group for every edge.
+
+    python -m benchmarks.pathfinder --results 50 --paths 200 --edges 20
+"""
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from test_harness.pathfinder_test_runner import pathfinder_pass_fail_analysis
+from test_harness.utils import AgentStatus, PathfinderReport
+
+NUM_NODES = 5000
+
+
+def make_message(
+    num_results: int, num_paths: int, num_edges: int, path_nodes: List[List[str]]
+) -> Dict[str, Any]:
+    """Pathfinder TRAPI message with every result binding its own paths."""
+    rng = random.Random(0)
+    nodes = [f"NODE:{idx}" for idx in range(NUM_NODES)]
+    # sprinkle in the expected path nodes
+    nodes += [curie for node_curies in path_nodes for curie in node_curies]
+    edges = {}
+    auxiliary_graphs = {}
+    results = []
+    for result in range(num_results):
+        path_ids = []
+        for path in range(num_paths):
+            path_id = f"path-{result}-{path}"
+            edge_ids = []
+            for edge in range(num_edges):
+                edge_id = f"{path_id}-{edge}"
+                edges[edge_id] = {
+                    "subject": rng.choice(nodes),
+                    "object": rng.choice(nodes),
+                }
+                edge_ids.append(edge_id)
+            auxiliary_graphs[path_id] = {"edges": edge_ids}
+            path_ids.append(path_id)
+        results.append(
+            {
+                "analyses": [
+                    {"path_bindings": {"p0": [{"id": path_id} for path_id in path_ids]}}
+                ]
+            }
+        )
+    return {
+        "results": results,
+        "auxiliary_graphs": auxiliary_graphs,
+        "knowledge_graph": {"edges": edges},
+    }
+
+
+def rescan_matches(message: Dict[str, Any], path_nodes: List[List[str]]) -> int:
+    """Reference matching of every path, rescanning the groups for every edge."""
+    matched = 0
+    for result in message["results"]:
+        for analysis in result["analyses"]:
+            for path_bindings in analysis["path_bindings"].values():
+                for path_binding in path_bindings:
+                    matching_path_nodes = set()
+                    path_id = path_binding["id"]
+                    for edge_id in message["auxiliary_graphs"][path_id]["edges"]:
+                        edge = message["knowledge_graph"]["edges"][edge_id]
+                        for node_curies in path_nodes:
+                            if any(c in matching_path_nodes for c in node_curies):
+                                continue
+                            if edge["subject"] in node_curies:
+                                matching_path_nodes.add(edge["subject"])
+                            if edge["object"] in node_curies:
+                                matching_path_nodes.add(edge["object"])
+                    matched += len(matching_path_nodes) > 0
+    return matched
+
+
+def timed(fn, *args, **kwargs) -> float:
+    start_time = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--results", type=int, default=50)
+    parser.add_argument("--paths", type=int, default=200)
+    parser.add_argument("--edges", type=int, default=20)
+    parser.add_argument("--groups", type=int, default=4)
+    parser.add_argument("--group_size", type=int, default=50)
+    args = parser.parse_args()
+
+    path_nodes = [
+        [f"EXPECTED:{group}-{idx}" for idx in range(args.group_size)]
+        for group in range(args.groups)
+    ]
+    message = make_message(args.results, args.paths, args.edges, path_nodes)
+
+    def analyze(all_results: bool):
+        report = {"ara": PathfinderReport(AgentStatus.SKIPPED, None, None)}
+        pathfinder_pass_fail_analysis(
+            report, "ara", message, path_nodes, 2, all_results=all_results
+        )
+
+    print(
+        f"{'rescan, all results':<24}{timed(rescan_matches, message, path_nodes):>8.3f}s"
+    )
+    print(f"{'indexed, top result':<24}{timed(analyze, False):>8.3f}s")
+    print(f"{'indexed, all results':<24}{timed(analyze, True):>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Benchmark the threaded and asyncio Query Runner engines.
+
+Runs the same synthetic test case through QueryRunner and AsyncQueryRunner
+against local stand-in ARS and NodeNorm servers, where every ARA child takes
+``--ara_latency`` seconds to finish.
+
+    python -m benchmarks.query_runners --assets 20 --aras 8
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from urllib.parse import urlparse
+
+from translator_testing_model.datamodel.pydanticmodel import TestCase
+
+from test_harness import utils
+from test_harness.runner import ars_lifecycle, query_runner
+from test_harness.runner.async_query_runner import AsyncQueryRunner
+from test_harness.runner.query_runner import QueryRunner
+from test_harness.runner.rate_limit import RATE_LIMITS, RateLimit
+
+TEST_ENV = "ci"
+
+
+class StandInARS(BaseHTTPRequestHandler):
+    """Just enough of the ARS (and NodeNorm) api for the Query Runner."""
+
+    ara_latency = 1.0
+    aras = 4
+    # pk -> (submitted at, child pks)
+    queries = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body):
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or "{}")
+        path = urlparse(self.path).path
+        if path == "/get_normalized_nodes":
+            self._send({curie: None for curie in body["curies"]})
+        elif path == "/ars/api/submit":
+            pk = str(uuid.uuid4())
+            with self.lock:
+                self.queries[pk] = (
+                    time.monotonic(),
+                    [f"{pk}-{ara}" for ara in range(self.aras)],
+                )
+            self._send({"pk": pk})
+        else:
+            self._send({"success": True})
+
+    def do_GET(self):
+        pk = urlparse(self.path).path.rsplit("/", 1)[-1]
+        if pk.endswith("-merged"):
+            self._send({"fields": {"status": "Done", "code": 200, "data": {}}})
+            return
+        parent_pk = pk if pk in self.queries else pk.rsplit("-", 1)[0]
+        submitted_at, children = self.queries[parent_pk]
+        done = time.monotonic() - submitted_at >= self.ara_latency
+        if pk == parent_pk:
+            self._send(
+                {
+                    "status": "Done" if done else "Running",
+                    "merged_version": f"{parent_pk}-merged",
+                    "children": [
+                        {
+                            "message": child,
+                            "actor": {"inforesid": f"infores:ara-{child[-1]}"},
+                        }
+                        for child in children
+                    ],
+                }
+            )
+        else:
+            self._send(
+                {
+                    "fields": {
+                        "status": "Done" if done else "Running",
+                        "code": 200,
+                        "data": {"message": {"results": []}},
+                    }
+                }
+            )
+
+
+class StandInServer(ThreadingHTTPServer):
+    # the default backlog of 5 drops the connections of concurrent polls
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def serve(ara_latency: float, aras: int, ports: multiprocessing.Queue):
+    """Run the stand-in servers, in their own process so they don't compete
+    with the engine under test for the GIL."""
+    StandInARS.ara_latency = ara_latency
+    StandInARS.aras = aras
+    server = StandInServer(("127.0.0.1", 0), StandInARS)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def make_test_case(num_assets: int) -> TestCase:
+    """Acceptance test case with ``num_assets`` distinct queries."""
+    return TestCase.model_validate(
+        {
+            "id": "Benchmark",
+            "test_env": TEST_ENV,
+            "components": ["ars"],
+            "test_case_objective": "AcceptanceTest",
+            "test_case_input_id": "MONDO:0000001",
+            "test_assets": [
+                {
+                    "id": f"Asset_{i}",
+                    "input_id": f"MONDO:{i:07d}",
+                    "input_category": "biolink:Disease",
+                    "predicate_id": "biolink:treats",
+                    "output_id": "DRUGBANK:DB00313",
+                    "expected_output": "TopAnswer",
+                    "test_runner_settings": ["inferred"],
+                }
+                for i in range(num_assets)
+            ],
+        }
+    )
+
+
+def run_engine(runner_class, base_url: str, num_assets: int) -> Tuple[float, int]:
+    """Seconds it takes an engine to run the benchmark test case, and the
+    number of threads it left running."""
+    runner = runner_class(logging.getLogger("benchmark"))
+    runner.registry = {
+        query_runner.env_map[TEST_ENV]: {
+            "ars": [
+                {
+                    "_id": "ars",
+                    "title": "ARS",
+                    "infores": "infores:ars",
+                    "url": base_url,
+                }
+            ]
+        }
+    }
+    start_time = time.time()
+    queries, _ = runner.run_queries(make_test_case(num_assets))
+    duration = time.time() - start_time
+    threads = threading.active_count()
+    runner.close()
+    assert all(query["pks"].get("ars") for query in queries.values())
+    return duration, threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=20)
+    parser.add_argument("--aras", type=int, default=8)
+    parser.add_argument("--ara_latency", type=float, default=1.0)
+    parser.add_argument("--poll_interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve, args=(args.ara_latency, args.aras, ports), daemon=True
+    )
+    server.start()
+    base_url = f"http://127.0.0.1:{ports.get()}"
+
+    # measure the engines, not the politeness settings
+    ars_lifecycle.POLL_INTERVAL = args.poll_interval
+    ars_lifecycle.ARS_TRACE_DELAY = args.poll_interval
+    utils.NODE_NORM_URL[TEST_ENV] = base_url
+    RATE_LIMITS[TEST_ENV] = RateLimit(rate=10_000, burst=10_000, max_in_flight=1024)
+
+    for runner_class in (QueryRunner, AsyncQueryRunner):
+        duration, threads = run_engine(runner_class, base_url, args.assets)
+        print(f"{runner_class.__name__:<20}{duration:>8.2f}s{threads:>6} threads")
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
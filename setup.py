@@ -18,7 +18,7 @@ setup(
     include_package_data=True,
     zip_safe=False,
     license="MIT",
-    python_requires=">=3.9",
+    python_requires=">=3.11",
     entry_points={
         "console_scripts": [
             "test-harness = test_harness.main:cli",
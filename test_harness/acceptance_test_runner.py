@@ -1,8 +1,120 @@
 """Acceptance Test Pass Fail Analysis Runner."""
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
-from test_harness.utils import AgentReport, AgentStatus
+from test_harness.curies import CurieTable
+from test_harness.utils import NO_OUTPUT, ActualOutput, AgentReport, AgentStatus
+
+# Number of top results a TopAnswer has to be in.
+TOP_ANSWER_RESULTS = 30
+# Percentage of results an Acceptable answer has to be in the top of, and a
+# BadButForgivable one in the bottom of.
+ACCEPTABLE_PERCENTAGE = 50
+
+
+class ResultIndex:
+    """Single pass index of the results of one agent response.
+
+    Holds, for every bound curie, the first and last rank it's bound at, and
+    the scores of the last result binding it, so an agent response can be
+    analyzed for any number of test assets and expected outputs without
+    rescanning its results. Curies are held as their integers in the run's
+    ``curies`` table.
+    """
+
+    def __init__(
+        self, results: List[Dict[str, Any]], curies: Optional[CurieTable] = None
+    ):
+        self.curies = curies if curies is not None else CurieTable()
+        self.num_results = len(results)
+        # curie -> (first rank, last rank), ranks starting at 0
+        self.ranks: Dict[int, Tuple[int, int]] = {}
+        # curie -> scores of the last result binding it
+        self.outputs: Dict[int, ActualOutput] = {}
+        # curie -> error scoring a result binding it, see _index_outputs
+        self.errors: Dict[int, Exception] = {}
+        # error indexing the node bindings, raised on every analysis
+        self.error: Optional[Exception] = None
+        try:
+            self._index_ranks(results)
+        except Exception as e:
+            self.error = e
+            return
+        self._index_outputs(results)
+
+    def _index_ranks(self, results: List[Dict[str, Any]]):
+        for idx, res in enumerate(results):
+            for res_value in res["node_bindings"].values():
+                for val in res_value:
+                    ids = self.curies.intern(str(val["id"]))
+                    if ids in self.ranks:
+                        self.ranks[ids] = (self.ranks[ids][0], idx)
+                    else:
+                        self.ranks[ids] = (idx, idx)
+
+    @staticmethod
+    def _get_output(idx: int, res: Dict[str, Any]) -> ActualOutput:
+        ars_score = None
+        ars_rank = None
+        ara_score = None
+        ara_rank = None
+        if "sugeno" in res.keys() and "rank" in res.keys():
+            ars_score = res["sugeno"]
+            ars_rank = res["rank"]
+        else:
+            for anal in res["analyses"]:
+                if "score" in anal.keys():
+                    ara_score = anal["score"]
+            ara_rank = idx + 1
+        return ActualOutput(
+            ars_score=ars_score,
+            ars_rank=ars_rank,
+            ara_score=ara_score,
+            ara_rank=ara_rank,
+        )
+
+    def _index_outputs(self, results: List[Dict[str, Any]]):
+        """Score the last curie of each node binding.
+
+        A result that can't be scored only fails the analysis of the curies
+        it binds, once their earlier results have been scored.
+        """
+        for idx, res in enumerate(results):
+            output = None
+            error = None
+            for nb in res.get("node_bindings", {}).values():
+                the_id = None
+                for c in nb:
+                    the_id = c.get("id")
+                # only curies can be expected outputs
+                if not isinstance(the_id, str):
+                    continue
+                the_id = self.curies.intern(the_id)
+                if the_id in self.errors:
+                    continue
+                if output is None and error is None:
+                    try:
+                        output = self._get_output(idx, res)
+                    except Exception as e:
+                        error = e
+                if error is not None:
+                    self.errors[the_id] = error
+                else:
+                    self.outputs[the_id] = output
+
+    def in_window(self, curie: Optional[int], expect_output: str) -> bool:
+        """Whether a curie is bound in the results an expected output looks at."""
+        if curie not in self.ranks:
+            return False
+        first, last = self.ranks[curie]
+        half = int(self.num_results * (float(ACCEPTABLE_PERCENTAGE) / 100))
+        if expect_output == "TopAnswer":
+            return first < TOP_ANSWER_RESULTS
+        elif expect_output == "Acceptable":
+            return first < half
+        elif expect_output == "BadButForgivable":
+            return last >= half
+        return True
 
 
 def run_acceptance_pass_fail_analysis(
@@ -11,106 +123,61 @@ def run_acceptance_pass_fail_analysis(
     results: List[Dict[str, Any]],
     out_curie: str,
     expect_output: str,
+    index: Optional[ResultIndex] = None,
 ):
-    """Function to run pass fail analysis on individual results."""
-    # get the top_n result's ids
+    """Function to run pass fail analysis on individual results.
+
+    Pass the ``index`` of the results to reuse it across test assets.
+    """
     try:
-        all_ids = []
-        for res in results:
-            for res_node, res_value in res["node_bindings"].items():
-                for val in res_value:
-                    ids = str(val["id"])
-                    if ids not in all_ids:
-                        all_ids.append(ids)
-        if expect_output == "TopAnswer":
-            n_perc_res = results[0:30]
-        elif expect_output == "Acceptable":
-            n_perc_res = results[0 : int(len(results) * (float(50) / 100))]
-        elif expect_output == "BadButForgivable":
-            n_perc_res = results[int(len(results) * (float(50) / 100)) :]
-        elif expect_output == "NeverShow":
-            n_perc_res = results
-        else:
+        if index is None:
+            index = ResultIndex(results)
+        if index.error is not None:
+            raise index.error
+        if expect_output not in [
+            "TopAnswer",
+            "Acceptable",
+            "BadButForgivable",
+            "NeverShow",
+        ]:
             error_mesg = {
                 "error": "You have indicated a wrong category for expected output",
             }
             return error_mesg
-        n_perc_ids = []
-        for res in n_perc_res:
-            for res_value in res["node_bindings"].values():
-                for val in res_value:
-                    ids = str(val["id"])
-                    if ids not in n_perc_ids:
-                        n_perc_ids.append(ids)
+        curie = index.curies.lookup(out_curie)
+        in_n_perc = index.in_window(curie, expect_output)
+        in_all = curie in index.ranks
         # get the sugeno score & rank
-        for idx, res in enumerate(results):
-            node_bindings = res.get("node_bindings", {})
-            for k in node_bindings.keys():
-                nb = node_bindings[k]
-                the_id = None
-                for c in nb:
-                    the_id = c.get("id")
-                if the_id == out_curie:
-                    ars_score = None
-                    ars_rank = None
-                    ara_score = None
-                    ara_rank = None
-                    if "sugeno" in res.keys() and "rank" in res.keys():
-                        ars_score = res["sugeno"]
-                        ars_rank = res["rank"]
-                    else:
-                        for anal in res["analyses"]:
-                            if "score" in anal.keys():
-                                ara_score = anal["score"]
-                        ara_rank = idx + 1
-
-                    report[agent].actual_output = {
-                        "ars_score": ars_score,
-                        "ars_rank": ars_rank,
-                        "ara_score": ara_score,
-                        "ara_rank": ara_rank,
-                    }
+        if curie in index.outputs:
+            report[agent].actual_output = index.outputs[curie]
+        if curie in index.errors:
+            raise index.errors[curie]
 
         if expect_output in ["TopAnswer", "Acceptable"]:
-            if out_curie in n_perc_ids:
+            if in_n_perc:
                 report[agent].status = AgentStatus.PASSED
-            elif out_curie not in n_perc_ids:
-                if out_curie in all_ids:
+            elif not in_n_perc:
+                if in_all:
                     report[agent].status = AgentStatus.FAILED
                 else:
                     report[agent].status = AgentStatus.FAILED
-                    report[agent].actual_output = {
-                        "ars_score": None,
-                        "ars_rank": None,
-                        "ara_score": None,
-                        "ara_rank": None,
-                    }
+                    report[agent].actual_output = NO_OUTPUT
 
         elif expect_output == "BadButForgivable":
-            if out_curie in n_perc_ids:
+            if in_n_perc:
                 report[agent].status = AgentStatus.PASSED
-            elif out_curie not in n_perc_ids and out_curie in all_ids:
+            elif not in_n_perc and in_all:
                 report[agent].status = AgentStatus.FAILED
-            elif out_curie not in n_perc_ids and out_curie not in all_ids:
+            elif not in_n_perc and not in_all:
                 report[agent].status = AgentStatus.PASSED
-                report[agent].actual_output = {
-                    "ars_score": None,
-                    "ars_rank": None,
-                    "ara_score": None,
-                    "ara_rank": None,
-                }
+                report[agent].actual_output = NO_OUTPUT
 
         elif expect_output == "NeverShow":
-            if out_curie in n_perc_ids:
+            if in_n_perc:
                 report[agent].status = AgentStatus.FAILED
-            elif out_curie not in all_ids:
+            elif not in_all:
                 report[agent].status = AgentStatus.PASSED
-                report[agent].actual_output = {
-                    "ars_score": None,
-                    "ars_rank": None,
-                    "ara_score": None,
-                    "ara_rank": None,
-                }
+                report[agent].actual_output = NO_OUTPUT
     except Exception as e:
         report[agent].status = AgentStatus.FAILED
         report[agent].message = f"An exception happened: {type(e), str(e)}"
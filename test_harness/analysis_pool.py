@@ -0,0 +1,153 @@
+"""Process pool for the CPU heavy analysis of spooled agent responses."""
+
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from test_harness.acceptance_test_runner import (
+    ResultIndex,
+    run_acceptance_pass_fail_analysis,
+)
+from test_harness.curies import CurieTable
+from test_harness.pathfinder_test_runner import (
+    PathNodeIndex,
+    pathfinder_pass_fail_analysis,
+)
+from test_harness.runner.ars_lifecycle import count_response
+from test_harness.runner.response_store import ResponseHandle
+from test_harness.utils import AgentReport, AgentStatus, PathfinderReport
+
+# Spooled responses a worker keeps decoded, for the assets sharing a query.
+WORKER_CACHE_SIZE = 2
+
+# spool path -> (decoded response, result index)
+_cache: "OrderedDict[str, Tuple[Any, Optional[ResultIndex]]]" = OrderedDict()
+
+# curies of every index built in the worker
+_curies = CurieTable()
+
+
+@dataclass
+class AnalysisTask:
+    """Pass fail analysis of one agent's spooled response for one test asset.
+
+    Only the spool handle is sent to the worker, never the response itself.
+    Pathfinder assets set ``path_nodes``, acceptance ones ``expect_output``.
+    The fingerprint and verdict of an earlier run (see VerdictCache.candidate)
+    are taken as is if the response still has that fingerprint.
+    """
+
+    agent: str
+    handle: ResponseHandle
+    out_curie: str = ""
+    expect_output: Optional[str] = None
+    path_nodes: Optional[List[List[str]]] = None
+    minimum_required_path_nodes: int = 0
+    all_results: bool = False
+    verdict: Optional[Tuple[str, AgentReport]] = None
+
+
+def _load(handle: ResponseHandle) -> Tuple[Any, Optional[ResultIndex]]:
+    if handle.path in _cache:
+        _cache.move_to_end(handle.path)
+        return _cache[handle.path]
+    _cache[handle.path] = (handle.load(), None)
+    while len(_cache) > WORKER_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return _cache[handle.path]
+
+
+def _result_index(handle: ResponseHandle, results: List[Dict[str, Any]]):
+    response, index = _load(handle)
+    if index is None:
+        index = ResultIndex(results, _curies)
+        _cache[handle.path] = (response, index)
+    return index
+
+
+def analyze_spooled_response(
+    task: AnalysisTask,
+) -> Tuple[AgentReport, Optional[str], Dict[str, Any]]:
+    """Decode and analyze a spooled response, see run_tests.
+
+    Returns the agent's report, the error to log if the analysis failed and
+    the result count and fingerprint of the response, which are only worked
+    out once it's decoded.
+    """
+    agent_report_type = PathfinderReport if task.path_nodes is not None else AgentReport
+    report = {
+        task.agent: agent_report_type(
+            status=AgentStatus.SKIPPED,
+            message=None,
+            actual_output=None,
+        )
+    }
+    agent_report = report[task.agent]
+    counts: Dict[str, Any] = {"result_count": None, "fingerprint": None}
+    try:
+        response, _ = _load(task.handle)
+        count_response(counts, response)
+        if task.verdict is not None and task.verdict[0] == counts["fingerprint"]:
+            return task.verdict[1], None, counts
+        if "message" not in response:
+            agent_report.status = AgentStatus.FAILED
+            agent_report.message = "Test Error"
+            return agent_report, None, counts
+        results = response["message"].get("results")
+        if results is None or len(results) == 0:
+            agent_report.status = AgentStatus.NO_RESULTS
+            agent_report.message = "No results"
+            return agent_report, None, counts
+        if task.path_nodes is not None:
+            pathfinder_pass_fail_analysis(
+                report,
+                task.agent,
+                response["message"],
+                task.path_nodes,
+                task.minimum_required_path_nodes,
+                all_results=task.all_results,
+                index=PathNodeIndex(task.path_nodes, _curies),
+            )
+        else:
+            run_acceptance_pass_fail_analysis(
+                report,
+                task.agent,
+                results,
+                task.out_curie,
+                task.expect_output,
+                index=_result_index(task.handle, results),
+            )
+    except Exception as e:
+        agent_report.status = AgentStatus.FAILED
+        agent_report.message = "Test Error"
+        return agent_report, str(e), counts
+    return agent_report, None, counts
+
+
+class AnalysisPool:
+    """Worker processes that analyze spooled responses off the main process.
+
+    Decoding and analyzing big TRAPI messages is CPU bound, so doing it in
+    the harness process would stall everything else running there. Workers
+    are spawned rather than forked, so they don't inherit the gevent hub.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.tasks = 0
+
+    def submit(
+        self, task: AnalysisTask
+    ) -> "Future[Tuple[AgentReport, Optional[str], Dict[str, Any]]]":
+        """Analyze a spooled response in one of the workers."""
+        self.tasks += 1
+        return self.executor.submit(analyze_spooled_response, task)
+
+    def close(self):
+        """Stop the workers."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
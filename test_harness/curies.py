@@ -0,0 +1,35 @@
+"""Run scoped CURIE interning for the analysis indexes."""
+
+from typing import Dict, List, Optional
+
+
+class CurieTable:
+    """Interning table mapping every distinct CURIE to a small integer.
+
+    A CURIE is stored once, the first time any agent response binds it, and
+    the analysis indexes of every agent and asset hold and compare its
+    integer instead of a string.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.curies: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.curies)
+
+    def intern(self, curie: str) -> int:
+        """Get the integer of a CURIE, adding it to the table if it's new."""
+        curie_id = self.ids.get(curie)
+        if curie_id is None:
+            curie_id = self.ids[curie] = len(self.curies)
+            self.curies.append(curie)
+        return curie_id
+
+    def lookup(self, curie: str) -> Optional[int]:
+        """Get the integer of a CURIE, None if it was never interned."""
+        return self.ids.get(curie)
+
+    def curie(self, curie_id: int) -> str:
+        """Get the CURIE an integer stands for."""
+        return self.curies[curie_id]
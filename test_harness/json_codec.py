@@ -0,0 +1,64 @@
+"""JSON codec of the harness: orjson when it's installed, stdlib json otherwise."""
+
+import json
+from typing import IO, Any, Dict, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode a JSON document, eg the raw content of a response."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj: Any, indent: Optional[int] = None) -> bytes:
+    """Encode an object to UTF-8 JSON.
+
+    orjson only indents by two spaces, so any ``indent`` gives two spaces
+    with it. Objects it can't encode (eg integers over 64 bits) fall back to
+    stdlib json.
+    """
+    if orjson is not None:
+        options = _OPTIONS | orjson.OPT_INDENT_2 if indent else _OPTIONS
+        try:
+            return orjson.dumps(obj, option=options)
+        except TypeError:
+            pass
+    return json.dumps(obj, indent=indent).encode()
+
+
+def dumps(obj: Any, indent: Optional[int] = None) -> str:
+    """Encode an object to a JSON string, see dumps_bytes."""
+    return dumps_bytes(obj, indent).decode()
+
+
+def load(f: IO) -> Any:
+    """Decode the JSON document in a file."""
+    return loads(f.read())
+
+
+def dump(obj: Any, f: IO[str], indent: Optional[int] = None):
+    """Write an object to a text file as JSON."""
+    f.write(dumps(obj, indent))
+
+
+def json_body(obj: Any) -> Dict[str, Any]:
+    """httpx request arguments sending ``obj`` as a JSON body.
+
+    To be used instead of httpx's ``json=``, which always encodes with stdlib
+    json.
+    """
+    return {
+        "content": dumps_bytes(obj),
+        "headers": {"Content-Type": "application/json"},
+    }
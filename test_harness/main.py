@@ -13,11 +13,17 @@ from uuid import uuid4
 
 from setproctitle import setproctitle
 
+from test_harness import json_codec
 from test_harness.download import download_tests
 from test_harness.logger import get_logger, setup_logger
+from test_harness.preflight import run_preflight
+from test_harness.reanalyze import read_previous_run, reanalyze
 from test_harness.reporter import LocalReporter, Reporter
 from test_harness.result_collector import ResultCollector
-from test_harness.run import run_tests
+from test_harness.run import MIB, get_query_runner, run_tests
+from test_harness.runner.concurrency import MEMORY_BUDGET
+from test_harness.runner.rate_limit import parse_rate_limit
+from test_harness.runner.retry import GLOBAL_RETRY_BUDGET, MAX_RETRIES
 from test_harness.slacker import LocalSlacker, Slacker
 
 setproctitle("TestHarness")
@@ -31,6 +37,30 @@ def url_type(arg):
     raise TypeError("Invalid URL")
 
 
+def reanalyze_run(tests, args, logger):
+    """Analyze the responses of an earlier run again and save what changed."""
+    previous = read_previous_run(args["previous_run"])
+    if len(previous) < 1:
+        return logger.warning(f"No ARS queries in {args['previous_run']}. Exiting.")
+    slacker = LocalSlacker(
+        output_dir=args.get("output_dir") or "test_results", logger=logger
+    )
+    collector = ResultCollector(next(iter(tests.values())).test_env, logger)
+    start_time = time.time()
+    changes = reanalyze(tests, previous, collector, logger, args)
+    slacker.post_notification(
+        messages=[
+            f"Reanalyzed {len(previous)} tests of {args['suite']} "
+            f"({round(time.time() - start_time, 2)}s), {len(changes)} agent "
+            f"statuses changed\n{collector.dump_result_summary()}"
+        ]
+    )
+    name = f"{args['suite']}_reanalysis"
+    slacker.upload_test_results_file(name, "csv", collector.acceptance_csv)
+    slacker.upload_test_results_file(f"{name}_changes", "json", changes)
+    return logger.info("Reanalysis has completed!")
+
+
 def main(args):
     """Main Test Harness entrypoint."""
     qid = str(uuid4())[:8]
@@ -48,6 +78,9 @@ def main(args):
     if len(tests) < 1:
         return logger.warning("No tests to run. Exiting.")
 
+    if "previous_run" in args:
+        return reanalyze_run(tests, args, logger)
+
     output_dir = args.get("output_dir") or "test_results"
 
     # Run fully locally when asked to, or fall back to local stand-ins when the
@@ -55,41 +88,67 @@ def main(args):
     # without an Information Radiator or Slack workspace.
     local = args.get("local", False)
 
-    use_local_reporter = local or not Reporter.is_configured(
-        base_url=args.get("reporter_url"),
-        refresh_token=args.get("reporter_access_token"),
-    )
-    if use_local_reporter:
-        logger.info("Running without the Information Radiator (local reporter).")
-        reporter = LocalReporter(logger=logger)
-    else:
-        # Create test run in the Information Radiator
-        reporter = Reporter(
-            base_url=args.get("reporter_url"),
-            refresh_token=args.get("reporter_access_token"),
-            logger=logger,
-        )
-    reporter.get_auth()
-    test_env = next(iter(tests.values())).test_env
-    reporter.create_test_run(test_env, args["suite"])
-
     use_local_slacker = local or not Slacker.is_configured()
     if use_local_slacker:
         logger.info(f"Running without Slack; results will be saved to '{output_dir}'.")
         slacker = LocalSlacker(output_dir=output_dir, logger=logger)
     else:
         slacker = Slacker()
-    collector = ResultCollector(test_env, logger)
-    queried_envs = set()
-    for test in tests.values():
-        queried_envs.add(test.test_env)
-    slacker.post_notification(
-        messages=[
-            f"Running {args['suite']} ({sum([len(test.test_assets) for test in tests.values()])} tests, {len(tests.values())} queries)...\n<{reporter.base_path}/test-runs/{reporter.test_run_id}|View in the Information Radiator>"
-        ]
-    )
-    start_time = time.time()
-    run_tests(tests, reporter, collector, logger, args)
+
+    query_runner = None
+    # the runner of the pre-flight checks is handed on to run_tests, which
+    # closes it too, but it mustn't outlive an aborted run either
+    try:
+        preflight = None
+        # a replayed run never touches the environment it was recorded against
+        if not args.get("skip_preflight", False) and not args.get("replay"):
+            # Check the target environment up front so a dead ARS fails the run in
+            # seconds instead of after every test case has waited out its timeouts.
+            query_runner = get_query_runner(logger, args)
+            query_runner.retrieve_registry(
+                trapi_version=args.get("trapi_version", "1.6.0")
+            )
+            preflight = run_preflight(tests.values(), query_runner, logger)
+            if not preflight.healthy:
+                slacker.post_notification(
+                    messages=[
+                        f"Aborting {args['suite']}: environment failed pre-flight checks "
+                        f"({round(preflight.duration, 2)}s)\n{preflight.summary()}"
+                    ]
+                )
+                return logger.error("Pre-flight checks failed. Exiting.")
+
+        use_local_reporter = local or not Reporter.is_configured(
+            base_url=args.get("reporter_url"),
+            refresh_token=args.get("reporter_access_token"),
+        )
+        if use_local_reporter:
+            logger.info("Running without the Information Radiator (local reporter).")
+            reporter = LocalReporter(logger=logger)
+        else:
+            # Create test run in the Information Radiator
+            reporter = Reporter(
+                base_url=args.get("reporter_url"),
+                refresh_token=args.get("reporter_access_token"),
+                logger=logger,
+            )
+        reporter.get_auth()
+        test_env = next(iter(tests.values())).test_env
+        reporter.create_test_run(test_env, args["suite"])
+
+        collector = ResultCollector(test_env, logger)
+        queried_envs = set()
+        for test in tests.values():
+            queried_envs.add(test.test_env)
+        running_message = f"Running {args['suite']} ({sum([len(test.test_assets) for test in tests.values()])} tests, {len(tests.values())} queries)...\n<{reporter.base_path}/test-runs/{reporter.test_run_id}|View in the Information Radiator>"
+        if preflight is not None and len(preflight.degraded) > 0:
+            running_message += f"\n{preflight.summary()}"
+        slacker.post_notification(messages=[running_message])
+        start_time = time.time()
+        run_tests(tests, reporter, collector, logger, args, query_runner=query_runner)
+    finally:
+        if query_runner is not None:
+            query_runner.close()
 
     slacker.post_notification(
         messages=[
@@ -113,6 +172,12 @@ def main(args):
             "csv",
             collector.acceptance_csv,
         )
+    if collector.runner_stats:
+        slacker.upload_test_results_file(
+            f"{reporter.test_name}_runner",
+            "json",
+            collector.runner_stats,
+        )
     if collector.has_performance_results:
         slacker.upload_test_results_file(
             reporter.test_name,
@@ -133,7 +198,7 @@ def main(args):
         report_path = os.path.join(output_dir, "test_report.json")
         logger.info(f"Saving report as JSON to {report_path}...")
         with open(report_path, "w") as f:
-            json.dump(collector.acceptance_report, f)
+            json_codec.dump(collector.acceptance_report, f)
 
     return logger.info("All tests have completed!")
 
@@ -162,6 +227,30 @@ def cli():
         help="URL to download in order to find the test files",
     )
 
+    reanalyze_parser = subparsers.add_parser(
+        "reanalyze",
+        help="Analyze the retained ARS responses of an earlier run again",
+    )
+
+    reanalyze_parser.add_argument(
+        "suite",
+        type=str,
+        help="The name/id of the suite the earlier run ran.",
+    )
+
+    reanalyze_parser.add_argument(
+        "previous_run",
+        type=str,
+        help="Acceptance CSV (or JSON rows of it) of the earlier run.",
+    )
+
+    reanalyze_parser.add_argument(
+        "--tests_url",
+        type=url_type,
+        default="https://github.com/NCATSTranslator/Tests/archive/refs/heads/main.zip",
+        help="URL to download in order to find the test files",
+    )
+
     run_parser = subparsers.add_parser("run", help="Run a given set of tests")
 
     run_parser.add_argument(
@@ -220,6 +309,125 @@ def cli():
         ),
     )
 
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=MAX_RETRIES,
+        help="Retries for a single transient query failure (polls, fetches, NodeNorm).",
+    )
+
+    parser.add_argument(
+        "--retry_budget",
+        type=int,
+        default=GLOBAL_RETRY_BUDGET,
+        help="Retries allowed across the whole test run.",
+    )
+
+    parser.add_argument(
+        "--rate_limit",
+        type=parse_rate_limit,
+        help=(
+            "Per host RATE,BURST,MAX_IN_FLIGHT of queries, overriding the "
+            "defaults of every environment."
+        ),
+    )
+
+    parser.add_argument(
+        "--poll_rate_limit",
+        type=parse_rate_limit,
+        help="Per host RATE,BURST,MAX_IN_FLIGHT of ARS status polls.",
+    )
+
+    parser.add_argument(
+        "--async_runner",
+        action="store_true",
+        help="Run queries on the asyncio engine instead of worker threads.",
+    )
+
+    parser.add_argument(
+        "--required_agents",
+        type=str,
+        nargs="*",
+        help="Agents the ARS queries wait for, defaults to the reported agents.",
+    )
+
+    parser.add_argument(
+        "--wait_for_all_agents",
+        action="store_true",
+        help="Wait for every ARS child and the merged message, even if unreported.",
+    )
+
+    parser.add_argument(
+        "--spool_dir",
+        type=str,
+        help="Directory to spool large responses to, defaults to a temporary one.",
+    )
+
+    parser.add_argument(
+        "--memory_budget",
+        type=int,
+        default=MEMORY_BUDGET // MIB,
+        help="MiB of responses let into memory at once before queries are held.",
+    )
+
+    parser.add_argument(
+        "--pathfinder_all_results",
+        action="store_true",
+        help="Look for the expected path nodes in every Pathfinder result, not just the top one.",
+    )
+
+    parser.add_argument(
+        "--analysis_workers",
+        type=int,
+        default=0,
+        help="Processes analyzing spooled responses, 0 to analyze them in the harness process.",
+    )
+
+    parser.add_argument(
+        "--validation_workers",
+        type=int,
+        default=0,
+        help="Processes validating responses against --trapi_version, 0 to not validate.",
+    )
+
+    parser.add_argument(
+        "--verdict_cache",
+        type=str,
+        help="File of earlier verdicts, reused for responses whose results haven't changed.",
+    )
+
+    parser.add_argument(
+        "--record",
+        type=str,
+        help="File to record every http exchange of the run to, for --replay.",
+    )
+
+    parser.add_argument(
+        "--replay",
+        type=str,
+        help="Replay the http exchanges of a --record file instead of querying.",
+    )
+
+    parser.add_argument(
+        "--replay_latency",
+        type=str,
+        choices=["original", "zero"],
+        default="zero",
+        help="Whether replayed responses take as long as they did or no time at all.",
+    )
+
+    parser.add_argument(
+        "--keep_responses",
+        action="store_true",
+        help="Keep raw responses for the whole test case, not just their summaries.",
+    )
+
+    parser.add_argument(
+        "--skip_preflight",
+        action="store_true",
+        help="Skip the pre-flight health checks of the target environment.",
+    )
+
     parser.add_argument(
         "--log_level",
         type=str,
@@ -1,38 +1,99 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional
 
+from test_harness.curies import CurieTable
 from test_harness.utils import AgentStatus, PathfinderReport
 
 
+class PathNodeIndex:
+    """Index of the expected path node groups of a Pathfinder test asset.
+
+    Maps every curie to the groups it's in, so an auxiliary graph is matched
+    in a single pass over its edges instead of rescanning every group for
+    every edge. Curies are held as their integers in the run's ``curies``
+    table.
+    """
+
+    def __init__(
+        self, path_nodes: List[List[str]], curies: Optional[CurieTable] = None
+    ):
+        self.path_nodes = path_nodes
+        self.curies = curies if curies is not None else CurieTable()
+        # curie -> indices of the groups it's in, in group order
+        self.groups: Dict[int, List[int]] = {}
+        for group, node_curies in enumerate(path_nodes):
+            for curie in node_curies:
+                groups = self.groups.setdefault(self.curies.intern(curie), [])
+                if not groups or groups[-1] != group:
+                    groups.append(group)
+
+    def match(self, edges: Iterable[Dict[str, Any]]) -> List[int]:
+        """Expected path nodes found on a path, at most one per group, in the
+        order they were found."""
+        # dict as an ordered set
+        matching_path_nodes: Dict[int, None] = {}
+        hit_groups = set()
+
+        def hit(curie: int):
+            matching_path_nodes[curie] = None
+            hit_groups.update(self.groups[curie])
+
+        for edge in edges:
+            subject = self.curies.lookup(edge["subject"])
+            obj = self.curies.lookup(edge["object"])
+            subject_groups = self.groups.get(subject, [])
+            object_groups = self.groups.get(obj, [])
+            if not subject_groups and not object_groups:
+                continue
+            for group in sorted(set(subject_groups).union(object_groups)):
+                if group in hit_groups:
+                    continue
+                if group in subject_groups:
+                    hit(subject)
+                if group in object_groups:
+                    hit(obj)
+        return list(matching_path_nodes)
+
+    def names(self, curies: List[int]) -> str:
+        """Comma separated CURIEs of a match."""
+        return ",".join(self.curies.curie(curie) for curie in curies)
+
+
 def pathfinder_pass_fail_analysis(
     report: Dict[str, PathfinderReport],
     agent: str,
     message: Dict[str, Any],
     path_nodes: List[List[str]],
     minimum_required_path_nodes: int,
+    all_results: bool = False,
+    index: Optional[PathNodeIndex] = None,
 ) -> Dict[str, Any]:
+    """Look for the expected path nodes in the paths of an agent's response.
+
+    Only the top result is analyzed unless ``all_results`` is set. Pass the
+    ``index`` of the path nodes to reuse it across agents.
+    """
+    if index is None:
+        index = PathNodeIndex(path_nodes)
     found_path_nodes = set()
     unmatched_paths = set()
-    for analysis in message["results"][0]["analyses"]:
-        for path_bindings in analysis["path_bindings"].values():
-            for path_binding in path_bindings:
-                path_id = path_binding["id"]
-                matching_path_nodes = set()
-                for edge_id in message["auxiliary_graphs"][path_id]["edges"]:
-                    edge = message["knowledge_graph"]["edges"][edge_id]
-                    for node_curies in path_nodes:
-                        unhit_node = True
-                        for curie in node_curies:
-                            if curie in matching_path_nodes:
-                                unhit_node = False
-                        if unhit_node:
-                            if edge["subject"] in node_curies:
-                                matching_path_nodes.add(edge["subject"])
-                            if edge["object"] in node_curies:
-                                matching_path_nodes.add(edge["object"])
-                if len(matching_path_nodes) >= minimum_required_path_nodes:
-                    found_path_nodes.add(",".join(matching_path_nodes))
-                elif len(matching_path_nodes) > 0:
-                    unmatched_paths.add(",".join(matching_path_nodes))
+    # paths are often shared by several analyses and results
+    matched_paths: Dict[str, List[int]] = {}
+    results = message["results"] if all_results else [message["results"][0]]
+    for result in results:
+        for analysis in result["analyses"]:
+            for path_bindings in analysis["path_bindings"].values():
+                for path_binding in path_bindings:
+                    path_id = path_binding["id"]
+                    if path_id not in matched_paths:
+                        matched_paths[path_id] = index.match(
+                            message["knowledge_graph"]["edges"][edge_id]
+                            for edge_id in message["auxiliary_graphs"][path_id]["edges"]
+                        )
+                    matching_path_nodes = matched_paths[path_id]
+                    if len(matching_path_nodes) >= minimum_required_path_nodes:
+                        found_path_nodes.add(index.names(matching_path_nodes))
+                    elif len(matching_path_nodes) > 0:
+                        unmatched_paths.add(index.names(matching_path_nodes))
 
     if len(found_path_nodes) > 0:
         report[agent].status = AgentStatus.PASSED
@@ -0,0 +1,145 @@
+"""Pre-flight environment health checks."""
+
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import httpx
+from translator_testing_model.datamodel.pydanticmodel import (
+    PathfinderTestCase,
+    TestCase,
+)
+
+from test_harness import json_codec
+from test_harness.runner.query_runner import QueryRunner
+from test_harness.runner.smart_api_registry import PROBE_TIMEOUT
+from test_harness.utils import NODE_NORM_URL
+
+# Tiny, well-known curie used as a NodeNorm canary query.
+CANARY_CURIE = "MONDO:0005148"
+
+
+@dataclass
+class PreflightReport:
+    """Outcome of the pre-flight health checks."""
+
+    critical: List[str] = field(default_factory=list)
+    degraded: List[str] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        """Whether it's worth running the suite at all."""
+        return len(self.critical) == 0
+
+    def summary(self) -> str:
+        """Concise, Slack friendly description of any problems found."""
+        lines = [f"> CRITICAL: {problem}" for problem in self.critical]
+        lines.extend(f"> Degraded: {problem}" for problem in self.degraded)
+        return "\n".join(lines)
+
+
+def check_node_norm(
+    test_env: str, timeout: float = PROBE_TIMEOUT
+) -> Tuple[bool, Optional[str]]:
+    """Send a single curie canary query to the NodeNorm of an environment."""
+    node_norm = NODE_NORM_URL.get(test_env)
+    if node_norm is None:
+        return False, f"no NodeNorm configured for {test_env}"
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            res = client.post(
+                node_norm + "/get_normalized_nodes",
+                **json_codec.json_body({"curies": [CANARY_CURIE]}),
+            )
+            res.raise_for_status()
+            if CANARY_CURIE not in json_codec.loads(res.content):
+                return False, "canary curie missing from response"
+    except Exception as e:
+        return False, str(e)
+    return True, None
+
+
+def check_ars(
+    base_url: str, timeout: float = PROBE_TIMEOUT
+) -> Tuple[bool, Optional[str]]:
+    """Check that the ARS api actually answers, not just its web server."""
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            res = client.get(f"{base_url}/ars/api/status")
+            res.raise_for_status()
+    except Exception as e:
+        return False, str(e)
+    return True, None
+
+
+def run_preflight(
+    tests: Iterable[Union[TestCase, PathfinderTestCase]],
+    query_runner: QueryRunner,
+    logger: logging.Logger = logging.getLogger(__name__),
+) -> PreflightReport:
+    """Check ARS, NodeNorm and every targeted component before testing starts.
+
+    The ARS is critical: without it every acceptance test ends up SKIPPED after
+    waiting out its timeouts. NodeNorm and the other components are only
+    degraded: curie normalization falls back to the original curies and dead
+    endpoints get skipped by the query runner.
+    """
+    start_time = time.time()
+    report = PreflightReport()
+    tests = list(tests)
+    query_runner.probe_registry(tests)
+
+    components_by_env: Dict[str, set] = defaultdict(set)
+    for test in tests:
+        if test.test_env is None:
+            continue
+        components_by_env[test.test_env].update(test.components or [])
+
+    for test_env, components in components_by_env.items():
+        healthy, error = check_node_norm(test_env)
+        if not healthy:
+            report.degraded.append(
+                f"NodeNorm in {test_env} is unhealthy ({error}), using original curies"
+            )
+
+        reachable_components = 0
+        for component in sorted(components):
+            services = query_runner.get_services(test_env, component)
+            if component == "ars":
+                ars_errors = []
+                for service in services:
+                    healthy, error = check_ars(service["url"])
+                    if healthy:
+                        break
+                    ars_errors.append(f"{service['url']}: {error}")
+                    service["healthy"] = False
+                services = query_runner.get_services(test_env, component)
+                if len(services) == 0:
+                    report.critical.append(
+                        f"ARS in {test_env} is unreachable"
+                        + (f" ({'; '.join(ars_errors)})" if ars_errors else "")
+                    )
+                    continue
+            elif len(services) == 0:
+                report.degraded.append(
+                    f"No reachable {component} endpoints in {test_env}, skipping them"
+                )
+                continue
+            reachable_components += 1
+        if (
+            "ars" not in components
+            and len(components) > 0
+            and reachable_components == 0
+        ):
+            report.critical.append(f"No reachable components at all in {test_env}")
+
+    report.duration = time.time() - start_time
+    for problem in report.critical:
+        logger.error(f"Pre-flight: {problem}")
+    for problem in report.degraded:
+        logger.warning(f"Pre-flight: {problem}")
+    logger.info(f"Pre-flight checks finished in {round(report.duration, 2)}s")
+    return report
@@ -0,0 +1,160 @@
+"""Re-analyze the retained ARS responses of an earlier run."""
+
+import csv
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Union
+
+from translator_testing_model.datamodel.pydanticmodel import (
+    PathfinderTestCase,
+    TestCase,
+)
+
+from test_harness import json_codec
+from test_harness.curies import CurieTable
+from test_harness.result_collector import ResultCollector
+from test_harness.run import analyze_test_asset, get_query_runner
+from test_harness.utils import AgentStatus, normalize_curies
+
+# columns of the acceptance CSV that aren't agent statuses
+CSV_COLUMNS = {"name", "url", "pk", "parent_pk", "TestCase", "TestAsset"}
+
+
+@dataclass
+class PreviousResult:
+    """A test asset of an earlier run, the ARS query it was answered by and
+    the statuses its agents got."""
+
+    test_case: str
+    test_asset: str
+    parent_pk: str
+    statuses: Dict[str, str] = field(default_factory=dict)
+
+
+def read_previous_run(path: str) -> List[PreviousResult]:
+    """Read the test assets of an earlier run from its acceptance CSV.
+
+    A JSON list of rows keyed like the CSV columns works too. Assets that
+    never got an ARS query (eg skipped ones) are left out.
+    """
+    with open(path, newline="") as f:
+        if path.endswith(".json"):
+            rows = json_codec.loads(f.read())
+        else:
+            rows = list(csv.DictReader(f))
+    previous = []
+    for row in rows:
+        # the CSV links the parent pk rather than holding it
+        parent_pk = (row.get("parent_pk") or row.get("pk") or "").rsplit("?r=", 1)[-1]
+        if not parent_pk or parent_pk == "None":
+            continue
+        previous.append(
+            PreviousResult(
+                test_case=row["TestCase"],
+                test_asset=row["TestAsset"],
+                parent_pk=parent_pk,
+                statuses={
+                    agent: status
+                    for agent, status in row.items()
+                    if agent not in CSV_COLUMNS and status
+                },
+            )
+        )
+    return previous
+
+
+def reanalyze(
+    tests: Dict[str, Union[TestCase, PathfinderTestCase]],
+    previous: List[PreviousResult],
+    collector: ResultCollector,
+    logger: logging.Logger = logging.getLogger(__name__),
+    args: Dict[str, Any] = {},
+) -> List[Dict[str, str]]:
+    """Analyze the retained ARS responses of an earlier run again.
+
+    Nothing is submitted: the messages of each test case's ARS queries are
+    fetched by pk (see QueryRunner.fetch_ars_messages) and go through the
+    pass fail analysis as they would in run_tests. Returns the agent
+    statuses that changed since that run.
+    """
+    query_runner = get_query_runner(logger, args)
+    try:
+        query_runner.retrieve_registry(trapi_version=args["trapi_version"])
+        if not args.get("keep_responses", False):
+            query_runner.retained_agents = set(collector.agents)
+        curies = CurieTable()
+        by_test: Dict[str, List[PreviousResult]] = {}
+        for result in previous:
+            by_test.setdefault(result.test_case, []).append(result)
+        changes = []
+        for test_id, results in by_test.items():
+            test = tests.get(test_id)
+            if test is None:
+                logger.warning(f"Test case {test_id} is not in the suite, skipping it.")
+                continue
+            query_runner.set_environment(test.test_env)
+            service = query_runner.get_fastest_service(test.test_env, "ars")
+            if service is None:
+                logger.error(f"No ARS to get the responses of {test_id} from.")
+                continue
+            utilities = query_runner.bulkheads["utilities"]
+            normalized_curies = normalize_curies(
+                test,
+                logger,
+                retry_policy=query_runner.retry_policy,
+                client=utilities.client,
+            )
+            fetched = query_runner.fetch_ars_messages(
+                {result.parent_pk for result in results}, service["url"]
+            )
+            assets = {asset.id: asset for asset in test.test_assets}
+            for result in results:
+                asset = assets.get(result.test_asset)
+                if asset is None:
+                    logger.warning(
+                        f"Test asset {result.test_asset} is not in {test_id}."
+                    )
+                    continue
+                responses, pks = fetched[result.parent_pk]
+                report = analyze_test_asset(
+                    test,
+                    asset,
+                    {"responses": responses, "pks": pks},
+                    normalized_curies,
+                    curies,
+                    logger,
+                    args,
+                )
+                # same as run_tests, the ARS decides the status of the test
+                status = (
+                    report.result["ars"].status
+                    if "ars" in report.result
+                    else AgentStatus.SKIPPED
+                )
+                collector.collect_acceptance_result(
+                    test,
+                    asset,
+                    report,
+                    result.parent_pk,
+                    "",
+                    force_skipped=status == AgentStatus.SKIPPED,
+                )
+                collector.acceptance_report[status.value] += 1
+                for agent, agent_report in report.result.items():
+                    before = result.statuses.get(agent)
+                    if before is not None and before != agent_report.status.value:
+                        changes.append(
+                            {
+                                "TestCase": test_id,
+                                "TestAsset": asset.id,
+                                "agent": agent,
+                                "before": before,
+                                "after": agent_report.status.value,
+                            }
+                        )
+            # delete this big object to help out the garbage collector
+            del fetched
+        collector.collect_runner_stats(query_runner.get_stats())
+    finally:
+        query_runner.close()
+    return changes
@@ -14,6 +14,8 @@ from translator_testing_model.datamodel.pydanticmodel import (
     TestCase,
 )
 
+from test_harness import json_codec
+
 
 class Reporter:
     """Reports tests and statuses to the Information Radiator."""
@@ -38,9 +40,11 @@ class Reporter:
         with httpx.Client() as client:
             res = client.post(
                 url=f"{self.base_path}/api/iam/v1/auth/refresh",
-                json={
-                    "refreshToken": self.refresh_token,
-                },
+                **json_codec.json_body(
+                    {
+                        "refreshToken": self.refresh_token,
+                    }
+                ),
             )
             res.raise_for_status()
             auth_response = res.json()
@@ -55,14 +59,16 @@ class Reporter:
         self.test_name = f"{suite_name}: {datetime.now().strftime('%Y_%m_%d_%H_%M')}"
         res = self.authenticated_client.post(
             url=f"{self.base_path}/api/reporting/v1/test-runs",
-            json={
-                "name": self.test_name,
-                "startedAt": datetime.now().astimezone().isoformat(),
-                "framework": "Translator Automated Testing",
-                "config": {
-                    "build": "v0.3.3",
-                },
-            },
+            **json_codec.json_body(
+                {
+                    "name": self.test_name,
+                    "startedAt": datetime.now().astimezone().isoformat(),
+                    "framework": "Translator Automated Testing",
+                    "config": {
+                        "build": "v0.3.3",
+                    },
+                }
+            ),
         )
         res.raise_for_status()
         res_json = res.json()
@@ -146,7 +152,7 @@ class Reporter:
             raise Exception
         res = self.authenticated_client.post(
             url=f"{self.base_path}/api/reporting/v1/test-runs/{self.test_run_id}/tests",
-            json=test_json,
+            **json_codec.json_body(test_json),
         )
         res.raise_for_status()
         res_json = res.json()
@@ -157,9 +163,11 @@ class Reporter:
         self.logger.info(labels)
         res = self.authenticated_client.put(
             url=f"{self.base_path}/api/reporting/v1/test-runs/{self.test_run_id}/tests/{test_id}/labels",
-            json={
-                "items": labels,
-            },
+            **json_codec.json_body(
+                {
+                    "items": labels,
+                }
+            ),
         )
         res.raise_for_status()
 
@@ -167,15 +175,17 @@ class Reporter:
         """Upload logs to the IR."""
         res = self.authenticated_client.post(
             url=f"{self.base_path}/api/reporting/v1/test-runs/{self.test_run_id}/logs",
-            json=[
-                {
-                    "testId": f"{test_id}",
-                    "level": "INFO",
-                    "timestamp": datetime.now().timestamp(),
-                    "message": message,
-                }
-                for message in logs
-            ],
+            **json_codec.json_body(
+                [
+                    {
+                        "testId": f"{test_id}",
+                        "level": "INFO",
+                        "timestamp": datetime.now().timestamp(),
+                        "message": message,
+                    }
+                    for message in logs
+                ]
+            ),
         )
         res.raise_for_status()
 
@@ -183,7 +193,7 @@ class Reporter:
         """Upload artifact references to the IR."""
         res = self.authenticated_client.put(
             url=f"{self.base_path}/api/reporting/v1/test-runs/{self.test_run_id}/tests/{test_id}/artifact-references",
-            json=artifact_references,
+            **json_codec.json_body(artifact_references),
         )
         res.raise_for_status()
 
@@ -204,14 +214,16 @@ class Reporter:
         try:
             res = self.authenticated_client.post(
                 url=f"{self.base_path}/api/reporting/v1/test-runs/{self.test_run_id}/logs",
-                json=[
-                    {
-                        "testId": f"{test_id}",
-                        "level": "INFO",
-                        "timestamp": datetime.now().timestamp(),
-                        "message": message,
-                    },
-                ],
+                **json_codec.json_body(
+                    [
+                        {
+                            "testId": f"{test_id}",
+                            "level": "INFO",
+                            "timestamp": datetime.now().timestamp(),
+                            "message": message,
+                        },
+                    ]
+                ),
             )
             res.raise_for_status()
         except httpx.HTTPStatusError as e:
@@ -222,10 +234,12 @@ class Reporter:
         try:
             res = self.authenticated_client.put(
                 url=f"{self.base_path}/api/reporting/v1/test-runs/{self.test_run_id}/tests/{test_id}",
-                json={
-                    "result": result,
-                    "endedAt": datetime.now().astimezone().isoformat(),
-                },
+                **json_codec.json_body(
+                    {
+                        "result": result,
+                        "endedAt": datetime.now().astimezone().isoformat(),
+                    }
+                ),
             )
             res.raise_for_status()
         except httpx.HTTPStatusError as e:
@@ -235,9 +249,11 @@ class Reporter:
         """Set the final status of a test run."""
         res = self.authenticated_client.put(
             url=f"{self.base_path}/api/reporting/v1/test-runs/{self.test_run_id}",
-            json={
-                "endedAt": datetime.now().astimezone().isoformat(),
-            },
+            **json_codec.json_body(
+                {
+                    "endedAt": datetime.now().astimezone().isoformat(),
+                }
+            ),
         )
         res.raise_for_status()
         res_json = res.json()
@@ -34,6 +34,9 @@ ARA_OUTCOMES = (
     "ara_query_failed",
 )
 
+# TRAPI validation statuses, from best to worst
+VALIDATION_STATUSES = ("valid", "warnings", "errors", "critical", "failed")
+
 
 def percentile_from_dict(total: int, counts: Dict[int, int], pct: float) -> int:
     """Return the response_time bucket at a given percentile (0..1)."""
@@ -198,6 +201,17 @@ def _summarize_response_sizes(
     return summary
 
 
+def _summarize_latencies(counts: Dict[int, int]) -> Dict:
+    """Distribution of a ``seconds -> count`` latency histogram."""
+    total = sum(counts.values())
+    return {
+        "count": total,
+        "p50": percentile_from_dict(total, counts, 0.5),
+        "p95": percentile_from_dict(total, counts, 0.95),
+        "max": max(counts) if counts else 0,
+    }
+
+
 class ResultCollector:
     """Collect results for easy dissemination."""
 
@@ -241,6 +255,16 @@ class ResultCollector:
             "stats": {},
             "failures": {},
         }
+        self.runner_stats = {}
+        self.early_completion = {}
+        # seconds to answer (bucketed) -> count, by agent
+        self.agent_latencies: Dict[str, Dict[int, int]] = {}
+        self.merge_overheads: Dict[int, int] = {}
+        # KiB / result count (bucketed) -> count, by agent
+        self.agent_payload_sizes: Dict[str, Dict[int, int]] = {}
+        self.agent_result_counts: Dict[str, Dict[int, int]] = {}
+        # validation status -> count, by agent
+        self.validation_stats: Dict[str, Dict[str, int]] = {}
 
     def collect_acceptance_result(
         self,
@@ -275,6 +299,11 @@ class ResultCollector:
                 # for in each agent's totals.
                 self.acceptance_stats[agent][query_type][AgentStatus.SKIPPED.value] += 1
                 agent_statuses.append(AgentStatus.SKIPPED.value)
+        if report.validation:
+            for agent, summary in report.validation.items():
+                counts = self.validation_stats.setdefault(agent, {})
+                counts[summary.status] = counts.get(summary.status, 0) + 1
+            self.runner_stats["validation"] = self.validation_stats
 
         # add result to csv
         agent_results = ",".join(agent_statuses)
@@ -337,6 +366,109 @@ class ResultCollector:
             **results,
         }
 
+    def collect_runner_stats(self, stats: Dict):
+        """Add the query runner stats (circuit breakers etc.) to the run report."""
+        self.runner_stats.update(stats)
+
+    def collect_early_completion(self, test_id: str, lifecycles: List[Dict]):
+        """Record the agents a test case's ARS queries didn't wait for.
+
+        Queries of a test case run at once, so the test case finishes up to the
+        largest time saved by any of its queries sooner.
+        """
+        skipped = sorted(
+            {agent for lifecycle in lifecycles for agent in lifecycle["skipped_agents"]}
+        )
+        if not skipped:
+            return
+        self.early_completion[test_id] = {
+            "skipped_agents": skipped,
+            "time_saved": round(
+                max(lifecycle["time_saved"] for lifecycle in lifecycles), 3
+            ),
+        }
+        self.runner_stats["early_completion"] = self.early_completion
+
+    def collect_query_timings(self, timings: Dict):
+        """Add the milestones of a single ARS query to the latency distributions.
+
+        The ARS merge overhead is the time from the slowest child being done
+        to the merged message being available.
+        """
+        agents = {
+            agent: seconds
+            for agent, seconds in timings["agents"].items()
+            if seconds is not None
+        }
+        if timings["merged_fetched"] is not None:
+            agents["ars"] = timings["merged_fetched"]
+        for agent, seconds in agents.items():
+            latencies = self.agent_latencies.setdefault(agent, {})
+            latencies[int(seconds)] = latencies.get(int(seconds), 0) + 1
+        if timings["merged_available"] is not None and timings["agents"]:
+            overhead = int(
+                max(0, timings["merged_available"] - max(timings["agents"].values()))
+            )
+            self.merge_overheads[overhead] = self.merge_overheads.get(overhead, 0) + 1
+        self.runner_stats["latency"] = {
+            "time_to_answer": {
+                agent: _summarize_latencies(latencies)
+                for agent, latencies in self.agent_latencies.items()
+            },
+            "ars_merge_overhead": _summarize_latencies(self.merge_overheads),
+        }
+        self._update_leaderboard()
+
+    def collect_query_payloads(self, responses: Dict[str, dict]):
+        """Add the payload sizes of a single query's responses, by agent."""
+        for agent in self.agents:
+            response = responses.get(agent)
+            status_code = (response or {}).get("status_code")
+            if not isinstance(status_code, int) or status_code > 299:
+                continue
+            result_count = response.get("result_count")
+            if result_count is None and isinstance(response.get("response"), dict):
+                message = response["response"].get("message") or {}
+                result_count = len(message.get("results") or [])
+            # a spooled response that never got analyzed wasn't counted
+            if result_count is not None:
+                counts = self.agent_result_counts.setdefault(agent, {})
+                counts[result_count] = counts.get(result_count, 0) + 1
+            if response.get("bytes") is not None:
+                kib = response["bytes"] // 1024
+                sizes = self.agent_payload_sizes.setdefault(agent, {})
+                sizes[kib] = sizes.get(kib, 0) + 1
+        self._update_leaderboard()
+
+    def _update_leaderboard(self):
+        """Rank the agents by p95 time to answer, slowest first.
+
+        The ranking goes out with the acceptance stats, next to each agent's
+        pass/fail counts.
+        """
+        rows = []
+        for agent in self.agents:
+            latencies = _summarize_latencies(self.agent_latencies.get(agent, {}))
+            sizes = _summarize_latencies(self.agent_payload_sizes.get(agent, {}))
+            results = _summarize_latencies(self.agent_result_counts.get(agent, {}))
+            if not latencies["count"] and not results["count"]:
+                continue
+            rows.append(
+                {
+                    "agent": agent,
+                    "queries": max(latencies["count"], results["count"]),
+                    "p50_seconds": latencies["p50"],
+                    "p95_seconds": latencies["p95"],
+                    "max_seconds": latencies["max"],
+                    "p50_kib": sizes["p50"],
+                    "p95_kib": sizes["p95"],
+                    "p50_results": results["p50"],
+                    "p95_results": results["p95"],
+                }
+            )
+        rows.sort(key=lambda row: (row["p95_seconds"], row["p95_kib"]), reverse=True)
+        self.acceptance_stats["leaderboard"] = rows
+
     def render_performance_artifacts(self) -> Iterator[Tuple[str, bytes]]:
         """Yield (filename, bytes) tuples for per-target performance artifacts.
 
@@ -383,6 +515,7 @@ class ResultCollector:
 > No Results: {self.acceptance_report['NO_RESULTS']}
 > Errors: {self.acceptance_report['ERROR']}
 """
+        results_formatted += self._format_runner_stats()
         if self.has_performance_results:
             results_formatted += """
 > Performance Test Results:"""
@@ -402,6 +535,153 @@ class ResultCollector:
 
         return results_formatted
 
+    def _format_runner_stats(self) -> str:
+        """Render the query runner section of the summary, if anything happened."""
+        lines = []
+        circuit_breakers = self.runner_stats.get("circuit_breakers") or {}
+        tripped = {
+            host: circuit
+            for host, circuit in circuit_breakers.items()
+            if circuit.get("timeline")
+        }
+        if tripped:
+            lines.append("> Circuit Breakers:")
+            for host, circuit in tripped.items():
+                trips = sum(
+                    1 for event in circuit["timeline"] if event["state"] == "OPEN"
+                )
+                lines.append(
+                    f"> - {host}: tripped {trips}x, "
+                    f"{circuit['fast_failures']} fast-failed, now {circuit['state']}"
+                )
+        retries = self.runner_stats.get("retries") or {}
+        if retries.get("retries_used"):
+            by_host = ", ".join(
+                f"{host}: {count}" for host, count in retries["by_host"].items()
+            )
+            lines.append(
+                f"> Retries: {retries['retries_used']}/{retries['global_budget']} "
+                f"({by_host})"
+            )
+        rate_limits = self.runner_stats.get("rate_limits") or {}
+        throttled = {
+            host: rate_limit
+            for host, rate_limit in rate_limits.items()
+            if rate_limit.get("throttled_seconds")
+        }
+        if throttled:
+            lines.append("> Rate Limiting:")
+            for host, rate_limit in throttled.items():
+                lines.append(
+                    f"> - {host}: {rate_limit['requests']} requests, "
+                    f"throttled {rate_limit['throttled_seconds']:.1f}s, "
+                    f"peak in flight {rate_limit['peak_in_flight']}"
+                )
+        concurrency = self.runner_stats.get("concurrency") or {}
+        if concurrency:
+            lines.append("> Adaptive Concurrency:")
+            for host, limiter in concurrency.items():
+                limits = [event["limit"] for event in limiter["timeline"]]
+                shown = " -> ".join(str(limit) for limit in limits[-20:])
+                if len(limits) > 20:
+                    shown = f"... -> {shown}"
+                cuts = sum(
+                    1 for before, after in zip(limits, limits[1:]) if after < before
+                )
+                lines.append(
+                    f"> - {host}: {shown} (final {limiter['limit']}, {cuts} cuts)"
+                )
+        pools = {
+            name: pool
+            for name, pool in (self.runner_stats.get("pools") or {}).items()
+            if pool.get("tasks")
+        }
+        if pools:
+            lines.append(
+                "> Worker Pools: "
+                + ", ".join(
+                    f"{name} {pool['peak_busy']}/{pool['workers']} peak, "
+                    f"{pool['utilization']:.0%} busy"
+                    for name, pool in pools.items()
+                )
+            )
+        leaderboard = self.acceptance_stats.get("leaderboard") or []
+        if leaderboard:
+            lines.append(
+                "> Agent Leaderboard (time p50/p95/max | KiB p50/p95 | results p50/p95):"
+            )
+            for rank, row in enumerate(leaderboard, start=1):
+                lines.append(
+                    f"> {rank}. {row['agent']}: "
+                    f"{row['p50_seconds']}s/{row['p95_seconds']}s/{row['max_seconds']}s"
+                    f" | {row['p50_kib']}/{row['p95_kib']}"
+                    f" | {row['p50_results']}/{row['p95_results']}"
+                    f" ({row['queries']} queries)"
+                )
+        latency = self.runner_stats.get("latency") or {}
+        if (latency.get("ars_merge_overhead") or {}).get("count"):
+            overhead = latency["ars_merge_overhead"]
+            lines.append(
+                f"> ARS Merge Overhead (p50/p95/max): {overhead['p50']}s/"
+                f"{overhead['p95']}s/{overhead['max']}s"
+            )
+        early_completion = self.runner_stats.get("early_completion") or {}
+        if early_completion:
+            skipped = sorted(
+                {
+                    agent
+                    for test_case in early_completion.values()
+                    for agent in test_case["skipped_agents"]
+                }
+            )
+            time_saved = sum(
+                test_case["time_saved"] for test_case in early_completion.values()
+            )
+            lines.append(
+                f"> Early Completion: {len(early_completion)} test cases didn't wait "
+                f"for {', '.join(skipped)}, saving up to {time_saved:.0f}s"
+            )
+        validation = self.runner_stats.get("validation") or {}
+        if validation:
+            lines.append("> TRAPI Validation:")
+            for agent, counts in validation.items():
+                lines.append(
+                    f"> - {agent}: "
+                    + ", ".join(
+                        f"{counts[status]} {status}"
+                        for status in VALIDATION_STATUSES
+                        if status in counts
+                    )
+                )
+        verdicts = self.runner_stats.get("verdicts") or {}
+        if verdicts.get("reused"):
+            lines.append(
+                f"> Unchanged Responses: {verdicts['reused']} responses unchanged "
+                "since last run, their verdicts were reused"
+            )
+        cassette = self.runner_stats.get("cassette") or {}
+        if cassette.get("mode") == "replay":
+            lines.append(
+                f"> Replayed Run: {cassette['replayed']} recorded responses served, "
+                f"{cassette['missed']} requests not in the recording"
+            )
+        memory = self.runner_stats.get("memory") or {}
+        if memory.get("held"):
+            lines.append(
+                f"> Memory Budget: peak {memory['peak'] / 1024 / 1024:.1f}/"
+                f"{memory['limit'] / 1024 / 1024:.0f} MiB, {memory['held']} "
+                f"requests held for {memory['held_time']:.0f}s"
+            )
+        spool = self.runner_stats.get("spool") or {}
+        if spool.get("spooled"):
+            lines.append(
+                f"> Spooled Responses: {spool['spooled']} "
+                f"({spool['spooled_bytes'] / 1024 / 1024:.1f} MiB)"
+            )
+        if not lines:
+            return ""
+        return "\n" + "\n".join(lines) + "\n"
+
     @staticmethod
     def _format_performance_target(target_url: str, target_stats: Dict) -> str:
         """Render the per-host performance section of the summary."""
@@ -1,9 +1,8 @@
 """Run tests through the Test Runners."""
 
-import json
 import logging
-from dataclasses import asdict
-from typing import Any, Dict, Union
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple, Union
 
 from tqdm import tqdm
 
@@ -17,19 +16,341 @@ from translator_testing_model.datamodel.pydanticmodel import (
     TestCase,
 )
 
-from test_harness.acceptance_test_runner import run_acceptance_pass_fail_analysis
-from test_harness.pathfinder_test_runner import pathfinder_pass_fail_analysis
+from test_harness import json_codec
+from test_harness.acceptance_test_runner import (
+    ResultIndex,
+    run_acceptance_pass_fail_analysis,
+)
+from test_harness.analysis_pool import AnalysisPool, AnalysisTask
+from test_harness.curies import CurieTable
+from test_harness.pathfinder_test_runner import (
+    PathNodeIndex,
+    pathfinder_pass_fail_analysis,
+)
 from test_harness.performance_test_runner import run_performance_test
 from test_harness.reporter import Reporter
 from test_harness.result_collector import ResultCollector
+from test_harness.runner.ars_lifecycle import NOT_WAITED_STATUS, count_response
+from test_harness.runner.async_query_runner import AsyncQueryRunner
+from test_harness.runner.cassette import Cassette
+from test_harness.runner.circuit_breaker import CIRCUIT_OPEN_STATUS
+from test_harness.runner.concurrency import MEMORY_BUDGET, MemoryBudget
 from test_harness.runner.generate_query import generate_query
-from test_harness.runner.query_runner import QueryRunner, env_map
+from test_harness.runner.query_runner import QueryRunner
+from test_harness.runner.response_store import (
+    ResponseHandle,
+    ResponseStore,
+    load_response,
+)
+from test_harness.runner.retry import GLOBAL_RETRY_BUDGET, MAX_RETRIES, RetryPolicy
 from test_harness.utils import (
     AgentReport,
     AgentStatus,
+    PathfinderReport,
     TestReport,
+    ValidationSummary,
     hash_test_asset,
+    summarize_response,
 )
+from test_harness.validation import ValidationPool
+from test_harness.verdict_cache import VerdictCache
+
+MIB = 1024 * 1024
+
+
+def get_retry_policy(
+    args: Dict[str, Any], cassette: Optional[Cassette] = None
+) -> RetryPolicy:
+    """Build the query retry policy from the cli args.
+
+    Backoffs follow the clock of a replayed ``cassette``.
+    """
+    return RetryPolicy(
+        max_retries=args.get("max_retries", MAX_RETRIES),
+        global_budget=args.get("retry_budget", GLOBAL_RETRY_BUDGET),
+        clock=cassette.clock if cassette is not None else None,
+    )
+
+
+def get_cassette(args: Dict[str, Any]) -> Optional[Cassette]:
+    """Cassette the cli args record the run to or replay it from, if any."""
+    if args.get("replay"):
+        return Cassette(
+            args["replay"], replay=True, latency=args.get("replay_latency", "zero")
+        )
+    if args.get("record"):
+        return Cassette(args["record"])
+    return None
+
+
+def get_query_runner(logger: logging.Logger, args: Dict[str, Any]) -> QueryRunner:
+    """Build the query runner engine picked by the cli args."""
+    runner_class = AsyncQueryRunner if args.get("async_runner", False) else QueryRunner
+    cassette = get_cassette(args)
+    return runner_class(
+        logger,
+        retry_policy=get_retry_policy(args, cassette),
+        response_store=ResponseStore(args.get("spool_dir")),
+        memory_budget=MemoryBudget(
+            args.get("memory_budget", MEMORY_BUDGET // MIB) * MIB
+        ),
+        cassette=cassette,
+        rate_limit=args.get("rate_limit"),
+        poll_rate_limit=args.get("poll_rate_limit"),
+    )
+
+
+def get_analysis_task(
+    agent: str,
+    handle: ResponseHandle,
+    test: Union[TestCase, PathfinderTestCase],
+    asset: Union[TestAsset, PathfinderTestAsset],
+    normalized_curies: Dict[str, str],
+    args: Dict[str, Any],
+) -> Optional[AnalysisTask]:
+    """Pass fail analysis of a spooled response, for an AnalysisPool worker."""
+    if isinstance(test, PathfinderTestCase) and isinstance(asset, PathfinderTestAsset):
+        return AnalysisTask(
+            agent,
+            handle,
+            path_nodes=[
+                [normalized_curies[path_node_id] for path_node_id in path_node.ids]
+                for path_node in asset.path_nodes
+            ],
+            minimum_required_path_nodes=asset.minimum_required_path_nodes,
+            all_results=args.get("pathfinder_all_results", False),
+        )
+    elif isinstance(asset, TestAsset):
+        return AnalysisTask(
+            agent,
+            handle,
+            out_curie=(
+                normalized_curies.get(asset.output_id, "")
+                if asset.output_id is not None
+                else ""
+            ),
+            expect_output=asset.expected_output,
+        )
+    return None
+
+
+def analyze_test_asset(
+    test: Union[TestCase, PathfinderTestCase],
+    asset: Union[TestAsset, PathfinderTestAsset],
+    test_query: Dict[str, Any],
+    normalized_curies: Dict[str, str],
+    curies: CurieTable,
+    logger: logging.Logger,
+    args: Dict[str, Any],
+    result_indexes: Optional[Dict[Tuple[int, str], ResultIndex]] = None,
+    analysis_pool: Optional[AnalysisPool] = None,
+    validation_pool: Optional[ValidationPool] = None,
+    verdict_cache: Optional[VerdictCache] = None,
+) -> TestReport:
+    """Pass fail analysis of every agent response to a test asset's query.
+
+    ``result_indexes`` lets assets sharing a query share the result index of
+    each agent's response. The pools and the verdict cache are optional, see
+    run_tests.
+    """
+    if result_indexes is None:
+        result_indexes = {}
+    test_asset_hash = hash_test_asset(asset)
+    report = TestReport(
+        pks=test_query["pks"],
+        result={},
+        test_details=None,
+        timings=(test_query.get("lifecycle") or {}).get("timings"),
+    )
+    if isinstance(test, PathfinderTestCase) and isinstance(asset, PathfinderTestAsset):
+        report.test_details = {
+            "minimum_required_path_nodes": asset.minimum_required_path_nodes,
+            "expected_path_nodes": "; ".join(
+                [
+                    ",".join(
+                        [
+                            normalized_curies[path_node_id]
+                            for path_node_id in path_node.ids
+                        ]
+                    )
+                    for path_node in asset.path_nodes
+                ]
+            ),
+        }
+        # the same expected path nodes are looked for in every agent
+        path_node_index = PathNodeIndex(
+            [
+                [normalized_curies[path_node_id] for path_node_id in path_node.ids]
+                for path_node in asset.path_nodes
+            ],
+            curies,
+        )
+    agent_report_type = (
+        PathfinderReport if isinstance(asset, PathfinderTestAsset) else AgentReport
+    )
+    out_curie = (
+        normalized_curies.get(asset.output_id, "")
+        if isinstance(asset, TestAsset) and asset.output_id is not None
+        else ""
+    )
+    pending_analyses = {}
+    pending_validations = {}
+    # agent -> verdict cache key, of the responses analyzed afresh
+    new_verdicts = {}
+    for agent, response in test_query["responses"].items():
+        report.result[agent] = agent_report_type(
+            status=AgentStatus.SKIPPED,
+            message=None,
+            actual_output=None,
+        )
+        agent_report = report.result[agent]
+        try:
+            if response["status_code"] == NOT_WAITED_STATUS:
+                agent_report.message = "Not waited for"
+                continue
+            elif response["status_code"] > 299:
+                agent_report.status = AgentStatus.FAILED
+                if str(response["status_code"]) == "598":
+                    agent_report.message = "Timed out"
+                elif response["status_code"] == CIRCUIT_OPEN_STATUS:
+                    agent_report.message = "Fast-failed: circuit open for host"
+                else:
+                    agent_report.message = f"Status code: {response['status_code']}"
+                continue
+            elif response.get("discarded"):
+                agent_report.message = "Not analyzed"
+                continue
+            if validation_pool is not None and "response" in response:
+                # validated while the response is analyzed
+                pending_validations[agent] = validation_pool.submit(response)
+            task = None
+            if analysis_pool is not None and isinstance(
+                response.get("response"), ResponseHandle
+            ):
+                # decoded, counted and analyzed in a worker process
+                task = get_analysis_task(
+                    agent,
+                    response["response"],
+                    test,
+                    asset,
+                    normalized_curies,
+                    args,
+                )
+            if task is None and isinstance(response.get("response"), ResponseHandle):
+                # spooled responses are only loaded, and counted, while analyzed
+                loaded = load_response(response)
+                count_response(response, loaded)
+                response = {**response, "response": loaded}
+            if verdict_cache is not None and isinstance(asset, TestAsset):
+                verdict_key = VerdictCache.key(test.id, asset.id, agent)
+                if task is not None:
+                    # the worker checks the fingerprint once it has one
+                    task.verdict = verdict_cache.candidate(
+                        verdict_key, out_curie, asset.expected_output
+                    )
+                else:
+                    verdict = verdict_cache.get(
+                        verdict_key,
+                        response.get("fingerprint"),
+                        out_curie,
+                        asset.expected_output,
+                    )
+                    if verdict is not None:
+                        # same results as last run, same verdict
+                        report.result[agent] = verdict
+                        continue
+                new_verdicts[agent] = verdict_key
+            if task is not None:
+                pending_analyses[agent] = analysis_pool.submit(task)
+                continue
+            if "response" not in response or "message" not in response["response"]:
+                agent_report.status = AgentStatus.FAILED
+                agent_report.message = "Test Error"
+                continue
+        except Exception as e:
+            logger.warning(f"Failed to parse basic response fields from {agent}: {e}")
+            agent_report.status = AgentStatus.FAILED
+            agent_report.message = "Test Error"
+        try:
+            if (
+                response["response"]["message"].get("results") is None
+                or len(response["response"]["message"]["results"]) == 0
+            ):
+                agent_report.status = AgentStatus.NO_RESULTS
+                agent_report.message = "No results"
+                continue
+            if isinstance(test, PathfinderTestCase) and isinstance(
+                asset, PathfinderTestAsset
+            ):
+                pathfinder_pass_fail_analysis(
+                    report.result,
+                    agent,
+                    response["response"]["message"],
+                    path_node_index.path_nodes,
+                    asset.minimum_required_path_nodes,
+                    all_results=args.get("pathfinder_all_results", False),
+                    index=path_node_index,
+                )
+            elif isinstance(asset, TestAsset):
+                index_key = (test_asset_hash, agent)
+                if index_key not in result_indexes:
+                    result_indexes[index_key] = ResultIndex(
+                        response["response"]["message"]["results"],
+                        curies,
+                    )
+                run_acceptance_pass_fail_analysis(
+                    report.result,
+                    agent,
+                    response["response"]["message"]["results"],
+                    out_curie,
+                    asset.expected_output,
+                    index=result_indexes[index_key],
+                )
+        except Exception as e:
+            logger.error(f"Failed to run acceptance test analysis on {agent}: {e}")
+            agent_report.status = AgentStatus.FAILED
+            agent_report.message = "Test Error"
+
+    for agent, analysis in pending_analyses.items():
+        try:
+            report.result[agent], error, counts = analysis.result()
+            test_query["responses"][agent].update(counts)
+        except Exception as e:
+            report.result[agent].status = AgentStatus.FAILED
+            report.result[agent].message = "Test Error"
+            error = str(e)
+        if error is not None:
+            logger.error(f"Failed to run acceptance test analysis on {agent}: {error}")
+
+    for agent, verdict_key in new_verdicts.items():
+        fingerprint = test_query["responses"][agent].get("fingerprint")
+        if (
+            agent in pending_analyses
+            and verdict_cache.get(
+                verdict_key, fingerprint, out_curie, asset.expected_output
+            )
+            is not None
+        ):
+            # the worker took the verdict of the last run
+            continue
+        verdict_cache.put(
+            verdict_key,
+            fingerprint,
+            out_curie,
+            asset.expected_output,
+            report.result[agent],
+        )
+
+    if validation_pool is not None:
+        report.validation = {}
+    for agent, validation in pending_validations.items():
+        try:
+            report.validation[agent] = validation.result()
+        except Exception as e:
+            report.validation[agent] = ValidationSummary(
+                args["trapi_version"], failure=str(e)
+            )
+    return report
 
 
 def run_tests(
@@ -38,315 +359,347 @@ def run_tests(
     collector: ResultCollector,
     logger: logging.Logger = logging.getLogger(__name__),
     args: Dict[str, Any] = {},
+    query_runner: Optional[QueryRunner] = None,
 ) -> None:
-    """Send tests through the Test Runners."""
-    logger.info(f"Running {len(tests)} queries...")
-    query_runner = QueryRunner(logger)
-    logger.info("Runner is getting service registry")
-    query_runner.retrieve_registry(trapi_version=args["trapi_version"])
-    # loop over all tests
-    for test in tqdm(list(tests.values())):
-        # check if acceptance test
-        if not test.test_assets or not test.test_case_objective:
-            logger.warning(f"Test has missing required fields: {test.id}")
-            continue
-
-        query_responses = {}
-        if test.test_case_objective == "AcceptanceTest":
-            query_responses, normalized_curies = query_runner.run_queries(test)
-            test_ids = []
+    """Send tests through the Test Runners.
 
-            for asset in test.test_assets:
-                # throw out any assets with unsupported expected outputs, i.e. OverlyGeneric
-                if asset.expected_output not in collector.query_types:
-                    logger.warning(
-                        f"Asset id {asset.id} has unsupported expected output."
-                    )
-                    continue
-                # create test in Test Dashboard
-                test_id = ""
-                try:
-                    test_id = reporter.create_test(test, asset)
-                    test_ids.append(test_id)
-                except Exception:
-                    logger.error(f"Failed to create test: {test.id}")
-                    continue
+    A ``query_runner`` that already has a probed registry (eg from the
+    pre-flight checks) is reused as is.
+    """
+    logger.info(f"Running {len(tests)} queries...")
+    probed = query_runner is not None
+    if query_runner is None:
+        query_runner = get_query_runner(logger, args)
+    analysis_pool = None
+    validation_pool = None
+    verdict_cache = None
+    # the spool, connection pools, worker pools and cassette are released
+    # however the run ends
+    try:
+        if not probed:
+            logger.info("Runner is getting service registry")
+            query_runner.retrieve_registry(trapi_version=args["trapi_version"])
+            logger.info("Runner is probing registry endpoints")
+            query_runner.probe_registry(tests.values())
+        if not args.get("wait_for_all_agents", False):
+            # stop polling the ARS once the agents we report on are done
+            query_runner.required_agents = set(
+                args.get("required_agents") or collector.agents
+            )
+        if not args.get("keep_responses", False):
+            # never hold the payloads of agents that aren't reported on
+            query_runner.retained_agents = set(collector.agents).union(
+                args.get("required_agents") or []
+            )
+        # every analysis index of the run shares one table of curies
+        curies = CurieTable()
+        analysis_pool = (
+            AnalysisPool(args["analysis_workers"])
+            if args.get("analysis_workers")
+            else None
+        )
+        validation_pool = (
+            ValidationPool(args["validation_workers"], args["trapi_version"])
+            if args.get("validation_workers")
+            else None
+        )
+        verdict_cache = (
+            VerdictCache(args["verdict_cache"], logger)
+            if args.get("verdict_cache")
+            else None
+        )
+        # loop over all tests
+        for test in tqdm(list(tests.values())):
+            # check if acceptance test
+            if not test.test_assets or not test.test_case_objective:
+                logger.warning(f"Test has missing required fields: {test.id}")
+                continue
 
-                test_asset_hash = hash_test_asset(asset)
-                test_query = query_responses.get(test_asset_hash)
-                if test_query is not None:
-                    message = json.dumps(test_query["query"], indent=4)
-                else:
-                    message = "Unable to retrieve response for test asset."
-                reporter.upload_log(
-                    test_id,
-                    message,
+            query_responses = {}
+            if test.test_case_objective == "AcceptanceTest":
+                query_responses, normalized_curies = query_runner.run_queries(test)
+                lifecycles = [
+                    query["lifecycle"]
+                    for query in query_responses.values()
+                    if query.get("lifecycle") is not None
+                ]
+                collector.collect_early_completion(test.id, lifecycles)
+                for lifecycle in lifecycles:
+                    collector.collect_query_timings(lifecycle["timings"])
+                test_ids = []
+                # assets sharing a query share its responses, so they're only
+                # indexed once and summarized after the last of them
+                result_indexes: Dict[Tuple[int, str], ResultIndex] = {}
+                # the latest report of each query, to summarize its responses with
+                asset_reports: Dict[int, TestReport] = {}
+                remaining_assets = Counter(
+                    hash_test_asset(asset)
+                    for asset in test.test_assets
+                    if asset.expected_output in collector.query_types
                 )
 
-                if test_query is not None:
-                    report = TestReport(
-                        pks=test_query["pks"],
-                        result={},
-                        test_details=None,
-                    )
-                    if isinstance(test, PathfinderTestCase) and isinstance(
-                        asset, PathfinderTestAsset
-                    ):
-                        report.test_details = {
-                            "minimum_required_path_nodes": asset.minimum_required_path_nodes,
-                            "expected_path_nodes": "; ".join(
-                                [
-                                    ",".join(
-                                        [
-                                            normalized_curies[path_node_id]
-                                            for path_node_id in path_node.ids
-                                        ]
-                                    )
-                                    for path_node in asset.path_nodes
-                                ]
-                            ),
-                        }
-                    for agent, response in test_query["responses"].items():
-                        report.result[agent] = AgentReport(
-                            status=AgentStatus.SKIPPED,
-                            message=None,
-                            actual_output=None,
+                for asset in test.test_assets:
+                    # throw out any assets with unsupported expected outputs, i.e. OverlyGeneric
+                    if asset.expected_output not in collector.query_types:
+                        logger.warning(
+                            f"Asset id {asset.id} has unsupported expected output."
                         )
-                        agent_report = report.result[agent]
+                        continue
+                    test_asset_hash = hash_test_asset(asset)
+                    test_query = query_responses.get(test_asset_hash)
+                    try:
+                        # create test in Test Dashboard
+                        test_id = ""
                         try:
-                            if response["status_code"] > 299:
-                                agent_report.status = AgentStatus.FAILED
-                                if str(response["status_code"]) == "598":
-                                    agent_report.message = "Timed out"
+                            test_id = reporter.create_test(test, asset)
+                            test_ids.append(test_id)
+                        except Exception:
+                            logger.error(f"Failed to create test: {test.id}")
+                            continue
+
+                        if test_query is not None:
+                            message = json_codec.dumps(test_query["query"], indent=4)
+                        else:
+                            message = "Unable to retrieve response for test asset."
+                        reporter.upload_log(
+                            test_id,
+                            message,
+                        )
+
+                        if test_query is not None:
+                            report = analyze_test_asset(
+                                test,
+                                asset,
+                                test_query,
+                                normalized_curies,
+                                curies,
+                                logger,
+                                args,
+                                result_indexes=result_indexes,
+                                analysis_pool=analysis_pool,
+                                validation_pool=validation_pool,
+                                verdict_cache=verdict_cache,
+                            )
+
+                            asset_reports[test_asset_hash] = report
+
+                            # The overall test status is driven by ARS. If ARS didn't
+                            # produce a result, the whole test is considered skipped.
+                            if "ars" not in report.result:
+                                status = AgentStatus.SKIPPED
+                            else:
+                                status = report.result["ars"].status
+
+                            # When the test is skipped, every agent is skipped too: the
+                            # query never really ran, so the incidental per-ARA
+                            # error/no-result statuses would be misleading. Force them
+                            # all to SKIPPED so the radiator labels, CSV, and JSON stats
+                            # stay consistent with the skipped test-level status.
+                            force_skipped = status == AgentStatus.SKIPPED
+
+                            collector.collect_acceptance_result(
+                                test,
+                                asset,
+                                report,
+                                test_query["pks"].get("parent_pk"),
+                                f"{reporter.base_path}/test-runs/{reporter.test_run_id}/tests/{test_id}",
+                                force_skipped=force_skipped,
+                            )
+
+                            try:
+                                if force_skipped:
+                                    labels = [
+                                        {
+                                            "key": ara,
+                                            "value": AgentStatus.SKIPPED.value,
+                                        }
+                                        for ara in collector.agents
+                                    ]
                                 else:
-                                    agent_report.message = (
-                                        f"Status code: {response['status_code']}"
-                                    )
-                                continue
-                            elif (
-                                "response" not in response
-                                or "message" not in response["response"]
-                            ):
-                                agent_report.status = AgentStatus.FAILED
-                                agent_report.message = "Test Error"
-                                continue
-                        except Exception as e:
-                            logger.warning(
-                                f"Failed to parse basic response fields from {agent}: {e}"
+                                    labels = [
+                                        {
+                                            "key": ara,
+                                            "value": report.result[ara].status.value,
+                                        }
+                                        for ara in collector.agents
+                                        if ara in report.result
+                                    ]
+                                reporter.upload_labels(test_id, labels)
+                            except Exception as e:
+                                logger.warning(
+                                    f"[{test.id}] failed to upload labels: {e}"
+                                )
+                            report_json = json_codec.dumps(report.to_dict(), indent=4)
+                            logger.info(f"Full report: {report_json}")
+                            reporter.upload_log(test_id, report_json)
+                        else:
+                            # No query response for this asset (eg query generation
+                            # failed). Record it as skipped across every agent so it
+                            # still appears in the per-agent stats, CSV, and radiator
+                            # labels as SKIPPED instead of being dropped entirely.
+                            status = AgentStatus.SKIPPED
+                            collector.collect_acceptance_result(
+                                test,
+                                asset,
+                                TestReport(pks={}, result={}, test_details=None),
+                                None,
+                                f"{reporter.base_path}/test-runs/{reporter.test_run_id}/tests/{test_id}",
+                                force_skipped=True,
                             )
-                            agent_report.status = AgentStatus.FAILED
-                            agent_report.message = "Test Error"
-                        try:
-                            if (
-                                response["response"]["message"].get("results") is None
-                                or len(response["response"]["message"]["results"]) == 0
-                            ):
-                                agent_report.status = AgentStatus.NO_RESULTS
-                                agent_report.message = "No results"
-                                continue
-                            if isinstance(test, PathfinderTestCase) and isinstance(
-                                asset, PathfinderTestAsset
-                            ):
-                                pathfinder_pass_fail_analysis(
-                                    report.result,
-                                    agent,
-                                    response["response"]["message"],
+                            try:
+                                reporter.upload_labels(
+                                    test_id,
                                     [
-                                        [
-                                            normalized_curies[path_node_id]
-                                            for path_node_id in path_node.ids
-                                        ]
-                                        for path_node in asset.path_nodes
+                                        {"key": ara, "value": AgentStatus.SKIPPED.value}
+                                        for ara in collector.agents
                                     ],
-                                    asset.minimum_required_path_nodes,
                                 )
-                            elif isinstance(asset, TestAsset):
-                                run_acceptance_pass_fail_analysis(
-                                    report.result,
-                                    agent,
-                                    response["response"]["message"]["results"],
-                                    (
-                                        normalized_curies.get(asset.output_id, "")
-                                        if asset.output_id is not None
-                                        else ""
-                                    ),
-                                    asset.expected_output,
+                            except Exception as e:
+                                logger.warning(
+                                    f"[{test.id}] failed to upload labels: {e}"
                                 )
-                        except Exception as e:
-                            logger.error(
-                                f"Failed to run acceptance test analysis on {agent}: {e}"
-                            )
-                            agent_report.status = AgentStatus.FAILED
-                            agent_report.message = "Test Error"
-
-                    # The overall test status is driven by ARS. If ARS didn't
-                    # produce a result, the whole test is considered skipped.
-                    if "ars" not in report.result:
-                        status = AgentStatus.SKIPPED
-                    else:
-                        status = report.result["ars"].status
-
-                    # When the test is skipped, every agent is skipped too: the
-                    # query never really ran, so the incidental per-ARA
-                    # error/no-result statuses would be misleading. Force them
-                    # all to SKIPPED so the radiator labels, CSV, and JSON stats
-                    # stay consistent with the skipped test-level status.
-                    force_skipped = status == AgentStatus.SKIPPED
-
-                    collector.collect_acceptance_result(
-                        test,
-                        asset,
-                        report,
-                        test_query["pks"].get("parent_pk"),
-                        f"{reporter.base_path}/test-runs/{reporter.test_run_id}/tests/{test_id}",
-                        force_skipped=force_skipped,
-                    )
 
+                        reporter.finish_test(test_id, status.value)
+                        collector.acceptance_report[status.value] += 1
+                    finally:
+                        # counted however the asset went (even if its test
+                        # couldn't be created), so the last one sharing a query
+                        # always gets to release the raw responses
+                        remaining_assets[test_asset_hash] -= 1
+                        if (
+                            test_query is not None
+                            and not args.get("keep_responses", False)
+                            and remaining_assets[test_asset_hash] <= 0
+                        ):
+                            # the raw responses aren't needed past their analysis
+                            report = asset_reports.get(test_asset_hash)
+                            for agent, response in test_query["responses"].items():
+                                test_query["responses"][agent] = summarize_response(
+                                    response,
+                                    report.result.get(agent) if report else None,
+                                )
+                                result_indexes.pop((test_asset_hash, agent), None)
+                # after the analysis, which is when spooled responses get counted
+                for query in query_responses.values():
+                    collector.collect_query_payloads(query["responses"])
+            elif test.test_case_objective == "QuantitativeTest":
+                # create test in Test Dashboard
+                test_ids = []
+                for asset in test.test_assets:
+                    test_id = ""
                     try:
-                        if force_skipped:
-                            labels = [
-                                {
-                                    "key": ara,
-                                    "value": AgentStatus.SKIPPED.value,
-                                }
-                                for ara in collector.agents
-                            ]
-                        else:
-                            labels = [
-                                {
-                                    "key": ara,
-                                    "value": report.result[ara].status.value,
-                                }
-                                for ara in collector.agents
-                                if ara in report.result
-                            ]
-                        reporter.upload_labels(test_id, labels)
+                        test_id = reporter.create_test(test, asset)
+                        test_ids.append(test_id)
                     except Exception as e:
-                        logger.warning(f"[{test.id}] failed to upload labels: {e}")
-                    logger.info(f"Full report: {json.dumps(asdict(report), indent=4)}")
-                    reporter.upload_log(test_id, json.dumps(asdict(report), indent=4))
-                else:
-                    # No query response for this asset (eg query generation
-                    # failed). Record it as skipped across every agent so it
-                    # still appears in the per-agent stats, CSV, and radiator
-                    # labels as SKIPPED instead of being dropped entirely.
-                    status = AgentStatus.SKIPPED
-                    collector.collect_acceptance_result(
-                        test,
-                        asset,
-                        TestReport(pks={}, result={}, test_details=None),
-                        None,
-                        f"{reporter.base_path}/test-runs/{reporter.test_run_id}/tests/{test_id}",
-                        force_skipped=True,
-                    )
-                    try:
-                        reporter.upload_labels(
+                        logger.error(f"Failed to create test: {test.id}", e)
+                        continue
+
+                    if isinstance(test, PerformanceTestCase):
+                        test_query = generate_query(asset)
+                        if test_query is not None:
+                            message = json_codec.dumps(test_query, indent=2)
+                        else:
+                            message = "Unable to retrieve response for test asset."
+                        reporter.upload_log(
                             test_id,
-                            [
-                                {"key": ara, "value": AgentStatus.SKIPPED.value}
-                                for ara in collector.agents
-                            ],
+                            message,
                         )
-                    except Exception as e:
-                        logger.warning(f"[{test.id}] failed to upload labels: {e}")
-
-                reporter.finish_test(test_id, status.value)
-                collector.acceptance_report[status.value] += 1
-        elif test.test_case_objective == "QuantitativeTest":
-            # create test in Test Dashboard
-            test_ids = []
-            for asset in test.test_assets:
-                test_id = ""
-                try:
-                    test_id = reporter.create_test(test, asset)
-                    test_ids.append(test_id)
-                except Exception as e:
-                    logger.error(f"Failed to create test: {test.id}", e)
-                    continue
-
-                if isinstance(test, PerformanceTestCase):
-                    test_query = generate_query(asset)
-                    if test_query is not None:
-                        message = json.dumps(test_query, indent=2)
-                    else:
-                        message = "Unable to retrieve response for test asset."
-                    reporter.upload_log(
-                        test_id,
-                        message,
-                    )
-                    # Give the performance test a terminal status in the
-                    # Information Radiator. Without this the test is created
-                    # but never finished, so it shows up as perpetually
-                    # incomplete in the dashboard.
-                    status = AgentStatus.PASSED
-                    if test_query is None:
-                        logger.error(
-                            f"Unable to generate performance query for asset: {asset.id}"
+                        # Give the performance test a terminal status in the
+                        # Information Radiator. Without this the test is created
+                        # but never finished, so it shows up as perpetually
+                        # incomplete in the dashboard.
+                        status = AgentStatus.PASSED
+                        # pick the lowest latency reachable server for this target
+                        service = query_runner.get_fastest_service(
+                            test.test_env, test.components[0]
                         )
-                        status = AgentStatus.FAILED
-                    else:
-                        host = query_runner.registry[env_map[test.test_env]][
-                            test.components[0]
-                        ][0]["url"]
-                        try:
-                            results = run_performance_test(test, test_query, host)
-                            collector.collect_performance_result(
-                                test,
-                                asset,
-                                f"{reporter.base_path}/test-runs/{reporter.test_run_id}/tests/{test_id}",
-                                host,
-                                results,
+                        if test_query is None:
+                            logger.error(
+                                f"Unable to generate performance query for asset: {asset.id}"
                             )
-                        except Exception as e:
+                            status = AgentStatus.FAILED
+                        elif service is None:
                             logger.error(
-                                f"Failed to run performance test for {test.id}: {e}"
+                                f"No reachable {test.components[0]} endpoint for {test.id}"
                             )
                             status = AgentStatus.FAILED
-                    reporter.finish_test(test_id, status.value)
-            # try:
-            #     test_inputs = [
-            #         assets.id,
-            #         # TODO: update this. Assumes is going to be ARS
-            #         test.components[0],
-            #     ]
-            #     await reporter.upload_log(
-            #         test_id,
-            #         f"Calling Benchmark Test Runner with: {json.dumps(test_inputs, indent=4)}",
-            #     )
-            #     benchmark_results, screenshots = await run_benchmarks(*test_inputs)
-            #     await reporter.upload_log(test_id, ("\n").join(benchmark_results))
-            #     # ex:
-            #     # {
-            #     #   "aragorn": {
-            #     #     "precision": screenshot
-            #     #   }
-            #     # }
-            #     for target_screenshots in screenshots.values():
-            #         for screenshot in target_screenshots.values():
-            #             await reporter.upload_screenshot(test_id, screenshot)
-            #     await reporter.finish_test(test_id, "PASSED")
-            #     collector.full_report["PASSED"] += 1
-            # except Exception as e:
-            #     logger.error(f"Benchmarks failed with {e}: {traceback.format_exc()}")
-            #     collector.full_report["FAILED"] += 1
-            #     try:
-            #         await reporter.upload_log(test_id, traceback.format_exc())
-            #     except Exception:
-            #         logger.error(
-            #             f"Failed to upload fail logs for test {test_id}: {traceback.format_exc()}"
-            #         )
-            #     await reporter.finish_test(test_id, "FAILED")
-        else:
-            try:
-                test_id = reporter.create_test(test, test.test_assets[0])
-                logger.error(f"Unsupported test type: {test.id}")
-                reporter.upload_log(
-                    test_id, f"Unsupported test type in test: {test.id}"
-                )
-                status = "FAILED"
-                reporter.finish_test(test_id, status)
-            except Exception:
-                logger.error(f"Failed to report errors with: {test.id}")
+                        else:
+                            host = service["url"]
+                            try:
+                                results = run_performance_test(test, test_query, host)
+                                collector.collect_performance_result(
+                                    test,
+                                    asset,
+                                    f"{reporter.base_path}/test-runs/{reporter.test_run_id}/tests/{test_id}",
+                                    host,
+                                    results,
+                                )
+                            except Exception as e:
+                                logger.error(
+                                    f"Failed to run performance test for {test.id}: {e}"
+                                )
+                                status = AgentStatus.FAILED
+                        reporter.finish_test(test_id, status.value)
+                # try:
+                #     test_inputs = [
+                #         assets.id,
+                #         # TODO: update this. Assumes is going to be ARS
+                #         test.components[0],
+                #     ]
+                #     await reporter.upload_log(
+                #         test_id,
+                #         f"Calling Benchmark Test Runner with: {json.dumps(test_inputs, indent=4)}",
+                #     )
+                #     benchmark_results, screenshots = await run_benchmarks(*test_inputs)
+                #     await reporter.upload_log(test_id, ("\n").join(benchmark_results))
+                #     # ex:
+                #     # {
+                #     #   "aragorn": {
+                #     #     "precision": screenshot
+                #     #   }
+                #     # }
+                #     for target_screenshots in screenshots.values():
+                #         for screenshot in target_screenshots.values():
+                #             await reporter.upload_screenshot(test_id, screenshot)
+                #     await reporter.finish_test(test_id, "PASSED")
+                #     collector.full_report["PASSED"] += 1
+                # except Exception as e:
+                #     logger.error(f"Benchmarks failed with {e}: {traceback.format_exc()}")
+                #     collector.full_report["FAILED"] += 1
+                #     try:
+                #         await reporter.upload_log(test_id, traceback.format_exc())
+                #     except Exception:
+                #         logger.error(
+                #             f"Failed to upload fail logs for test {test_id}: {traceback.format_exc()}"
+                #         )
+                #     await reporter.finish_test(test_id, "FAILED")
+            else:
+                try:
+                    test_id = reporter.create_test(test, test.test_assets[0])
+                    logger.error(f"Unsupported test type: {test.id}")
+                    reporter.upload_log(
+                        test_id, f"Unsupported test type in test: {test.id}"
+                    )
+                    status = "FAILED"
+                    reporter.finish_test(test_id, status)
+                except Exception:
+                    logger.error(f"Failed to report errors with: {test.id}")
+
+            # delete this big object to help out the garbage collector
+            del query_responses
 
-        # delete this big object to help out the garbage collector
-        del query_responses
+        collector.collect_runner_stats(query_runner.get_stats())
+        if verdict_cache is not None:
+            collector.collect_runner_stats({"verdicts": verdict_cache.to_dict()})
+    finally:
+        if verdict_cache is not None:
+            verdict_cache.save()
+        query_runner.close()
+        if analysis_pool is not None:
+            analysis_pool.close()
+        if validation_pool is not None:
+            logger.info(
+                f"Validated {validation_pool.tasks} responses, "
+                f"{validation_pool.cache_hits} more were already validated"
+            )
+            validation_pool.close()
@@ -0,0 +1,588 @@
+"""Lifecycle of a single ARS query as an explicit state machine."""
+
+import hashlib
+import logging
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from test_harness import json_codec
+from test_harness.runner.circuit_breaker import CIRCUIT_OPEN_STATUS, CircuitOpenError
+from test_harness.runner.response_store import (
+    ResponseStore,
+    SpooledBody,
+    body_digest,
+    body_size,
+    discard_payload,
+    dump_entry,
+    load_body,
+    load_entry,
+)
+
+MAX_QUERY_TIME = 600
+MAX_ARA_TIME = 360
+# Seconds between two status polls of an ARS message.
+POLL_INTERVAL = 10
+# Seconds to wait after submitting to the ARS before asking for its children.
+ARS_TRACE_DELAY = 10
+# Status code given to agents that weren't waited for because the test case
+# didn't need them, see ARSQuery.required_agents.
+NOT_WAITED_STATUS = 596
+TERMINAL_STATUSES = ("Done", "Error")
+# Key of the TRAPI response in the fields of an ARS message.
+DATA_KEY = re.compile(rb'"data"\s*:')
+
+
+def empty_response(status_code: int) -> dict:
+    """Response entry of a component that didn't give any results."""
+    return {
+        "response": {"message": {"results": []}},
+        "status_code": status_code,
+    }
+
+
+def count_results(response: Any) -> int:
+    """Number of results in a TRAPI response."""
+    if not isinstance(response, dict):
+        return 0
+    return len((response.get("message") or {}).get("results") or [])
+
+
+def fingerprint_results(response: Any) -> Optional[str]:
+    """Hash of the ordered results of a TRAPI response.
+
+    Covers the node bindings and scores of every result, which is all the
+    acceptance analysis looks at, so responses with the same fingerprint get
+    the same verdicts.
+    """
+    try:
+        results = response["message"]["results"]
+        if not results:
+            return None
+        fingerprint = hashlib.blake2b(digest_size=16)
+        for result in results:
+            fingerprint.update(
+                json_codec.dumps_bytes(
+                    [
+                        [
+                            [key, [binding["id"] for binding in bindings]]
+                            for key, bindings in sorted(result["node_bindings"].items())
+                        ],
+                        {
+                            key: result[key]
+                            for key in ("sugeno", "rank")
+                            if key in result
+                        },
+                        [analysis.get("score") for analysis in result["analyses"]],
+                    ]
+                )
+            )
+        return fingerprint.hexdigest()
+    except Exception:
+        # not something the analysis could make sense of either
+        return None
+
+
+def count_response(entry: dict, response: Any):
+    """Fill in the result count and fingerprint of an entry from its response.
+
+    For spooled responses, which are only counted once loaded to be analyzed.
+    """
+    entry["result_count"] = count_results(response)
+    entry["fingerprint"] = fingerprint_results(response)
+
+
+def load_ars_message(content: Union[bytes, SpooledBody]) -> dict:
+    """Decode an ARS message, leaving the data of a streamed one on disk.
+
+    The ARS serializes the status and code of a message ahead of its data,
+    so only the head of a message streamed to disk is decoded, up to its
+    data. The whole message is decoded if the head doesn't hold all of that.
+    """
+    if not isinstance(content, SpooledBody):
+        return load_body(content)
+    match = DATA_KEY.search(content.head)
+    if match is not None:
+        try:
+            message = json_codec.loads(content.head[: match.end()] + b"null}}")
+            fields = message["fields"]
+            if {"status", "code", "data"} <= fields.keys():
+                return message
+        except Exception:
+            pass
+    return content.load()
+
+
+def format_ars_message(
+    message: dict,
+    size: Optional[int] = None,
+    content: Union[bytes, SpooledBody, None] = None,
+    store: Optional[ResponseStore] = None,
+) -> dict:
+    """Response entry of a (child or merged) ARS message of ``size`` bytes.
+
+    Given its raw ``content`` and a ``store``, a big enough message is
+    spooled to disk and the entry only holds its handle. Content that was
+    streamed to disk already is never written twice, nor loaded: its result
+    count and fingerprint are only filled in once it's analyzed.
+    """
+    fields = message.get("fields", {})
+    if isinstance(content, SpooledBody):
+        return {
+            "response": content.handle.at(("fields", "data")),
+            "status_code": fields.get("code", 410),
+            "bytes": size,
+            "result_count": None,
+            "digest": content.digest,
+            "fingerprint": None,
+        }
+    data = fields.get("data", {"message": {"results": []}})
+    entry = {
+        "response": data,
+        "status_code": fields.get("code", 410),
+        "bytes": size,
+        "result_count": count_results(data),
+        "digest": body_digest(content) if content is not None else None,
+        "fingerprint": fingerprint_results(data),
+    }
+    if store is not None and content is not None and store.should_spool(len(content)):
+        entry["response"] = store.put(content, ("fields", "data"))
+    return entry
+
+
+class ARSState(str, Enum):
+    # submitted, waiting for the ARS to register the children
+    SUBMITTED = "SUBMITTED"
+    POLLING_CHILDREN = "POLLING_CHILDREN"
+    POLLING_MERGED = "POLLING_MERGED"
+    FETCHING_MERGED = "FETCHING_MERGED"
+    RETAINING = "RETAINING"
+    DONE = "DONE"
+
+
+@dataclass
+class ARSRequest:
+    """Next request an ARS query needs sent on its behalf."""
+
+    method: str
+    url: str
+    idempotent: bool
+    # what the response holds, for the runner's memory budget
+    kind: str
+    # agent whose message the response is, if any
+    agent: Optional[str] = None
+
+    @property
+    def is_poll(self) -> bool:
+        """Whether this is a status poll, see POLL_RATE_LIMITS."""
+        return self.kind in ("trace", "child")
+
+
+class ARSQuery:
+    """State machine of an ARS query, from submitted parent pk to retained.
+
+    The query never sends requests or sleeps itself: a driver asks for the
+    ``next_request`` once ``wake_at`` has passed, sends it and feeds the
+    decoded body (``handle_response``) or exception (``handle_error``) back.
+    That lets one scheduler advance any number of queries at once, and since
+    every field is plain data an interrupted query can be saved with
+    ``to_dict`` and resumed from its last state with ``from_dict``.
+
+    Given ``required_agents``, children outside of it are never polled and the
+    merged message is only waited for if "ars" is in it. Those agents get a
+    NOT_WAITED_STATUS response instead. Given ``retained_agents``, the
+    responses of agents outside of it only keep their status and size.
+    """
+
+    def __init__(
+        self,
+        parent_pk: str,
+        base_url: str,
+        logger: logging.Logger = logging.getLogger(__name__),
+        submitted_at: Optional[float] = None,
+        required_agents: Optional[Iterable[str]] = None,
+        store: Optional[ResponseStore] = None,
+        retained_agents: Optional[Iterable[str]] = None,
+    ):
+        self.parent_pk = parent_pk
+        self.store = store
+        self.base_url = base_url
+        self.logger = logger
+        self.poll_interval = POLL_INTERVAL
+        self.max_ara_time = MAX_ARA_TIME
+        self.max_query_time = MAX_QUERY_TIME
+        submitted_at = submitted_at if submitted_at is not None else time.time()
+        self.state = ARSState.SUBMITTED
+        # epoch seconds the query wants to be advanced at
+        self.wake_at = submitted_at + ARS_TRACE_DELAY
+        self.transitions: List[Dict[str, Any]] = [
+            {"state": ARSState.SUBMITTED.value, "timestamp": submitted_at}
+        ]
+        self.children: List[Dict[str, Any]] = []
+        # child polled next, and when the round of polls it's in started
+        self.child_index = 0
+        self.round_started_at: Optional[float] = None
+        self.parent_status: Optional[str] = None
+        self.merge_started_at: Optional[float] = None
+        self.required_agents = (
+            sorted(required_agents) if required_agents is not None else None
+        )
+        self.retained_agents = (
+            sorted(retained_agents) if retained_agents is not None else None
+        )
+        self.skipped_agents: List[str] = []
+        # deadlines of the waits that were skipped while still pending
+        self.pending_skips: Dict[str, float] = {}
+        self.time_saved = 0.0
+        self.responses: Dict[str, dict] = {}
+        self.pks: Dict[str, str] = {"parent_pk": parent_pk}
+
+    @property
+    def done(self) -> bool:
+        return self.state == ARSState.DONE
+
+    def _transition(self, state: ARSState, now: float):
+        self.state = state
+        self.wake_at = now
+        self.transitions.append({"state": state.value, "timestamp": now})
+        if state == ARSState.RETAINING and self.pending_skips:
+            # the waits we'd otherwise still be in, up to their deadlines
+            self.time_saved = max(0.0, max(self.pending_skips.values()) - now)
+
+    def _is_required(self, agent: str) -> bool:
+        return self.required_agents is None or agent in self.required_agents
+
+    def _skip(self, agent: str, pending: bool, deadline: float):
+        """Don't wait for an agent the test case doesn't need."""
+        self.skipped_agents.append(agent)
+        self.responses[agent] = empty_response(NOT_WAITED_STATUS)
+        if pending:
+            self.pending_skips[agent] = deadline
+
+    def next_request(self) -> Optional[ARSRequest]:
+        """The request to send when advancing this query, None once it's done."""
+        messages_url = f"{self.base_url}/ars/api/messages"
+        if self.state in (ARSState.SUBMITTED, ARSState.POLLING_MERGED):
+            return ARSRequest(
+                "GET", f"{messages_url}/{self.parent_pk}?trace=y", True, "trace"
+            )
+        if self.state == ARSState.POLLING_CHILDREN:
+            child = self.children[self.child_index]
+            return ARSRequest(
+                "GET", f"{messages_url}/{child['pk']}", True, "child", child["infores"]
+            )
+        if self.state == ARSState.FETCHING_MERGED:
+            return ARSRequest(
+                "GET", f"{messages_url}/{self.pks['ars']}", True, "merged", "ars"
+            )
+        if self.state == ARSState.RETAINING:
+            return ARSRequest(
+                "POST",
+                f"{self.base_url}/ars/api/retain/{self.parent_pk}",
+                False,
+                "retain",
+            )
+        return None
+
+    def handle_response(
+        self,
+        body: dict,
+        now: Optional[float] = None,
+        content: Union[bytes, SpooledBody, None] = None,
+    ):
+        """Advance the query with the decoded body of its last request.
+
+        The raw ``content`` (or where it was streamed to on disk) is used for
+        the response sizes and, with a ``store``, to spool big agent responses.
+        """
+        now = now if now is not None else time.time()
+        if self.state == ARSState.SUBMITTED:
+            self.parent_status = body.get("status")
+            for child in body.get("children", []):
+                infores = child["actor"]["inforesid"].split("infores:")[1]
+                self.pks[infores] = child["message"]
+                if not self._is_required(infores):
+                    self._skip(
+                        infores,
+                        child.get("status") not in TERMINAL_STATUSES,
+                        now + self.max_ara_time,
+                    )
+                    continue
+                self.children.append(
+                    {
+                        "infores": infores,
+                        "pk": child["message"],
+                        "status": 500,
+                        # children are polled side by side, so they all
+                        # get their time from now on
+                        "started_at": now,
+                        "finished_at": None,
+                    }
+                )
+                self.logger.info(f"Getting response for {infores}...")
+            self.merge_started_at = now
+            self._poll_next_child(now)
+        elif self.state == ARSState.POLLING_CHILDREN:
+            self._handle_child(body, now, content)
+        elif self.state == ARSState.POLLING_MERGED:
+            self._handle_merged_status(body, now)
+        elif self.state == ARSState.FETCHING_MERGED:
+            self.responses["ars"] = self._format("ars", body, content)
+            self.logger.info("Got ARS merged message!")
+            self._transition(ARSState.RETAINING, now)
+        elif self.state == ARSState.RETAINING:
+            if not body.get("success"):
+                self.logger.error(f"Failed to retain the query response: {body}")
+            self._transition(ARSState.DONE, now)
+
+    def handle_error(self, error: Exception, now: Optional[float] = None):
+        """Advance the query past a failed request.
+
+        Errors on the trace can't be recovered from and are raised again. A
+        failed retain (fast-failed or not) is only logged, the responses
+        collected so far are kept.
+        """
+        now = now if now is not None else time.time()
+        if self.state == ARSState.POLLING_CHILDREN:
+            child = self.children[self.child_index]
+            if isinstance(error, CircuitOpenError):
+                self.logger.warning(f"Stopped polling {child['infores']}: {error}")
+                self.responses[child["infores"]] = empty_response(CIRCUIT_OPEN_STATUS)
+            else:
+                self.logger.error(
+                    f"Getting ARS child response ({child['infores']}) failed with: {error}"
+                )
+                # child["status"] is the ARS status ("Running" etc) once polled
+                self.responses[child["infores"]] = empty_response(500)
+            self._finish_child(now)
+        elif self.state in (ARSState.POLLING_MERGED, ARSState.FETCHING_MERGED):
+            self.logger.warning(f"Failed to get ARS merged message: {error}")
+            self.pks["ars"] = "None"
+            self.responses["ars"] = empty_response(
+                CIRCUIT_OPEN_STATUS if isinstance(error, CircuitOpenError) else 500
+            )
+            self._transition(ARSState.RETAINING, now)
+        elif self.state == ARSState.RETAINING:
+            self.logger.error(f"Failed to retain the query response: {error}")
+            self._transition(ARSState.DONE, now)
+        else:
+            raise error
+
+    def _poll_next_child(self, now: float):
+        """Move on to the next child that isn't done yet.
+
+        Every pending child is polled once per round, and a round starts at
+        most once every poll interval, so a child's ``finished_at`` is within
+        a poll interval of when it finished however slow the others are.
+        """
+        pending = [
+            idx
+            for idx, child in enumerate(self.children)
+            if child["finished_at"] is None
+        ]
+        if not pending:
+            if self._is_required("ars"):
+                self._transition(ARSState.POLLING_MERGED, now)
+                return
+            self.logger.info(
+                f"Required agents of {self.parent_pk} are done, not waiting for the merged message."
+            )
+            self.pks["ars"] = "None"
+            self._skip(
+                "ars",
+                self.parent_status not in TERMINAL_STATUSES,
+                self.merge_started_at + self.max_query_time,
+            )
+            self._transition(ARSState.RETAINING, now)
+            return
+        if self.state != ARSState.POLLING_CHILDREN:
+            self._transition(ARSState.POLLING_CHILDREN, now)
+        later = [idx for idx in pending if idx > self.child_index]
+        if self.round_started_at is not None and later:
+            # the rest of this round goes out right away
+            self.child_index = later[0]
+            self.wake_at = now
+            return
+        self.child_index = pending[0]
+        if self.round_started_at is not None:
+            self.wake_at = max(now, self.round_started_at + self.poll_interval)
+        self.round_started_at = self.wake_at
+
+    def _finish_child(self, now: float):
+        self.children[self.child_index]["finished_at"] = now
+        self._poll_next_child(now)
+
+    def _format(
+        self, agent: str, body: dict, content: Union[bytes, SpooledBody, None]
+    ) -> dict:
+        size = body_size(content) if content is not None else None
+        if self.retained_agents is not None and agent not in self.retained_agents:
+            return discard_payload(format_ars_message(body, size))
+        return format_ars_message(body, size, content, self.store)
+
+    def _handle_child(
+        self, body: dict, now: float, content: Union[bytes, SpooledBody, None]
+    ):
+        child = self.children[self.child_index]
+        infores = child["infores"]
+        status = body.get("fields", {}).get("status")
+        child["status"] = status
+        if status == "Running":
+            self.logger.info(f"{infores} is still Running...")
+            if now - child["started_at"] <= self.max_ara_time:
+                self._poll_next_child(now)
+                return
+            self.logger.warning(
+                f"Timed out getting ARS child messages after {self.max_ara_time / 60} minutes."
+            )
+        elif status not in ("Done", "Error", "Unknown"):
+            self.logger.info(f"Got unhandled status: {status}")
+        response = self._format(infores, body, content)
+        self.logger.info(
+            f"Got reponse for {infores} with status code {response['status_code']}."
+        )
+        self.responses[infores] = response
+        self._finish_child(now)
+
+    def _handle_merged_status(self, body: dict, now: float):
+        status = body.get("status")
+        if status == "Done" or status == "Error":
+            # skipped children that finished by now didn't save any time
+            for child in body.get("children", []):
+                infores = child["actor"]["inforesid"].split("infores:")[1]
+                if child.get("status") in TERMINAL_STATUSES:
+                    self.pending_skips.pop(infores, None)
+            merged_pk = body.get("merged_version")
+            if merged_pk is None:
+                self.logger.error(
+                    f"Failed to get the ARS merged message from pk: {self.parent_pk}."
+                )
+                self.pks["ars"] = "None"
+                self.responses["ars"] = empty_response(410)
+                self._transition(ARSState.RETAINING, now)
+            else:
+                self.pks["ars"] = merged_pk
+                self._transition(ARSState.FETCHING_MERGED, now)
+        elif now - self.merge_started_at <= self.max_query_time:
+            self.logger.info("ARS merging not done, waiting...")
+            self.wake_at = now + self.poll_interval
+        else:
+            self.logger.warning(
+                f"ARS merging took greater than {self.max_query_time / 60} minutes."
+            )
+            self.pks["ars"] = "None"
+            self.responses["ars"] = empty_response(598)
+            self._transition(ARSState.RETAINING, now)
+
+    def timings(self) -> Dict[str, Any]:
+        """Seconds from submission to each milestone of this query.
+
+        Child times are when the poller saw the child in a terminal state,
+        within a poll interval of it getting there.
+        """
+        submitted_at = self.transitions[0]["timestamp"]
+
+        def since(timestamp: Optional[float]) -> Optional[float]:
+            if timestamp is None:
+                return None
+            return round(timestamp - submitted_at, 3)
+
+        reached = {
+            transition["state"]: transition["timestamp"]
+            for transition in self.transitions
+        }
+        merged_fetched = None
+        if ARSState.FETCHING_MERGED.value in reached and self.pks.get("ars") not in (
+            None,
+            "None",
+        ):
+            merged_fetched = reached.get(ARSState.RETAINING.value)
+        return {
+            "submitted_at": datetime.fromtimestamp(submitted_at)
+            .astimezone()
+            .isoformat(),
+            "first_trace": since(self.merge_started_at),
+            "agents": {
+                child["infores"]: since(child["finished_at"])
+                for child in self.children
+                if child["finished_at"] is not None
+            },
+            "merged_available": since(reached.get(ARSState.FETCHING_MERGED.value)),
+            "merged_fetched": since(merged_fetched),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Timings and early completion of this query, without the responses."""
+        return {
+            "parent_pk": self.parent_pk,
+            "state": self.state.value,
+            "timings": self.timings(),
+            "skipped_agents": list(self.skipped_agents),
+            "time_saved": self.time_saved,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable snapshot of this query, see from_dict."""
+        return {
+            "parent_pk": self.parent_pk,
+            "base_url": self.base_url,
+            "state": self.state.value,
+            "wake_at": self.wake_at,
+            "poll_interval": self.poll_interval,
+            "max_ara_time": self.max_ara_time,
+            "max_query_time": self.max_query_time,
+            "transitions": list(self.transitions),
+            "children": [dict(child) for child in self.children],
+            "child_index": self.child_index,
+            "round_started_at": self.round_started_at,
+            "parent_status": self.parent_status,
+            "merge_started_at": self.merge_started_at,
+            "required_agents": self.required_agents,
+            "retained_agents": self.retained_agents,
+            "skipped_agents": list(self.skipped_agents),
+            "pending_skips": dict(self.pending_skips),
+            "time_saved": self.time_saved,
+            "responses": {
+                agent: dump_entry(entry) for agent, entry in self.responses.items()
+            },
+            "pks": dict(self.pks),
+        }
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: Dict[str, Any],
+        logger: logging.Logger = logging.getLogger(__name__),
+        store: Optional[ResponseStore] = None,
+    ) -> "ARSQuery":
+        """Resume a query from a ``to_dict`` snapshot."""
+        query = cls(
+            data["parent_pk"],
+            data["base_url"],
+            logger,
+            required_agents=data["required_agents"],
+            store=store,
+            retained_agents=data.get("retained_agents"),
+        )
+        query.state = ARSState(data["state"])
+        query.wake_at = data["wake_at"]
+        query.poll_interval = data["poll_interval"]
+        query.max_ara_time = data["max_ara_time"]
+        query.max_query_time = data["max_query_time"]
+        query.transitions = list(data["transitions"])
+        query.children = [dict(child) for child in data["children"]]
+        query.child_index = data["child_index"]
+        query.round_started_at = data.get("round_started_at")
+        query.parent_status = data["parent_status"]
+        query.merge_started_at = data["merge_started_at"]
+        query.skipped_agents = list(data["skipped_agents"])
+        query.pending_skips = dict(data["pending_skips"])
+        query.time_saved = data["time_saved"]
+        query.responses = {
+            agent: load_entry(entry) for agent, entry in data["responses"].items()
+        }
+        query.pks = dict(data["pks"])
+        return query
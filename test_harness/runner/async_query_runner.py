@@ -0,0 +1,286 @@
+"""asyncio-native Translator Test Query Runner."""
+
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple, Union
+
+import httpx
+from translator_testing_model.datamodel.pydanticmodel import (
+    PathfinderTestCase,
+    TestCase,
+)
+
+from test_harness import json_codec
+from test_harness.runner.ars_lifecycle import ARSQuery
+from test_harness.runner.cassette import Cassette
+from test_harness.runner.circuit_breaker import CircuitOpenError
+from test_harness.runner.concurrency import (
+    DEFAULT_POOL,
+    MemoryBudget,
+    MemoryReservation,
+    get_pool_name,
+)
+from test_harness.runner.query_runner import QueryRunner, get_query_url
+from test_harness.runner.rate_limit import RateLimit
+from test_harness.runner.response_store import ResponseStore, SpooledBody
+from test_harness.runner.retry import RetryPolicy
+from test_harness.utils import normalize_curies
+
+
+class AsyncQueryRunner(QueryRunner):
+    """Translator Test Query Runner on asyncio and httpx.AsyncClient.
+
+    Shares the registry, circuit breakers, retries, rate limits and run stats
+    of QueryRunner, but every query of a test case is a task of a single
+    asyncio.TaskGroup that advances its ARSQuery between non-blocking sleeps,
+    so a test case needs no worker thread per query.
+    ``run_queries`` keeps the blocking interface run_tests expects by driving
+    the runner's own event loop.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        retry_policy: Optional[RetryPolicy] = None,
+        response_store: Optional[ResponseStore] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        cassette: Optional[Cassette] = None,
+        rate_limit: Optional[RateLimit] = None,
+        poll_rate_limit: Optional[RateLimit] = None,
+    ):
+        super().__init__(
+            logger,
+            retry_policy,
+            response_store,
+            memory_budget,
+            cassette,
+            rate_limit,
+            poll_rate_limit,
+        )
+        # one loop for the whole run, so the asyncio primitives and connection
+        # pools are reused across test cases
+        self.loop = asyncio.new_event_loop()
+        self.async_clients = {
+            name: httpx.AsyncClient(
+                limits=bulkhead.limits,
+                transport=(
+                    cassette.async_transport(bulkhead.limits) if cassette else None
+                ),
+            )
+            for name, bulkhead in self.bulkheads.items()
+        }
+
+    def close(self):
+        """Close the connection pools and the event loop."""
+        if self.closed:
+            return
+        for client in self.async_clients.values():
+            self.loop.run_until_complete(client.aclose())
+        self.loop.close()
+        super().close()
+
+    async def send_request_async(
+        self,
+        method: str,
+        url: str,
+        timeout: float,
+        idempotent: bool = False,
+        pool: str = DEFAULT_POOL,
+        spool: bool = False,
+        poll: bool = False,
+        **kwargs,
+    ) -> httpx.Response:
+        """Send a single request, see QueryRunner.send_request."""
+        circuit_breaker = self.get_circuit_breaker(url)
+        rate_limiter = self.get_rate_limiter(url, poll)
+        client = self.async_clients[pool]
+
+        async def send() -> httpx.Response:
+            async with rate_limiter.acquire_async():
+                if not spool:
+                    return await client.request(method, url, timeout=timeout, **kwargs)
+                request = client.build_request(method, url, timeout=timeout, **kwargs)
+                res = await client.send(request, stream=True)
+                if not self._streams_to_disk(res):
+                    try:
+                        await res.aread()
+                    finally:
+                        await res.aclose()
+                return res
+
+        if not circuit_breaker.allow_request():
+            raise CircuitOpenError(circuit_breaker.host)
+        try:
+            res = await self.retry_policy.call_async(url, send, idempotent=idempotent)
+        except BaseException as e:
+            # anything but a response counts, so a half-open probe that blows
+            # up (or is cancelled) can't leave the circuit half open for good
+            circuit_breaker.record_failure(f"{type(e).__name__}: {e}")
+            raise
+        circuit_breaker.record_status_code(res.status_code)
+        return res
+
+    async def read_body_async(
+        self, res: httpx.Response, reservation: MemoryReservation
+    ) -> Union[bytes, SpooledBody]:
+        """Same as QueryRunner.read_body, for a response of an async client."""
+        if res.is_closed:
+            reservation.charge(len(res.content))
+            return res.content
+        writer = self.response_store.writer()
+        try:
+            async for chunk in res.aiter_bytes():
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            await res.aclose()
+        content = writer.close()
+        reservation.charge(content.handle.size)
+        return content
+
+    async def run_adaptive_query_async(
+        self, query_hash, message, base_url, infores, component="ara"
+    ) -> Tuple[int, Dict[str, dict], Dict[str, str]]:
+        """Run a query in its pool once the host's adaptive concurrency limit has room.
+
+        The limit is waited on before a pool slot is taken, so a host that is
+        backing off can't tie up the slots other hosts' queries are waiting for.
+        """
+
+        async def run_query():
+            # waiting for the pool isn't the host being slow
+            outcome.start()
+            return await self.run_query_async(
+                query_hash, message, base_url, infores, component
+            )
+
+        bulkhead = self.bulkheads[get_pool_name(component)]
+        async with self.get_concurrency_limiter(base_url).acquire_async() as outcome:
+            query_hash, responses, pks = await bulkhead.run_async(run_query)
+            self._query_failed(outcome, infores, responses)
+        return query_hash, responses, pks
+
+    async def run_query_async(
+        self, query_hash, message, base_url, infores, component="ara"
+    ) -> Tuple[int, Dict[str, dict], Dict[str, str]]:
+        """Generate and run a single TRAPI query, see QueryRunner.run_query."""
+        submitted_at = self.clock.time()
+        async with self.memory_budget.admit_async(
+            self._query_kind(infores)
+        ) as reservation:
+            res = None
+            try:
+                res = await self.send_request_async(
+                    "POST",
+                    get_query_url(base_url, infores),
+                    timeout=600,
+                    pool=self._query_pool(infores, component),
+                    spool=self._spools_query(infores),
+                    **json_codec.json_body(message),
+                )
+                content = await self.read_body_async(res, reservation)
+                entry = self._query_response(infores, res, content)
+            except Exception as e:
+                entry = self._failed_query_response(e, res)
+        if not self._is_polled(infores, entry):
+            return query_hash, self._component_responses(infores, entry), {}
+        # handle the ARS polling
+        responses, pks = await self.get_ars_responses_async(
+            entry["response"].get("pk", ""), base_url, submitted_at
+        )
+        return query_hash, responses, pks
+
+    async def advance_ars_query_async(self, query: ARSQuery):
+        """Send the next request of an ARS query and feed the outcome back."""
+        request = query.next_request()
+        async with self.memory_budget.admit_async(request.kind) as reservation:
+            try:
+                res = await self.send_request_async(
+                    request.method,
+                    request.url,
+                    timeout=30,
+                    idempotent=request.idempotent,
+                    pool="ars",
+                    spool=self._spools_message(request.agent),
+                    poll=request.is_poll,
+                )
+                content = await self.read_body_async(res, reservation)
+            except Exception as e:
+                query.handle_error(e, now=self.clock.time())
+            else:
+                self._feed_ars_query(query, res, content)
+
+    async def get_ars_responses_async(
+        self, parent_pk: str, base_url: str, submitted_at: Optional[float] = None
+    ) -> Tuple[Dict[str, dict], Dict[str, str]]:
+        """Given a parent pk, get responses for all ARS things."""
+        query = self._new_ars_query(parent_pk, base_url, submitted_at)
+        while not query.done:
+            await self.clock.sleep_async(max(0.0, query.wake_at - self.clock.time()))
+            await self.advance_ars_query_async(query)
+        return self._finish_ars_query(query)
+
+    async def _run_guarded_query(self, *args):
+        """Run a query, logging failures instead of cancelling its siblings."""
+        try:
+            return await self.run_adaptive_query_async(*args)
+        except Exception as e:
+            self.logger.error(f"Something went wrong with the queries: {e}")
+            return None
+
+    async def run_queries_async(
+        self,
+        test_case: Union[TestCase, PathfinderTestCase],
+    ) -> Tuple[Dict[int, dict], Dict[str, str]]:
+        """Run all queries specified in a Test Case as one task group."""
+        self.set_environment(test_case.test_env)
+        # NodeNorm is a single blocking call per test case
+        utilities = self.bulkheads["utilities"]
+        normalized_curies = await asyncio.to_thread(
+            normalize_curies,
+            test_case,
+            self.logger,
+            retry_policy=self.retry_policy,
+            client=utilities.client,
+        )
+        queries = self.build_queries(test_case, normalized_curies)
+
+        async with asyncio.TaskGroup() as task_group:
+            tasks = []
+            for component in test_case.components:
+                services = self.get_services(test_case.test_env, component)
+                self.logger.info(f"Sending queries to {services}")
+                for service in services:
+                    for query_hash, query in queries.items():
+                        tasks.append(
+                            task_group.create_task(
+                                self._run_guarded_query(
+                                    query_hash,
+                                    query["query"],
+                                    service["url"],
+                                    service["infores"],
+                                    component,
+                                )
+                            )
+                        )
+        for task in tasks:
+            if task.result() is None:
+                continue
+            query_hash, responses, pks = task.result()
+            queries[query_hash]["responses"].update(responses)
+            queries[query_hash]["pks"].update(pks)
+            if "parent_pk" in pks:
+                queries[query_hash]["lifecycle"] = self.ars_lifecycles.pop(
+                    pks["parent_pk"], None
+                )
+
+        return queries, normalized_curies
+
+    def run_queries(
+        self,
+        test_case: Union[TestCase, PathfinderTestCase],
+    ) -> Tuple[Dict[int, dict], Dict[str, str]]:
+        """Run all queries specified in a Test Case."""
+        return self.loop.run_until_complete(self.run_queries_async(test_case))
@@ -0,0 +1,34 @@
+"""Waking asyncio tasks from thread-safe limiters."""
+
+import asyncio
+from typing import List, Tuple
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AsyncWaiters:
+    """asyncio tasks waiting for room under a threading.Condition.
+
+    The limiters are shared by worker threads and event loops. Threads wait
+    on the condition, tasks ``add`` a future and await it, and whoever frees
+    room wakes both, so nothing has to poll. Only use it while holding the
+    condition the waited-on state is guarded by, so no wakeup gets lost.
+    """
+
+    def __init__(self):
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def add(self) -> asyncio.Future:
+        """Future of the running task, done once ``notify_all`` is called."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.append((loop, future))
+        return future
+
+    def notify_all(self):
+        waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
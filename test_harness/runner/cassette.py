@@ -0,0 +1,392 @@
+"""Record and replay of the HTTP exchanges of a run."""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from test_harness import json_codec
+from test_harness.runner.clock import Clock, VirtualClock
+from test_harness.runner.rate_limit import RateLimit
+
+# Nothing goes over the network while replaying, so nothing to be gentle with.
+REPLAY_RATE_LIMIT = RateLimit(rate=1e6, burst=1_000_000, max_in_flight=1024)
+# Response headers that describe how the body was framed on the wire. The
+# body is recorded whole, still in its content encoding.
+WIRE_HEADERS = {"content-length", "transfer-encoding"}
+# Exchanges recorded between two commits of the cassette.
+COMMIT_EVERY = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exchanges (
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    method TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status_code INTEGER,
+    headers TEXT,
+    content BLOB,
+    elapsed REAL NOT NULL,
+    error TEXT,
+    PRIMARY KEY (key, seq)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+"""
+
+
+@dataclass
+class Exchange:
+    """A recorded response, or the transport error the request ran into."""
+
+    status_code: Optional[int]
+    headers: List[Tuple[str, str]]
+    content: bytes
+    # seconds the response took
+    elapsed: float
+    # "<httpx exception name>: <message>" of a transport error
+    error: Optional[str] = None
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        """Rebuild the response, or raise the transport error again."""
+        if self.error is not None:
+            name, _, message = self.error.partition(": ")
+            error_type = getattr(httpx, name, None)
+            if not (
+                isinstance(error_type, type)
+                and issubclass(error_type, httpx.TransportError)
+            ):
+                error_type = httpx.TransportError
+            raise error_type(message, request=request)
+        return httpx.Response(
+            self.status_code,
+            headers=self.headers,
+            content=self.content,
+            request=request,
+        )
+
+
+def exchange_key(request: httpx.Request) -> str:
+    """Stable fingerprint of a request: its method, url and body."""
+    key = hashlib.blake2b(digest_size=16)
+    key.update(f"{request.method} {request.url}\n".encode())
+    key.update(request.content)
+    return key.hexdigest()
+
+
+class Cassette:
+    """HTTP exchanges of a run in a sqlite file, bodies zlib compressed.
+
+    Recording stores every exchange under the fingerprint of its request
+    (see exchange_key), in the order they happened. Replaying hands the
+    exchanges of a fingerprint back in that same order, so the ARS polls of
+    a query get the statuses they got back then; once they've all been
+    handed out the last one is repeated. With ``latency`` "original" a
+    replayed response takes as long as it did, with "zero" the runner's
+    clock skips ahead instead (see VirtualClock).
+    """
+
+    def __init__(self, path: str, replay: bool = False, latency: str = "zero"):
+        self.path = path
+        self.replaying = replay
+        self.latency = latency
+        self.clock = VirtualClock() if replay and latency == "zero" else Clock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        if not replay:
+            # a recording always starts from scratch
+            self.connection.execute("DELETE FROM exchanges")
+            self.connection.execute("DELETE FROM meta")
+            self.connection.commit()
+        # fingerprint -> exchanges recorded or replayed so far
+        self.counts: Dict[str, int] = {}
+        self.recorded = 0
+        self.uncommitted = 0
+        self.replayed = 0
+        self.missed = 0
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        request: httpx.Request,
+        response: Optional[httpx.Response],
+        elapsed: float,
+        error: Optional[Exception] = None,
+        content: bytes = b"",
+    ):
+        """Add an exchange, ``content`` being the zlib compressed response body.
+
+        Exchanges are committed in batches of COMMIT_EVERY, and on close.
+        """
+        key = exchange_key(request)
+        headers = (
+            [
+                (name, value)
+                for name, value in response.headers.multi_items()
+                if name.lower() not in WIRE_HEADERS
+            ]
+            if response is not None
+            else []
+        )
+        with self._lock:
+            seq = self.counts.get(key, 0)
+            self.counts[key] = seq + 1
+            self.connection.execute(
+                "INSERT INTO exchanges VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    seq,
+                    request.method,
+                    str(request.url),
+                    response.status_code if response is not None else None,
+                    json_codec.dumps(headers),
+                    content or zlib.compress(b""),
+                    elapsed,
+                    f"{type(error).__name__}: {error}" if error is not None else None,
+                ),
+            )
+            self.recorded += 1
+            self.uncommitted += 1
+            if self.uncommitted >= COMMIT_EVERY:
+                self.connection.commit()
+                self.uncommitted = 0
+
+    def replay(self, request: httpx.Request) -> Optional[Exchange]:
+        """Next recorded exchange of a request, None if it was never made."""
+        key = exchange_key(request)
+        with self._lock:
+            seq = self.counts.get(key, 0)
+            row = self.connection.execute(
+                "SELECT status_code, headers, content, elapsed, error FROM exchanges "
+                "WHERE key = ? AND seq <= ? ORDER BY seq DESC LIMIT 1",
+                (key, seq),
+            ).fetchone()
+            if row is None:
+                self.missed += 1
+                return None
+            self.counts[key] = seq + 1
+            self.replayed += 1
+        status_code, headers, content, elapsed, error = row
+        return Exchange(
+            status_code,
+            [tuple(header) for header in json_codec.loads(headers)],
+            zlib.decompress(content),
+            elapsed,
+            error,
+        )
+
+    def put_meta(self, name: str, value: Any):
+        """Record something the run needs to be replayed, eg the registry."""
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                (name, zlib.compress(json_codec.dumps_bytes(value))),
+            )
+            self.connection.commit()
+
+    def get_meta(self, name: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT value FROM meta WHERE name = ?", (name,)
+            ).fetchone()
+        return json_codec.loads(zlib.decompress(row[0])) if row else default
+
+    def transport(self, limits: httpx.Limits) -> httpx.BaseTransport:
+        """Transport for a runner's http client, pooling with ``limits``."""
+        if self.replaying:
+            return ReplayTransport(self)
+        return RecordingTransport(self, httpx.HTTPTransport(limits=limits))
+
+    def async_transport(self, limits: httpx.Limits) -> httpx.AsyncBaseTransport:
+        if self.replaying:
+            return AsyncReplayTransport(self)
+        return AsyncRecordingTransport(self, httpx.AsyncHTTPTransport(limits=limits))
+
+    def close(self):
+        with self._lock:
+            self.connection.commit()
+            self.connection.close()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": "replay" if self.replaying else "record",
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "missed": self.missed,
+        }
+
+
+def _not_recorded(request: httpx.Request) -> httpx.ConnectError:
+    return httpx.ConnectError(
+        f"Not in the cassette: {request.method} {request.url}", request=request
+    )
+
+
+class BodyRecorder:
+    """Compresses a response body as it's read, then records its exchange.
+
+    The body is passed on chunk by chunk, so a response the runner streams to
+    disk is never held in memory whole, only its compressed copy. A body that
+    wasn't read to the end is recorded as the error that cut it short.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        request: httpx.Request,
+        response: httpx.Response,
+        start_time: float,
+    ):
+        self.cassette = cassette
+        self.request = request
+        self.response = response
+        self.start_time = start_time
+        self.complete = False
+        self.error: Optional[Exception] = None
+        self._compressor = zlib.compressobj()
+        self._compressed: List[bytes] = []
+        self._recorded = False
+
+    def feed(self, chunk: bytes):
+        self._compressed.append(self._compressor.compress(chunk))
+
+    def finish(self):
+        """Record the exchange, once the body is closed."""
+        if self._recorded:
+            return
+        self._recorded = True
+        elapsed = time.monotonic() - self.start_time
+        if not self.complete:
+            error = self.error or httpx.ReadError("Response body not read to the end")
+            self.cassette.record(self.request, None, elapsed, error)
+            return
+        self._compressed.append(self._compressor.flush())
+        self.cassette.record(
+            self.request, self.response, elapsed, content=b"".join(self._compressed)
+        )
+
+
+class RecordingStream(httpx.SyncByteStream):
+    def __init__(self, recorder: BodyRecorder, stream: httpx.SyncByteStream):
+        self.recorder = recorder
+        self.stream = stream
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            for chunk in self.stream:
+                self.recorder.feed(chunk)
+                yield chunk
+        except httpx.TransportError as e:
+            self.recorder.error = e
+            raise
+        self.recorder.complete = True
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            self.recorder.finish()
+
+
+class AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, recorder: BodyRecorder, stream: httpx.AsyncByteStream):
+        self.recorder = recorder
+        self.stream = stream
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self.stream:
+                self.recorder.feed(chunk)
+                yield chunk
+        except httpx.TransportError as e:
+            self.recorder.error = e
+            raise
+        self.recorder.complete = True
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            self.recorder.finish()
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Sends requests over ``transport`` and records what comes back.
+
+    The body is recorded as the client reads it, see BodyRecorder.
+    """
+
+    def __init__(self, cassette: Cassette, transport: httpx.BaseTransport):
+        self.cassette = cassette
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start_time = time.monotonic()
+        try:
+            response = self.transport.handle_request(request)
+        except httpx.TransportError as e:
+            self.cassette.record(request, None, time.monotonic() - start_time, e)
+            raise
+        response.stream = RecordingStream(
+            BodyRecorder(self.cassette, request, response, start_time),
+            response.stream,
+        )
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport):
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start_time = time.monotonic()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TransportError as e:
+            self.cassette.record(request, None, time.monotonic() - start_time, e)
+            raise
+        response.stream = AsyncRecordingStream(
+            BodyRecorder(self.cassette, request, response, start_time),
+            response.stream,
+        )
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Serves requests from a cassette, without touching the network."""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        exchange = self.cassette.replay(request)
+        if exchange is None:
+            raise _not_recorded(request)
+        self.cassette.clock.advance(exchange.elapsed)
+        return exchange.to_response(request)
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        exchange = self.cassette.replay(request)
+        if exchange is None:
+            raise _not_recorded(request)
+        await self.cassette.clock.advance_async(exchange.elapsed)
+        return exchange.to_response(request)
@@ -0,0 +1,127 @@
+"""Per host circuit breaker for outbound queries."""
+
+import threading
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+# Consecutive failures/timeouts before a host's circuit trips open.
+FAILURE_THRESHOLD = 3
+# Seconds an open circuit waits before letting a half-open probe through.
+RESET_TIMEOUT = 120
+# Status code given to queries that were failed fast by an open circuit, next
+# to the 598 already used for timeouts.
+CIRCUIT_OPEN_STATUS = 597
+
+
+class CircuitState(str, Enum):
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+    def __init__(self, host: str):
+        super().__init__(f"Circuit open for {host}, failing fast.")
+        self.host = host
+
+
+def get_host(url: str) -> str:
+    """Get the host a url points at, which is what circuits are keyed on."""
+    return urlparse(url).netloc or url
+
+
+class CircuitBreaker:
+    """Track consecutive failures of a single host.
+
+    Once ``failure_threshold`` consecutive requests fail the circuit opens and
+    every request fails fast. After ``reset_timeout`` seconds a single
+    half-open probe is let through: success closes the circuit again, failure
+    re-opens it.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+    ):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.fast_failures = 0
+        self.opened_at: Optional[float] = None
+        self.timeline: List[Dict[str, Any]] = []
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state: CircuitState, reason: str):
+        self.state = state
+        self.timeline.append(
+            {
+                "timestamp": datetime.now().astimezone().isoformat(),
+                "state": state.value,
+                "reason": reason,
+                "fast_failures": self.fast_failures,
+            }
+        )
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent to this host right now."""
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return True
+            if (
+                self.state == CircuitState.OPEN
+                and time.time() - self.opened_at >= self.reset_timeout
+            ):
+                self._transition(CircuitState.HALF_OPEN, "probing after reset timeout")
+            if self.state == CircuitState.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.fast_failures += 1
+            return False
+
+    def record_success(self):
+        """A request to this host succeeded."""
+        with self._lock:
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+            if self.state != CircuitState.CLOSED:
+                self._transition(CircuitState.CLOSED, "probe succeeded")
+
+    def record_status_code(self, status_code: int):
+        """A request to this host got a response, 5xx ones count as failures."""
+        if status_code >= 500:
+            self.record_failure(f"status code {status_code}")
+        else:
+            self.record_success()
+
+    def record_failure(self, reason: str = "request failed"):
+        """A request to this host failed or timed out."""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == CircuitState.HALF_OPEN or (
+                self.state == CircuitState.CLOSED
+                and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.opened_at = time.time()
+                self._transition(
+                    CircuitState.OPEN,
+                    f"{self.consecutive_failures} consecutive failures, last: {reason}",
+                )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable summary of this circuit for the run report."""
+        return {
+            "state": self.state.value,
+            "fast_failures": self.fast_failures,
+            "timeline": list(self.timeline),
+        }
@@ -0,0 +1,48 @@
+"""Clocks the query runner waits on."""
+
+import asyncio
+import time
+from contextvars import ContextVar
+
+# seconds the replayed timeline of the current thread or task is ahead
+_virtual_offset: ContextVar[float] = ContextVar("virtual_offset", default=0.0)
+
+
+class Clock:
+    """Wall clock of the query runner."""
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    async def sleep_async(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    def advance(self, seconds: float):
+        """Let ``seconds`` pass, eg the latency of a replayed response."""
+        self.sleep(seconds)
+
+    async def advance_async(self, seconds: float):
+        await self.sleep_async(seconds)
+
+
+class VirtualClock(Clock):
+    """Clock that moves forward instead of waiting.
+
+    Every thread and asyncio task has its own timeline, so each ARS query
+    still sees its polls and replayed latencies add up to its timeouts as
+    they did when it was recorded, without anything actually waiting.
+    """
+
+    def time(self) -> float:
+        return time.time() + _virtual_offset.get()
+
+    def sleep(self, seconds: float):
+        _virtual_offset.set(_virtual_offset.get() + max(0.0, seconds))
+
+    async def sleep_async(self, seconds: float):
+        self.sleep(seconds)
+        # still let the other tasks run
+        await asyncio.sleep(0)
@@ -0,0 +1,429 @@
+"""Concurrency control of outbound queries."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+)
+
+import httpx
+
+from test_harness.runner.async_waiters import AsyncWaiters
+from test_harness.runner.cassette import Cassette
+
+INITIAL_LIMIT = 2
+MIN_LIMIT = 1
+MAX_LIMIT = 16
+# Factor the limit is cut by on a timeout, 5xx or latency spike.
+DECREASE_FACTOR = 0.5
+# A query slower than this many times the latency baseline counts as a sign
+# of an overloaded environment, even if it eventually succeeded.
+LATENCY_TOLERANCE = 2.0
+# Weight of a new successful sample in the latency baseline.
+BASELINE_WEIGHT = 0.2
+# Response bytes the runner lets into memory at once, see MemoryBudget.
+MEMORY_BUDGET = 512 * 1024 * 1024
+
+
+class QueryOutcome:
+    """Handle used by a caller to report how its query went."""
+
+    def __init__(self):
+        self.failed = False
+        self.reason: Optional[str] = None
+        self.started_at = time.time()
+
+    def start(self):
+        """Time the query from now on, eg once it got a pool worker."""
+        self.started_at = time.time()
+
+    def fail(self, reason: str):
+        """Mark the query as failed (timeout, 5xx...)."""
+        self.failed = True
+        self.reason = reason
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on the number of in-flight queries to a host.
+
+    The limit grows by one for every query that finishes healthy and is cut
+    multiplicatively on timeouts, server errors or when the time it took
+    rises well above the running latency baseline. That way the harness
+    settles on the fastest rate an environment can sustain.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        initial_limit: int = INITIAL_LIMIT,
+        min_limit: int = MIN_LIMIT,
+        max_limit: int = MAX_LIMIT,
+    ):
+        self.host = host
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, min(max_limit, initial_limit)))
+        self.in_flight = 0
+        self.latency_baseline: Optional[float] = None
+        self.timeline: List[Dict[str, Any]] = []
+        self._condition = threading.Condition()
+        self._waiters = AsyncWaiters()
+        self._record("initial limit")
+
+    def _record(self, reason: str):
+        self.timeline.append(
+            {
+                "timestamp": datetime.now().astimezone().isoformat(),
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "reason": reason,
+            }
+        )
+
+    def _set_limit(self, limit: float, reason: str):
+        limit = max(self.min_limit, min(self.max_limit, limit))
+        changed = int(limit) != int(self.limit)
+        self.limit = limit
+        if changed:
+            self._record(reason)
+            self._condition.notify_all()
+            self._waiters.notify_all()
+
+    def try_acquire(self) -> bool:
+        """Take a slot under the current limit if there is one, without waiting.
+
+        The slot is given back by running the query in ``held``.
+        """
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    @contextmanager
+    def held(self) -> Iterator[QueryOutcome]:
+        """Track the outcome of a query in a slot taken with ``try_acquire``."""
+        outcome = QueryOutcome()
+        try:
+            yield outcome
+        except Exception as e:
+            outcome.fail(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._release(outcome)
+
+    @contextmanager
+    def acquire(self) -> Iterator[QueryOutcome]:
+        """Wait for room under the current limit and track the query's outcome."""
+        with self._condition:
+            while not self.try_acquire():
+                self._condition.wait()
+        with self.held() as outcome:
+            yield outcome
+
+    @asynccontextmanager
+    async def acquire_async(self) -> AsyncIterator[QueryOutcome]:
+        """Same as ``acquire``, without blocking the event loop."""
+        while True:
+            with self._condition:
+                if self.try_acquire():
+                    break
+                woken = self._waiters.add()
+            await woken
+        with self.held() as outcome:
+            yield outcome
+
+    def _release(self, outcome: QueryOutcome):
+        latency = time.time() - outcome.started_at
+        with self._condition:
+            self.in_flight -= 1
+            if outcome.failed:
+                self._set_limit(self.limit * DECREASE_FACTOR, outcome.reason)
+            else:
+                if (
+                    self.latency_baseline is not None
+                    and latency > self.latency_baseline * LATENCY_TOLERANCE
+                ):
+                    self._set_limit(
+                        self.limit * DECREASE_FACTOR,
+                        f"latency {latency:.1f}s over baseline {self.latency_baseline:.1f}s",
+                    )
+                else:
+                    self._set_limit(self.limit + 1, "healthy")
+                # keep following the latency, so a permanently slower
+                # environment becomes the new normal instead of a spike
+                self.latency_baseline = (
+                    latency
+                    if self.latency_baseline is None
+                    else (1 - BASELINE_WEIGHT) * self.latency_baseline
+                    + BASELINE_WEIGHT * latency
+                )
+            self._condition.notify_all()
+            self._waiters.notify_all()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable summary of this limiter for the run report."""
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "latency_baseline": self.latency_baseline,
+            "timeline": list(self.timeline),
+        }
+
+
+class MemoryReservation:
+    """Response bytes a request is holding in memory."""
+
+    def __init__(self, budget: "MemoryBudget", kind: str, size: int):
+        self.budget = budget
+        self.kind = kind
+        self.size = size
+
+    def charge(self, size: int):
+        """Replace the estimate with the actual size of the response."""
+        self.budget._resize(self, size)
+
+
+class MemoryBudget:
+    """Admission control on the response bytes held in memory at once.
+
+    A request reserves the expected size of its response (the largest one
+    seen so far of its ``kind``, eg merged ARS messages) before it's sent and
+    charges the actual size once the response is in, until it has been
+    parsed and spooled or handed over. New requests are held while the
+    reservations would go over the budget, so a burst of huge responses
+    applies backpressure instead of getting the pod OOM-killed. A request is
+    always let through when nothing else is reserved, so a single response
+    bigger than the budget can't stall the run.
+    """
+
+    def __init__(self, limit: int = MEMORY_BUDGET):
+        self.limit = limit
+        self.in_use = 0
+        self.peak = 0
+        self.held = 0
+        self.held_time = 0.0
+        self.estimates: Dict[str, int] = {}
+        self._condition = threading.Condition()
+        self._waiters = AsyncWaiters()
+
+    def _has_room(self, size: int) -> bool:
+        return self.in_use == 0 or self.in_use + size <= self.limit
+
+    def _reserve(self, kind: str) -> MemoryReservation:
+        reservation = MemoryReservation(self, kind, self.estimates.get(kind, 0))
+        self.in_use += reservation.size
+        self.peak = max(self.peak, self.in_use)
+        return reservation
+
+    def try_admit(self, kind: str) -> Optional[MemoryReservation]:
+        """Reserve room for a response of ``kind`` if there is some, without waiting."""
+        with self._condition:
+            if not self._has_room(self.estimates.get(kind, 0)):
+                return None
+            return self._reserve(kind)
+
+    def _hold(self, start_time: float):
+        with self._condition:
+            self.held += 1
+            self.held_time += time.time() - start_time
+
+    @contextmanager
+    def admit(self, kind: str) -> Iterator[MemoryReservation]:
+        """Wait for room for a response of ``kind`` and hold it while in use."""
+        start_time = time.time()
+        with self._condition:
+            waited = False
+            while not self._has_room(self.estimates.get(kind, 0)):
+                waited = True
+                self._condition.wait()
+            reservation = self._reserve(kind)
+        if waited:
+            self._hold(start_time)
+        try:
+            yield reservation
+        finally:
+            self._release(reservation)
+
+    @asynccontextmanager
+    async def admit_async(self, kind: str) -> AsyncIterator[MemoryReservation]:
+        """Same as ``admit``, without blocking the event loop."""
+        start_time = time.time()
+        waited = False
+        while True:
+            with self._condition:
+                if self._has_room(self.estimates.get(kind, 0)):
+                    reservation = self._reserve(kind)
+                    break
+                woken = self._waiters.add()
+            waited = True
+            await woken
+        if waited:
+            self._hold(start_time)
+        try:
+            yield reservation
+        finally:
+            self._release(reservation)
+
+    def _resize(self, reservation: MemoryReservation, size: int):
+        with self._condition:
+            self.in_use += size - reservation.size
+            self.peak = max(self.peak, self.in_use)
+            reservation.size = size
+            self.estimates[reservation.kind] = max(
+                self.estimates.get(reservation.kind, 0), size
+            )
+            self._condition.notify_all()
+            self._waiters.notify_all()
+
+    def _release(self, reservation: MemoryReservation):
+        with self._condition:
+            self.in_use -= reservation.size
+            reservation.size = 0
+            self._condition.notify_all()
+            self._waiters.notify_all()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable summary of the budget for the run report."""
+        return {
+            "limit": self.limit,
+            "peak": self.peak,
+            "held": self.held,
+            "held_time": round(self.held_time, 3),
+            "estimates": dict(self.estimates),
+        }
+
+
+@dataclass
+class PoolSize:
+    """Size of the bulkhead pool of a component type."""
+
+    workers: int
+    connections: int
+
+
+# Independently sized pools so minutes-long ARS queries can never starve the
+# fast utility calls (NodeNorm, appraiser, annotator) or direct ARA/KP queries.
+POOL_SIZES = {
+    "ars": PoolSize(workers=MAX_LIMIT, connections=MAX_LIMIT * 2),
+    "ara": PoolSize(workers=MAX_LIMIT, connections=MAX_LIMIT),
+    "kp": PoolSize(workers=MAX_LIMIT, connections=MAX_LIMIT),
+    "utilities": PoolSize(workers=4, connections=8),
+}
+# Registry component names that don't match a pool name.
+COMPONENT_POOLS = {
+    "utility": "utilities",
+}
+DEFAULT_POOL = "ara"
+
+
+def get_pool_name(component: str) -> str:
+    """Get the bulkhead pool a registry component's queries run in."""
+    component = COMPONENT_POOLS.get(component, component)
+    return component if component in POOL_SIZES else DEFAULT_POOL
+
+
+class Bulkhead:
+    """Bounded worker pool plus its own http connection pool.
+
+    Tracks how busy the workers are so the run report can show which
+    component type is the bottleneck.
+    """
+
+    def __init__(
+        self, name: str, pool_size: PoolSize, cassette: Optional[Cassette] = None
+    ):
+        self.name = name
+        self.pool_size = pool_size
+        self.executor = ThreadPoolExecutor(
+            max_workers=pool_size.workers, thread_name_prefix=f"{name}-pool"
+        )
+        self.limits = httpx.Limits(
+            max_connections=pool_size.connections,
+            max_keepalive_connections=pool_size.connections,
+        )
+        # a Cassette records or replays everything sent over the pool
+        self.client = httpx.Client(
+            limits=self.limits,
+            transport=cassette.transport(self.limits) if cassette else None,
+        )
+        # worker slots of asyncio callers, see run_async
+        self.slots = asyncio.Semaphore(pool_size.workers)
+        self.tasks = 0
+        self.busy = 0
+        self.peak_busy = 0
+        self.busy_time = 0.0
+        self.started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _track_busy(self) -> Iterator[None]:
+        start_time = time.time()
+        with self._lock:
+            self.busy += 1
+            self.peak_busy = max(self.peak_busy, self.busy)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.busy -= 1
+                self.busy_time += time.time() - start_time
+
+    def _count_task(self):
+        with self._lock:
+            self.tasks += 1
+            if self.started_at is None:
+                self.started_at = time.time()
+
+    def _run(self, fn: Callable, *args, **kwargs):
+        with self._track_busy():
+            return fn(*args, **kwargs)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Run ``fn`` on one of this pool's workers."""
+        self._count_task()
+        return self.executor.submit(self._run, fn, *args, **kwargs)
+
+    async def run_async(self, fn: Callable[..., Awaitable], *args, **kwargs):
+        """Await the coroutine function ``fn`` once one of this pool's slots is free.
+
+        The asyncio counterpart of ``submit``: the pool size caps the number of
+        tasks running at once instead of the number of worker threads.
+        """
+        self._count_task()
+        async with self.slots:
+            with self._track_busy():
+                return await fn(*args, **kwargs)
+
+    def close(self):
+        """Stop the workers and close the connection pool."""
+        self.executor.shutdown(wait=False)
+        self.client.close()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable utilization summary for the run report."""
+        elapsed = time.time() - self.started_at if self.started_at else 0
+        return {
+            "workers": self.pool_size.workers,
+            "connections": self.pool_size.connections,
+            "tasks": self.tasks,
+            "peak_busy": self.peak_busy,
+            "utilization": (
+                round(self.busy_time / (self.pool_size.workers * elapsed), 3)
+                if elapsed
+                else 0.0
+            ),
+        }
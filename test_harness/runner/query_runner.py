@@ -1,8 +1,10 @@
 """Translator Test Query Runner."""
 
 import logging
-import time
-from typing import Dict, Tuple, Union
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 
 import httpx
 from translator_testing_model.datamodel.pydanticmodel import (
@@ -10,13 +12,57 @@ from translator_testing_model.datamodel.pydanticmodel import (
     TestCase,
 )
 
+from test_harness import json_codec
+from test_harness.runner.ars_lifecycle import (
+    NOT_WAITED_STATUS,
+    ARSQuery,
+    count_results,
+    empty_response,
+    fingerprint_results,
+    format_ars_message,
+    load_ars_message,
+)
+from test_harness.runner.cassette import REPLAY_RATE_LIMIT, Cassette
+from test_harness.runner.clock import Clock
+from test_harness.runner.circuit_breaker import (
+    CIRCUIT_OPEN_STATUS,
+    CircuitBreaker,
+    CircuitOpenError,
+    get_host,
+)
+from test_harness.runner.concurrency import (
+    DEFAULT_POOL,
+    POOL_SIZES,
+    AdaptiveConcurrencyLimiter,
+    Bulkhead,
+    MemoryBudget,
+    MemoryReservation,
+    get_pool_name,
+)
 from test_harness.runner.generate_query import generate_query
-from test_harness.runner.smart_api_registry import retrieve_registry_from_smartapi
+from test_harness.runner.rate_limit import (
+    DEFAULT_POLL_RATE_LIMIT,
+    DEFAULT_RATE_LIMIT,
+    POLL_RATE_LIMITS,
+    RATE_LIMITS,
+    HostRateLimiter,
+    RateLimit,
+)
+from test_harness.runner.response_store import (
+    ResponseStore,
+    SpooledBody,
+    body_digest,
+    body_size,
+    discard_payload,
+    load_body,
+)
+from test_harness.runner.retry import RetryPolicy
+from test_harness.runner.smart_api_registry import (
+    probe_registry,
+    retrieve_registry_from_smartapi,
+)
 from test_harness.utils import hash_test_asset, normalize_curies
 
-MAX_QUERY_TIME = 600
-MAX_ARA_TIME = 360
-
 env_map = {
     "dev": "development",
     "ci": "staging",
@@ -24,247 +70,613 @@ env_map = {
     "prod": "production",
 }
 
+# Statuses the runner makes up itself, which say nothing about the host's load.
+UNCOUNTED_STATUSES = (NOT_WAITED_STATUS, CIRCUIT_OPEN_STATUS)
+
+
+def get_query_url(base_url: str, infores: str) -> str:
+    """Get the url a TRAPI query to a component is sent to."""
+    # handle some outlier urls
+    if infores == "infores:ars":
+        return base_url + "/ars/api/submit"
+    elif infores == "infores:sri-answer-appraiser":
+        return base_url + "/get_appraisal"
+    elif infores == "infores:sri-node-normalizer":
+        return base_url + "/get_normalized_nodes"
+    elif "annotator" in base_url:
+        return base_url
+    else:
+        return base_url + "/query"
+
 
 class QueryRunner:
     """Translator Test Query Runner."""
 
-    def __init__(self, logger: logging.Logger):
+    def __init__(
+        self,
+        logger: logging.Logger,
+        retry_policy: Optional[RetryPolicy] = None,
+        response_store: Optional[ResponseStore] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        cassette: Optional[Cassette] = None,
+        rate_limit: Optional[RateLimit] = None,
+        poll_rate_limit: Optional[RateLimit] = None,
+    ):
         self.registry = {}
         self.logger = logger
+        self.circuit_breakers: Dict[str, CircuitBreaker] = {}
+        # rate limits that override the ones of every environment
+        self.rate_limit_override = rate_limit
+        self.poll_rate_limit_override = poll_rate_limit
+        self.rate_limit = rate_limit or DEFAULT_RATE_LIMIT
+        self.poll_rate_limit = poll_rate_limit or DEFAULT_POLL_RATE_LIMIT
+        self.rate_limiters: Dict[str, HostRateLimiter] = {}
+        self.concurrency_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+        # records the run's http exchanges, or replays a recorded run
+        self.cassette = cassette
+        # replaying at zero latency moves the clock instead of waiting
+        self.clock = cassette.clock if cassette is not None else Clock()
+        self.retry_policy = (
+            retry_policy if retry_policy is not None else RetryPolicy(clock=self.clock)
+        )
+        self.bulkheads = {
+            name: Bulkhead(name, pool_size, cassette)
+            for name, pool_size in POOL_SIZES.items()
+        }
+        # agents the test cases need, None to wait for every ARS child
+        self.required_agents: Optional[Set[str]] = None
+        # agents whose responses are kept, None to keep every response
+        self.retained_agents: Optional[Set[str]] = None
+        # lifecycle summaries of finished ARS queries, by parent pk
+        self.ars_lifecycles: Dict[str, dict] = {}
+        self.response_store = (
+            response_store if response_store is not None else ResponseStore()
+        )
+        self.memory_budget = (
+            memory_budget if memory_budget is not None else MemoryBudget()
+        )
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def is_retained(self, agent: str) -> bool:
+        """Whether the response of an agent is kept for analysis."""
+        return self.retained_agents is None or agent in self.retained_agents
+
+    @property
+    def replaying(self) -> bool:
+        return self.cassette is not None and self.cassette.replaying
 
     def retrieve_registry(self, trapi_version: str):
+        if self.replaying:
+            # the registry, as probed, of the recorded run
+            self.registry = self.cassette.get_meta("registry", {})
+            return
         self.registry = retrieve_registry_from_smartapi(trapi_version)
+        if self.cassette is not None:
+            self.cassette.put_meta("registry", self.registry)
 
-    def run_query(
-        self, query_hash, message, base_url, infores
-    ) -> Tuple[int, Dict[str, dict], Dict[str, str]]:
-        """Generate and run a single TRAPI query against a component."""
-        # wait for opening in semaphore before sending next query
-        responses = {}
-        pks = {}
-        # handle some outlier urls
-        if infores == "infores:ars":
-            url = base_url + "/ars/api/submit"
-        elif infores == "infores:sri-answer-appraiser":
-            url = base_url + "/get_appraisal"
-        elif infores == "infores:sri-node-normalizer":
-            url = base_url + "/get_normalized_nodes"
-        elif "annotator" in base_url:
-            url = base_url
-            pass
-        else:
-            url = base_url + "/query"
-        # send message
-        response = {}
-        status_code = 418
-        with httpx.Client(timeout=600) as client:
-            try:
-                res = client.post(url, json=message)
-                status_code = res.status_code
-                res.raise_for_status()
-                response = res.json()
-            except Exception as e:
-                self.logger.error(f"Something went wrong: {e}")
+    def probe_registry(
+        self, tests: Iterable[Union[TestCase, PathfinderTestCase]]
+    ) -> None:
+        """Probe every registry endpoint the given tests will need.
 
-        if infores == "infores:ars":
-            # handle the ARS polling
-            parent_pk = response.get("pk", "")
-            ars_responses, pks = self.get_ars_responses(parent_pk, base_url)
-            responses.update(ars_responses)
-        else:
-            single_infores = infores.split("infores:")[1]
-            # TODO: normalize this response
-            responses[single_infores] = {
-                "response": response,
-                "status_code": status_code,
-            }
+        Endpoints get annotated with ``healthy`` and ``rtt`` so dead servers
+        can be skipped up front instead of each costing a full query timeout.
+        """
+        if self.replaying:
+            # already probed when it was recorded
+            return
+        targets = defaultdict(set)
+        for test in tests:
+            if test.test_env is None or not test.components:
+                continue
+            targets[env_map[test.test_env]].update(test.components)
+        for maturity, components in targets.items():
+            probes = probe_registry(self.registry, maturity, components)
+            dead = [url for url, (healthy, _) in probes.items() if not healthy]
+            self.logger.info(
+                f"Probed {len(probes)} {maturity} endpoints, {len(dead)} unreachable."
+            )
+            for url in dead:
+                self.logger.warning(f"Skipping unreachable endpoint: {url}")
+        if self.cassette is not None:
+            self.cassette.put_meta("registry", self.registry)
 
-        return query_hash, responses, pks
+    def get_services(self, test_env: str, component: str) -> List[dict]:
+        """Get the registry services of a component, minus any known dead ones."""
+        services = self.registry.get(env_map[test_env], {}).get(component, [])
+        return [service for service in services if service.get("healthy", True)]
+
+    def get_fastest_service(self, test_env: str, component: str) -> Optional[dict]:
+        """Get the healthy service of a component with the lowest probed latency."""
+        services = self.get_services(test_env, component)
+        if len(services) == 0:
+            return None
+        return min(
+            services,
+            key=lambda service: (
+                service["rtt"] if service.get("rtt") is not None else float("inf")
+            ),
+        )
+
+    def get_circuit_breaker(self, url: str) -> CircuitBreaker:
+        """Get (or create) the circuit breaker of the host a url points at."""
+        host = get_host(url)
+        with self._lock:
+            if host not in self.circuit_breakers:
+                self.circuit_breakers[host] = CircuitBreaker(host)
+            return self.circuit_breakers[host]
 
-    def get_ars_child_response(
+    def set_environment(self, test_env: str):
+        """Use the rate limits of the given environment for newly seen hosts.
+
+        Rate limits given to the runner apply to every environment.
+        """
+        if self.replaying:
+            self.rate_limit = REPLAY_RATE_LIMIT
+            self.poll_rate_limit = REPLAY_RATE_LIMIT
+            return
+        self.rate_limit = self.rate_limit_override or RATE_LIMITS.get(
+            test_env, DEFAULT_RATE_LIMIT
+        )
+        self.poll_rate_limit = self.poll_rate_limit_override or POLL_RATE_LIMITS.get(
+            test_env, DEFAULT_POLL_RATE_LIMIT
+        )
+
+    def get_rate_limiter(self, url: str, poll: bool = False) -> HostRateLimiter:
+        """Get (or create) the rate limiter of the host a url points at.
+
+        ARS status polls (``poll``) go through a limiter of their own.
+        """
+        host = get_host(url)
+        key = f"{host} polls" if poll else host
+        with self._lock:
+            if key not in self.rate_limiters:
+                self.rate_limiters[key] = HostRateLimiter(
+                    key, self.poll_rate_limit if poll else self.rate_limit, self.clock
+                )
+            return self.rate_limiters[key]
+
+    def close(self):
+        """Shut down the worker and connection pools and the response spool.
+
+        Closing an already closed runner does nothing.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        for bulkhead in self.bulkheads.values():
+            bulkhead.close()
+        self.response_store.close()
+        if self.cassette is not None:
+            self.cassette.close()
+
+    def send_request(
         self,
-        child_pk: str,
-        base_url: str,
-        infores: str,
-    ):
-        """Given a child pk, get response from ARS.
+        method: str,
+        url: str,
+        timeout: float,
+        idempotent: bool = False,
+        pool: str = DEFAULT_POOL,
+        spool: bool = False,
+        poll: bool = False,
+        **kwargs,
+    ) -> httpx.Response:
+        """Send a single request, guarded by the circuit breaker of its host.
 
-        Each call gets its own poll deadline so that one slow / timed-out ARA
-        doesn't cause subsequently checked ARAs to be marked as timed out
-        before they're even given a chance to respond.
+        The request goes out over the connection pool of the ``pool`` bulkhead
+        and every attempt waits on the host's rate limiter first, or on its
+        poll limiter for an ARS status ``poll``. Transport
+        errors, timeouts and 5xx responses are retried according to the retry
+        policy (see ``idempotent``), and count as one host failure if the
+        retries don't help. Raises CircuitOpenError without sending anything
+        while the circuit is open.
+
+        With ``spool``, a successful response announcing a body big enough to
+        spool is returned unread, for ``read_body`` to stream it to disk.
         """
-        self.logger.info(f"Getting response for {infores}...")
+        circuit_breaker = self.get_circuit_breaker(url)
+        rate_limiter = self.get_rate_limiter(url, poll)
+        client = self.bulkheads[pool].client
 
-        start_time = time.time()
-        current_time = start_time
+        def send() -> httpx.Response:
+            with rate_limiter.acquire():
+                if not spool:
+                    return client.request(method, url, timeout=timeout, **kwargs)
+                request = client.build_request(method, url, timeout=timeout, **kwargs)
+                res = client.send(request, stream=True)
+                if not self._streams_to_disk(res):
+                    try:
+                        res.read()
+                    finally:
+                        res.close()
+                return res
 
-        response = None
-        status = 500
+        if not circuit_breaker.allow_request():
+            raise CircuitOpenError(circuit_breaker.host)
         try:
-            # while we stay within the query max time
-            while current_time - start_time <= MAX_ARA_TIME:
-                # get query status of child query
-                with httpx.Client(timeout=30) as client:
-                    res = client.get(f"{base_url}/ars/api/messages/{child_pk}")
-                    res.raise_for_status()
-                    response = res.json()
-                    status = response.get("fields", {}).get("status")
-                    if status == "Done":
-                        break
-                    elif status == "Error" or status == "Unknown":
-                        # query errored, need to capture
-                        break
-                    elif status == "Running":
-                        self.logger.info(f"{infores} is still Running...")
-                        current_time = time.time()
-                        time.sleep(10)
-                    else:
-                        self.logger.info(f"Got unhandled status: {status}")
-                        break
-            else:
-                self.logger.warning(
-                    f"Timed out getting ARS child messages after {MAX_ARA_TIME / 60} minutes."
+            res = self.retry_policy.call(url, send, idempotent=idempotent)
+        except BaseException as e:
+            # anything but a response counts, so a half-open probe that blows
+            # up (or is cancelled) can't leave the circuit half open for good
+            circuit_breaker.record_failure(f"{type(e).__name__}: {e}")
+            raise
+        circuit_breaker.record_status_code(res.status_code)
+        return res
+
+    def _streams_to_disk(self, res: httpx.Response) -> bool:
+        """Whether the body of a streamed response is big enough to spool.
+
+        Only the Content-Length is known up front, so chunked bodies are
+        always read into memory.
+        """
+        size = int(res.headers.get("Content-Length", 0))
+        return res.is_success and self.response_store.should_spool(size)
+
+    def read_body(
+        self, res: httpx.Response, reservation: MemoryReservation
+    ) -> Union[bytes, SpooledBody]:
+        """Raw body of a response, or where it was streamed to on disk.
+
+        The digest of a streamed body is taken on the way, so it is never
+        held in memory as a whole.
+        """
+        if res.is_closed:
+            reservation.charge(len(res.content))
+            return res.content
+        writer = self.response_store.writer()
+        try:
+            for chunk in res.iter_bytes():
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            res.close()
+        content = writer.close()
+        reservation.charge(content.handle.size)
+        return content
+
+    def get_stats(self) -> Dict[str, dict]:
+        """Runner level stats for the run report."""
+        stats = {
+            "circuit_breakers": {
+                host: circuit_breaker.to_dict()
+                for host, circuit_breaker in self.circuit_breakers.items()
+            },
+            "retries": self.retry_policy.to_dict(),
+            "rate_limits": {
+                host: rate_limiter.to_dict()
+                for host, rate_limiter in self.rate_limiters.items()
+            },
+            "concurrency": {
+                host: concurrency_limiter.to_dict()
+                for host, concurrency_limiter in self.concurrency_limiters.items()
+            },
+            "pools": {
+                name: bulkhead.to_dict() for name, bulkhead in self.bulkheads.items()
+            },
+            "spool": self.response_store.to_dict(),
+            "memory": self.memory_budget.to_dict(),
+        }
+        if self.cassette is not None:
+            stats["cassette"] = self.cassette.to_dict()
+        return stats
+
+    def get_concurrency_limiter(self, url: str) -> AdaptiveConcurrencyLimiter:
+        """Get (or create) the adaptive concurrency limiter of a host."""
+        host = get_host(url)
+        with self._lock:
+            if host not in self.concurrency_limiters:
+                self.concurrency_limiters[host] = AdaptiveConcurrencyLimiter(host)
+            return self.concurrency_limiters[host]
+
+    def _query_failed(self, outcome, infores: str, responses: Dict[str, dict]):
+        """Back the adaptive limiter off on a timed out or failed query.
+
+        Statuses the runner gave a query itself without the host being any
+        slower for it (not waited for, fast-failed) don't count.
+        """
+        agent = "ars" if infores == "infores:ars" else infores.split("infores:")[1]
+        status_code = responses.get(agent, {}).get("status_code", 418)
+        if status_code in UNCOUNTED_STATUSES:
+            return
+        if status_code >= 500 or status_code == 418:
+            outcome.fail(f"{agent} returned status code {status_code}")
+
+    def run_adaptive_query(
+        self, query_hash, message, base_url, infores, component="ara"
+    ) -> Tuple[int, Dict[str, dict], Dict[str, str]]:
+        """Run a query once the host's adaptive concurrency limit has room.
+
+        Timeouts and server errors make the limiter back off, see
+        AdaptiveConcurrencyLimiter.
+        """
+        with self.get_concurrency_limiter(base_url).acquire() as outcome:
+            query_hash, responses, pks = self.run_query(
+                query_hash, message, base_url, infores, component
+            )
+            self._query_failed(outcome, infores, responses)
+        return query_hash, responses, pks
+
+    def run_admitted_query(
+        self, query_hash, message, base_url, infores, component="ara"
+    ) -> Tuple[int, Dict[str, dict], Dict[str, str]]:
+        """Run a query in a slot already taken off the host's concurrency limiter.
+
+        See run_queries, which only hands a query to a pool worker once its
+        host has room for it.
+        """
+        with self.get_concurrency_limiter(base_url).held() as outcome:
+            query_hash, responses, pks = self.run_query(
+                query_hash, message, base_url, infores, component
+            )
+            self._query_failed(outcome, infores, responses)
+        return query_hash, responses, pks
+
+    @staticmethod
+    def _query_pool(infores: str, component: str) -> str:
+        return "ars" if infores == "infores:ars" else get_pool_name(component)
+
+    @staticmethod
+    def _query_kind(infores: str) -> str:
+        return "submission" if infores == "infores:ars" else "query"
+
+    def _spools_query(self, infores: str) -> bool:
+        """Whether a big response to a query is streamed to disk."""
+        return infores != "infores:ars" and self.is_retained(
+            infores.split("infores:")[1]
+        )
+
+    def _query_response(
+        self, infores: str, res: httpx.Response, content: Union[bytes, SpooledBody]
+    ) -> dict:
+        """Response entry of the response to a query, spooled if it's big.
+
+        Raises on an error status, see _failed_query_response.
+        """
+        res.raise_for_status()
+        if isinstance(content, SpooledBody):
+            # never loaded back until it's analyzed, which is when its result
+            # count and fingerprint are filled in
+            return {
+                "response": content.handle,
+                "status_code": res.status_code,
+                "bytes": content.handle.size,
+                "result_count": None,
+                "digest": content.digest,
+                "fingerprint": None,
+            }
+        response = load_body(content)
+        entry = {
+            "response": response,
+            "status_code": res.status_code,
+            "bytes": len(content),
+            "result_count": count_results(response),
+            "digest": body_digest(content),
+            "fingerprint": fingerprint_results(response),
+        }
+        if self.response_store.should_spool(len(content)) and self._spools_query(
+            infores
+        ):
+            entry["response"] = self.response_store.put(content)
+        return entry
+
+    def _failed_query_response(
+        self, error: Exception, res: Optional[httpx.Response]
+    ) -> dict:
+        """Response entry of a query that failed, with ``res`` if it got one."""
+        if isinstance(error, CircuitOpenError):
+            self.logger.warning(str(error))
+            status_code = CIRCUIT_OPEN_STATUS
+        else:
+            self.logger.error(f"Something went wrong: {error}")
+            status_code = res.status_code if res is not None else 418
+        return {
+            "response": {},
+            "status_code": status_code,
+            "bytes": None,
+            "result_count": 0,
+            "digest": None,
+            "fingerprint": None,
+        }
+
+    def _component_responses(self, infores: str, entry: dict) -> Dict[str, dict]:
+        """Responses of a query that isn't polled for, by agent."""
+        if infores == "infores:ars":
+            return {"ars": empty_response(entry["status_code"])}
+        agent = infores.split("infores:")[1]
+        # TODO: normalize this response
+        if not self.is_retained(agent):
+            return {agent: discard_payload(entry)}
+        return {agent: entry}
+
+    @staticmethod
+    def _is_polled(infores: str, entry: dict) -> bool:
+        """Whether a query's response is an ARS parent pk to poll."""
+        return infores == "infores:ars" and entry["status_code"] != CIRCUIT_OPEN_STATUS
+
+    def run_query(
+        self, query_hash, message, base_url, infores, component="ara"
+    ) -> Tuple[int, Dict[str, dict], Dict[str, str]]:
+        """Generate and run a single TRAPI query against a component."""
+        submitted_at = self.clock.time()
+        with self.memory_budget.admit(self._query_kind(infores)) as reservation:
+            res = None
+            try:
+                res = self.send_request(
+                    "POST",
+                    get_query_url(base_url, infores),
+                    timeout=600,
+                    pool=self._query_pool(infores, component),
+                    spool=self._spools_query(infores),
+                    **json_codec.json_body(message),
                 )
+                content = self.read_body(res, reservation)
+                entry = self._query_response(infores, res, content)
+            except Exception as e:
+                entry = self._failed_query_response(e, res)
+        if not self._is_polled(infores, entry):
+            return query_hash, self._component_responses(infores, entry), {}
+        # handle the ARS polling
+        responses, pks = self.get_ars_responses(
+            entry["response"].get("pk", ""), base_url, submitted_at
+        )
+        return query_hash, responses, pks
+
+    def _spools_message(self, agent: Optional[str]) -> bool:
+        """Whether a big ARS response is streamed to disk, see ARSRequest.agent."""
+        return agent is not None and self.is_retained(agent)
 
-            # add response to output
-            if response is not None:
-                status_code = response.get("fields", {}).get("code", 410)
-                self.logger.info(
-                    f"Got reponse for {infores} with status code {status_code}."
+    def _feed_ars_query(
+        self, query: ARSQuery, res: httpx.Response, content: Union[bytes, SpooledBody]
+    ):
+        """Advance an ARS query with the response to its last request."""
+        try:
+            res.raise_for_status()
+            body = load_ars_message(content)
+        except Exception as e:
+            query.handle_error(e, now=self.clock.time())
+        else:
+            query.handle_response(body, content=content, now=self.clock.time())
+
+    def advance_ars_query(self, query: ARSQuery):
+        """Send the next request of an ARS query and feed the outcome back."""
+        request = query.next_request()
+        with self.memory_budget.admit(request.kind) as reservation:
+            try:
+                res = self.send_request(
+                    request.method,
+                    request.url,
+                    timeout=30,
+                    idempotent=request.idempotent,
+                    pool="ars",
+                    spool=self._spools_message(request.agent),
+                    poll=request.is_poll,
                 )
-                response = {
-                    "response": response.get("fields", {}).get(
-                        "data", {"message": {"results": []}}
-                    ),
-                    "status_code": status_code,
-                }
+                content = self.read_body(res, reservation)
+            except Exception as e:
+                query.handle_error(e, now=self.clock.time())
             else:
-                self.logger.warning(f"Got error from {infores}")
-                response = {
-                    "response": {"message": {"results": []}},
-                    "status_code": status,
-                }
-        except Exception as e:
-            self.logger.error(
-                f"Getting ARS child response ({infores}) failed with: {e}"
-            )
-            response = {
-                "response": {"message": {"results": []}},
-                "status_code": status,
-            }
+                self._feed_ars_query(query, res, content)
 
-        return infores, response
+    def _new_ars_query(
+        self, parent_pk: str, base_url: str, submitted_at: Optional[float]
+    ) -> ARSQuery:
+        return ARSQuery(
+            parent_pk,
+            base_url,
+            self.logger,
+            submitted_at=submitted_at,
+            required_agents=self.required_agents,
+            store=self.response_store,
+            retained_agents=self.retained_agents,
+        )
+
+    def _finish_ars_query(
+        self, query: ARSQuery
+    ) -> Tuple[Dict[str, dict], Dict[str, str]]:
+        self.ars_lifecycles[query.parent_pk] = query.summary()
+        return query.responses, query.pks
 
     def get_ars_responses(
-        self, parent_pk: str, base_url: str
+        self, parent_pk: str, base_url: str, submitted_at: Optional[float] = None
     ) -> Tuple[Dict[str, dict], Dict[str, str]]:
         """Given a parent pk, get responses for all ARS things."""
-        responses = {}
-        pks = {
-            "parent_pk": parent_pk,
-        }
-        with httpx.Client(timeout=30) as client:
-            # Get all children queries
-            # TODO: race condition in the ARS that will hopefully get fixed
-            time.sleep(10)
-            res = client.get(f"{base_url}/ars/api/messages/{parent_pk}?trace=y")
-            res.raise_for_status()
-            response = res.json()
-
-        start_time = time.time()
-        child_responses = []
-        for child in response.get("children", []):
-            child_pk = child["message"]
-            infores = child["actor"]["inforesid"].split("infores:")[1]
-            # add child pk
-            pks[infores] = child_pk
-            child_responses.append(
-                self.get_ars_child_response(child_pk, base_url, infores)
-            )
+        query = self._new_ars_query(parent_pk, base_url, submitted_at)
+        while not query.done:
+            self.clock.sleep(max(0.0, query.wake_at - self.clock.time()))
+            self.advance_ars_query(query)
+        return self._finish_ars_query(query)
 
-        for child_response in child_responses:
-            infores, response = child_response
-            responses[infores] = response
-
-        try:
-            # After getting all individual ARA responses, get and save the merged version
-            current_time = time.time()
-            while current_time - start_time <= MAX_QUERY_TIME:
-                with httpx.Client(timeout=30) as client:
-                    res = client.get(f"{base_url}/ars/api/messages/{parent_pk}?trace=y")
-                    res.raise_for_status()
-                    response = res.json()
-                    status = response.get("status")
-                    if status == "Done" or status == "Error":
-                        merged_pk = response.get("merged_version")
-                        if merged_pk is None:
-                            self.logger.error(
-                                f"Failed to get the ARS merged message from pk: {parent_pk}."
-                            )
-                            pks["ars"] = "None"
-                            responses["ars"] = {
-                                "response": {"message": {"results": []}},
-                                "status_code": 410,
-                            }
-                        else:
-                            # add final ars pk
-                            pks["ars"] = merged_pk
-                            # get full merged pk
-                            res = client.get(f"{base_url}/ars/api/messages/{merged_pk}")
-                            res.raise_for_status()
-                            merged_message = res.json()
-                            responses["ars"] = {
-                                "response": merged_message.get("fields", {}).get(
-                                    "data", {"message": {"results": []}}
-                                ),
-                                "status_code": merged_message.get("fields", {}).get(
-                                    "code", 410
-                                ),
-                            }
-                            self.logger.info("Got ARS merged message!")
-                        break
-                    else:
-                        self.logger.info("ARS merging not done, waiting...")
-                        current_time = time.time()
-                        time.sleep(10)
-            else:
-                self.logger.warning(
-                    f"ARS merging took greater than {MAX_QUERY_TIME / 60} minutes."
+    def fetch_ars_message(self, url: str, agent: str) -> dict:
+        """Get the response entry of a (child or merged) ARS message as it is."""
+        with self.memory_budget.admit("child") as reservation:
+            try:
+                res = self.send_request(
+                    "GET",
+                    url,
+                    timeout=30,
+                    idempotent=True,
+                    pool="ars",
+                    spool=self._spools_message(agent),
                 )
-                pks["ars"] = "None"
-                responses["ars"] = {
-                    "response": {"message": {"results": []}},
-                    "status_code": 598,
-                }
-        except Exception as e:
-            self.logger.warning(f"Failed to get ARS merged message: {e}")
-            pks["ars"] = "None"
-            responses["ars"] = {
-                "response": {"message": {"results": []}},
-                "status_code": 500,
-            }
+                content = self.read_body(res, reservation)
+                res.raise_for_status()
+                body = load_ars_message(content)
+            except CircuitOpenError as e:
+                self.logger.warning(str(e))
+                return empty_response(CIRCUIT_OPEN_STATUS)
+            except Exception as e:
+                self.logger.error(f"Getting ARS message ({agent}) failed with: {e}")
+                return empty_response(500)
+            if not self.is_retained(agent):
+                return discard_payload(format_ars_message(body, body_size(content)))
+            return format_ars_message(
+                body, body_size(content), content, self.response_store
+            )
 
-        with httpx.Client(timeout=30) as client:
-            # retain this response for testing
-            res = client.post(f"{base_url}/ars/api/retain/{parent_pk}")
-            res.raise_for_status()
-            retain_response = res.json()
-            if not retain_response.get("success"):
+    def fetch_ars_messages(
+        self, parent_pks: Iterable[str], base_url: str
+    ) -> Dict[str, Tuple[Dict[str, dict], Dict[str, str]]]:
+        """Get the child and merged messages of finished ARS queries by pk.
+
+        Unlike get_ars_responses nothing is polled or retained again: the
+        parents are traced, then all of their messages are fetched at once
+        over the ARS pool. Returns the responses and pks of each parent pk.
+        """
+        messages_url = f"{base_url}/ars/api/messages"
+        bulkhead = self.bulkheads["ars"]
+        traces = {
+            parent_pk: bulkhead.submit(
+                self.send_request,
+                "GET",
+                f"{messages_url}/{parent_pk}?trace=y",
+                timeout=30,
+                idempotent=True,
+                pool="ars",
+                poll=True,
+            )
+            for parent_pk in parent_pks
+        }
+        fetched = {}
+        messages = {}
+        for parent_pk, trace in traces.items():
+            responses = {}
+            pks = {"parent_pk": parent_pk}
+            fetched[parent_pk] = (responses, pks)
+            try:
+                res = trace.result()
+                res.raise_for_status()
+                body = json_codec.loads(res.content)
+            except Exception as e:
+                self.logger.error(f"Failed to trace ARS query {parent_pk}: {e}")
+                continue
+            for child in body.get("children", []):
+                infores = child["actor"]["inforesid"].split("infores:")[1]
+                pks[infores] = child["message"]
+            pks["ars"] = body.get("merged_version") or "None"
+            if pks["ars"] == "None":
                 self.logger.error(
-                    f"Failed to retain the query response: {retain_response}"
+                    f"Failed to get the ARS merged message from pk: {parent_pk}."
                 )
+                responses["ars"] = empty_response(410)
+            for agent, pk in pks.items():
+                if agent in responses or agent == "parent_pk":
+                    continue
+                messages[(parent_pk, agent)] = bulkhead.submit(
+                    self.fetch_ars_message, f"{messages_url}/{pk}", agent
+                )
+        for (parent_pk, agent), message in messages.items():
+            fetched[parent_pk][0][agent] = message.result()
+        return fetched
 
-        return responses, pks
-
-    def run_queries(
+    def build_queries(
         self,
         test_case: Union[TestCase, PathfinderTestCase],
-    ) -> Tuple[Dict[int, dict], Dict[str, str]]:
-        """Run all queries specified in a Test Case."""
-        # normalize all the curies in a test case
-        normalized_curies = normalize_curies(test_case, self.logger)
-        # TODO: figure out the right way to handle input category wrt normalization
-
+        normalized_curies: Dict[str, str],
+    ) -> Dict[int, dict]:
+        """Normalize the test assets of a Test Case and generate their queries."""
         queries: Dict[int, dict] = {}
         for test_asset in test_case.test_assets:
             if isinstance(test_case, PathfinderTestCase):
@@ -289,30 +701,73 @@ class QueryRunner:
                     }
                 except Exception as e:
                     self.logger.warning(e)
+        return queries
+
+    def run_queries(
+        self,
+        test_case: Union[TestCase, PathfinderTestCase],
+    ) -> Tuple[Dict[int, dict], Dict[str, str]]:
+        """Run all queries specified in a Test Case."""
+        self.set_environment(test_case.test_env)
+        # normalize all the curies in a test case
+        utilities = self.bulkheads["utilities"]
+        normalized_curies = utilities.submit(
+            normalize_curies,
+            test_case,
+            self.logger,
+            retry_policy=self.retry_policy,
+            client=utilities.client,
+        ).result()
+        # TODO: figure out the right way to handle input category wrt normalization
+        queries = self.build_queries(test_case, normalized_curies)
 
-        # send queries to a single type of component at a time
+        # every component type gets its own bulkhead pool, so all components
+        # are queried at once without slow ARS queries starving the others
+        backlogs: Dict[str, deque] = defaultdict(deque)
         for component in test_case.components:
-            # component = "ara"
             # loop over all specified components, i.e. ars, ara, kp, utilities
-            self.logger.info(
-                f"Sending queries to {self.registry[env_map[test_case.test_env]][component]}"
-            )
-            try:
-                all_responses = []
-                for service in self.registry[env_map[test_case.test_env]][component]:
-                    for query_hash, query in queries.items():
-                        all_responses.append(
-                            self.run_query(
-                                query_hash,
-                                query["query"],
-                                service["url"],
-                                service["infores"],
-                            )
+            services = self.get_services(test_case.test_env, component)
+            self.logger.info(f"Sending queries to {services}")
+            bulkhead = self.bulkheads[get_pool_name(component)]
+            for service in services:
+                for query_hash, query in queries.items():
+                    backlogs[service["url"]].append(
+                        (
+                            bulkhead,
+                            query_hash,
+                            query["query"],
+                            service["url"],
+                            service["infores"],
+                            component,
                         )
-                    for query_hash, responses, pks in all_responses:
-                        queries[query_hash]["responses"].update(responses)
-                        queries[query_hash]["pks"].update(pks)
-            except Exception as e:
-                self.logger.error(f"Something went wrong with the queries: {e}")
+                    )
+
+        def dispatch():
+            # a query only gets a pool worker once the adaptive limiter of its
+            # host has room for it, so a host that is backing off can't tie up
+            # the workers other hosts' queries are waiting for
+            for base_url, backlog in backlogs.items():
+                limiter = self.get_concurrency_limiter(base_url)
+                while backlog and limiter.try_acquire():
+                    bulkhead, *args = backlog.popleft()
+                    running.add(bulkhead.submit(self.run_admitted_query, *args))
+
+        running: Set[Future] = set()
+        dispatch()
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    query_hash, responses, pks = future.result()
+                except Exception as e:
+                    self.logger.error(f"Something went wrong with the queries: {e}")
+                    continue
+                queries[query_hash]["responses"].update(responses)
+                queries[query_hash]["pks"].update(pks)
+                if "parent_pk" in pks:
+                    queries[query_hash]["lifecycle"] = self.ars_lifecycles.pop(
+                        pks["parent_pk"], None
+                    )
+            dispatch()
 
         return queries, normalized_curies
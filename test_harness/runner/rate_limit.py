@@ -0,0 +1,162 @@
+"""Per host rate limiting of outbound queries."""
+
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from test_harness.runner.async_waiters import AsyncWaiters
+from test_harness.runner.clock import Clock
+
+
+@dataclass
+class RateLimit:
+    """Rate limit settings for every host of an environment."""
+
+    # sustained requests per second
+    rate: float
+    # requests that may go out back to back before the rate kicks in
+    burst: int
+    # requests that may be waiting on a host at the same time
+    max_in_flight: int
+
+
+# Keyed like env_map: run fast in dev/ci and gently against production so the
+# harness doesn't skew the very latencies it's measuring.
+RATE_LIMITS = {
+    "dev": RateLimit(rate=10, burst=20, max_in_flight=32),
+    "ci": RateLimit(rate=10, burst=20, max_in_flight=32),
+    "test": RateLimit(rate=2, burst=5, max_in_flight=8),
+    "prod": RateLimit(rate=0.5, burst=2, max_in_flight=4),
+}
+DEFAULT_RATE_LIMIT = RATE_LIMITS["ci"]
+# ARS status polls have a budget of their own: a single query polls each of
+# its children every poll interval, and holding those polls back would
+# inflate the very agent timings being measured.
+POLL_RATE_LIMITS = {
+    "dev": RateLimit(rate=20, burst=40, max_in_flight=64),
+    "ci": RateLimit(rate=20, burst=40, max_in_flight=64),
+    "test": RateLimit(rate=10, burst=20, max_in_flight=32),
+    "prod": RateLimit(rate=5, burst=20, max_in_flight=16),
+}
+DEFAULT_POLL_RATE_LIMIT = POLL_RATE_LIMITS["ci"]
+
+
+def parse_rate_limit(value: str) -> RateLimit:
+    """Parse a RATE,BURST,MAX_IN_FLIGHT rate limit, eg from the cli."""
+    try:
+        rate, burst, max_in_flight = value.split(",")
+        return RateLimit(float(rate), int(burst), int(max_in_flight))
+    except ValueError:
+        raise ValueError(
+            f"Expected a rate limit as RATE,BURST,MAX_IN_FLIGHT, got {value!r}"
+        )
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of blocking.
+
+    ``reserve`` always takes a token, going into debt if the bucket is empty,
+    and returns how long the caller has to wait before using it. That keeps it
+    usable from both blocking and asyncio code.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, returning the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class HostRateLimiter:
+    """Token bucket plus a cap on in-flight requests for a single host.
+
+    Waits for a token happen on ``clock``, see QueryRunner.clock.
+    """
+
+    def __init__(self, host: str, rate_limit: RateLimit, clock: Optional[Clock] = None):
+        self.host = host
+        self.rate_limit = rate_limit
+        self.clock = clock if clock is not None else Clock()
+        self.bucket = TokenBucket(rate_limit.rate, rate_limit.burst)
+        self.requests = 0
+        self.throttled_time = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        # guards the in-flight slots, shared by threads and event loops
+        self._condition = threading.Condition()
+        self._waiters = AsyncWaiters()
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < self.rate_limit.max_in_flight
+
+    def _enter(self, throttled: float):
+        self.requests += 1
+        self.throttled_time += throttled
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _exit(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+            self._waiters.notify_all()
+
+    @contextmanager
+    def acquire(self) -> Iterator[None]:
+        """Wait for a token and a free in-flight slot, holding the slot."""
+        wait = self.bucket.reserve()
+        if wait > 0:
+            self.clock.sleep(wait)
+        slot_wait_start = time.monotonic()
+        with self._condition:
+            while not self._has_slot():
+                self._condition.wait()
+            self._enter(wait + time.monotonic() - slot_wait_start)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    @asynccontextmanager
+    async def acquire_async(self) -> AsyncIterator[None]:
+        """Same as ``acquire``, without blocking the event loop."""
+        wait = self.bucket.reserve()
+        if wait > 0:
+            await self.clock.sleep_async(wait)
+        slot_wait_start = time.monotonic()
+        while True:
+            with self._condition:
+                if self._has_slot():
+                    self._enter(wait + time.monotonic() - slot_wait_start)
+                    break
+                woken = self._waiters.add()
+            await woken
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable summary of this limiter for the run report."""
+        return {
+            **asdict(self.rate_limit),
+            "requests": self.requests,
+            "throttled_seconds": round(self.throttled_time, 3),
+            "peak_in_flight": self.peak_in_flight,
+        }
@@ -0,0 +1,224 @@
+"""On-disk spool of large TRAPI responses."""
+
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, Optional, Sequence, Union
+
+from test_harness import json_codec
+
+# Bodies at least this big are spooled to disk instead of kept in memory.
+SPOOL_THRESHOLD = 1024 * 1024
+# Spooled files only live for the run, so favour speed over ratio.
+COMPRESS_LEVEL = 1
+# Leading bytes of a streamed body kept in memory, see SpooledBody.head.
+HEAD_SIZE = 64 * 1024
+
+
+def content_digest(content: bytes) -> str:
+    """Hash of a response body, identifying identical responses."""
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+@dataclass
+class ResponseHandle:
+    """Reference to a response body spooled to disk."""
+
+    path: str
+    # size of the uncompressed body
+    size: int
+    # keys leading from the body to the TRAPI response, eg fields.data of an
+    # ARS message
+    key_path: Sequence[str] = ()
+
+    def __post_init__(self):
+        # json snapshots turn the key path into a list
+        self.key_path = tuple(self.key_path)
+
+    def load(self) -> dict:
+        """Read the TRAPI response back from disk."""
+        with gzip.open(self.path, "rb") as f:
+            body = json_codec.loads(f.read())
+        for key in self.key_path:
+            body = body.get(key)
+            if body is None:
+                return {"message": {"results": []}}
+        return body
+
+    def at(self, key_path: Sequence[str]) -> "ResponseHandle":
+        """Handle of the same body, leading to the TRAPI response at ``key_path``."""
+        return replace(self, key_path=tuple(key_path))
+
+
+@dataclass
+class SpooledBody:
+    """Raw body of a response that was streamed straight to disk.
+
+    Stands in for the body's content, so it never has to be held in memory
+    as a whole, see QueryRunner.send_request.
+    """
+
+    handle: ResponseHandle
+    digest: str
+    # first HEAD_SIZE bytes of the body, eg to read the status of an ARS
+    # message from without loading its data
+    head: bytes = b""
+
+    def load(self) -> Any:
+        """Decode the whole body back from disk."""
+        return self.handle.load()
+
+
+def body_size(content: Union[bytes, SpooledBody]) -> int:
+    """Size of a raw body, in memory or streamed to disk."""
+    if isinstance(content, SpooledBody):
+        return content.handle.size
+    return len(content)
+
+
+def body_digest(content: Union[bytes, SpooledBody]) -> str:
+    """content_digest of a raw body, in memory or streamed to disk."""
+    if isinstance(content, SpooledBody):
+        return content.digest
+    return content_digest(content)
+
+
+def load_body(content: Union[bytes, SpooledBody]) -> Any:
+    """Decode a raw body, in memory or streamed to disk."""
+    if isinstance(content, SpooledBody):
+        return content.load()
+    return json_codec.loads(content)
+
+
+def load_response(entry: dict) -> Any:
+    """Get the TRAPI response of a response entry, spooled or not."""
+    response = entry.get("response")
+    if isinstance(response, ResponseHandle):
+        return response.load()
+    return response
+
+
+def discard_payload(entry: dict) -> dict:
+    """Copy of a response entry without its TRAPI response.
+
+    Only the status code, size and result count are kept, eg for agents that
+    aren't reported on.
+    """
+    discarded = {key: value for key, value in entry.items() if key != "response"}
+    discarded["discarded"] = True
+    return discarded
+
+
+def dump_entry(entry: dict) -> dict:
+    """Serializable copy of a response entry."""
+    if isinstance(entry.get("response"), ResponseHandle):
+        return {**entry, "response": {"spooled": asdict(entry["response"])}}
+    return dict(entry)
+
+
+def load_entry(data: dict) -> dict:
+    """Reverse of dump_entry."""
+    response = data.get("response")
+    if isinstance(response, dict) and set(response) == {"spooled"}:
+        return {**data, "response": ResponseHandle(**response["spooled"])}
+    return dict(data)
+
+
+class SpoolWriter:
+    """Body being streamed to disk chunk by chunk, hashed on the way."""
+
+    def __init__(self, store: "ResponseStore", path: str):
+        self.store = store
+        self.path = path
+        self.size = 0
+        self._digest = hashlib.blake2b(digest_size=16)
+        self._head = bytearray()
+        self._file = gzip.open(path, "wb", compresslevel=COMPRESS_LEVEL)
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._digest.update(chunk)
+        if self.size < HEAD_SIZE:
+            self._head += chunk[: HEAD_SIZE - self.size]
+        self.size += len(chunk)
+
+    def close(self) -> SpooledBody:
+        """Finish the file, returning the body it now holds."""
+        self._file.close()
+        self.store._count(self.size)
+        return SpooledBody(
+            ResponseHandle(self.path, self.size),
+            self._digest.hexdigest(),
+            bytes(self._head),
+        )
+
+    def abort(self):
+        """Drop a body that couldn't be read to the end."""
+        self._file.close()
+        os.remove(self.path)
+
+
+class ResponseStore:
+    """Gzip spool for response bodies too big to keep in memory.
+
+    Bodies are written out once read, or streamed to disk chunk by chunk
+    (see ``writer``) when they are known to be big up front, and only a
+    ResponseHandle is kept,
+    so a test case holds at most one loaded response at a time while it's
+    being analyzed. A store without a ``directory`` spools to a temporary one
+    that is removed on close.
+    """
+
+    def __init__(
+        self, directory: Optional[str] = None, threshold: int = SPOOL_THRESHOLD
+    ):
+        self.threshold = threshold
+        self._owns_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="test_harness_responses_")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.spooled = 0
+        self.spooled_bytes = 0
+        self._lock = threading.Lock()
+
+    def should_spool(self, size: int) -> bool:
+        return size >= self.threshold
+
+    def put(self, content: bytes, key_path: Sequence[str] = ()) -> ResponseHandle:
+        """Write a raw body to disk, returning the handle to load it back with."""
+        path = self._new_path()
+        with gzip.open(path, "wb", compresslevel=COMPRESS_LEVEL) as f:
+            f.write(content)
+        self._count(len(content))
+        return ResponseHandle(path, len(content), tuple(key_path))
+
+    def writer(self) -> SpoolWriter:
+        """Start streaming a raw body to disk."""
+        return SpoolWriter(self, self._new_path())
+
+    def _new_path(self) -> str:
+        return os.path.join(self.directory, f"{uuid.uuid4().hex}.json.gz")
+
+    def _count(self, size: int):
+        with self._lock:
+            self.spooled += 1
+            self.spooled_bytes += size
+
+    def close(self):
+        """Remove the spooled files, if this store made their directory."""
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable summary of the spool for the run report."""
+        return {
+            "threshold": self.threshold,
+            "spooled": self.spooled,
+            "spooled_bytes": self.spooled_bytes,
+        }
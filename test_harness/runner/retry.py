@@ -0,0 +1,133 @@
+"""Retry policy for transient failures of outbound queries."""
+
+import random
+import threading
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from test_harness.runner.circuit_breaker import get_host
+from test_harness.runner.clock import Clock
+
+# Retries allowed for a single call.
+MAX_RETRIES = 3
+# Retries allowed across the whole run, so a broken environment can't turn
+# every call into a string of retries.
+GLOBAL_RETRY_BUDGET = 200
+BASE_DELAY = 2.0
+MAX_DELAY = 30.0
+
+
+class RetryPolicy:
+    """Retry transient failures with exponential backoff and full jitter.
+
+    Idempotent calls (polls, merged fetches, NodeNorm) are retried on any
+    transport error or 5xx response. Other calls (eg query submissions) are
+    only retried when the connection couldn't be made at all, since then the
+    request never reached the server.
+
+    Backoffs are waited out on ``clock``, so a replayed run at zero latency
+    retries without waiting.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = MAX_RETRIES,
+        global_budget: int = GLOBAL_RETRY_BUDGET,
+        base_delay: float = BASE_DELAY,
+        max_delay: float = MAX_DELAY,
+        clock: Optional[Clock] = None,
+    ):
+        self.max_retries = max_retries
+        self.global_budget = global_budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock if clock is not None else Clock()
+        self.retries_by_host: Dict[str, int] = defaultdict(int)
+        self.retries_used = 0
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait before the given retry attempt (0 based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def _take_retry(self, host: str, attempt: int) -> bool:
+        """Use up one retry, if this call and the run have any left."""
+        if attempt >= self.max_retries:
+            return False
+        with self._lock:
+            if self.retries_used >= self.global_budget:
+                return False
+            self.retries_used += 1
+            self.retries_by_host[host] += 1
+        return True
+
+    def _should_retry(
+        self,
+        host: str,
+        attempt: int,
+        idempotent: bool,
+        error: Optional[Exception] = None,
+        res: Optional[httpx.Response] = None,
+    ) -> bool:
+        """Whether an attempt's error or response warrants (and gets) a retry."""
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            return self._take_retry(host, attempt)
+        if isinstance(error, httpx.TransportError):
+            return idempotent and self._take_retry(host, attempt)
+        return idempotent and res.status_code >= 500 and self._take_retry(host, attempt)
+
+    def call(
+        self,
+        url: str,
+        send: Callable[[], httpx.Response],
+        idempotent: bool = True,
+    ) -> httpx.Response:
+        """Call ``send`` until it gives a non-transient outcome or retries run out.
+
+        The last response is returned (or the last exception raised) once the
+        retries for this call or the global budget are used up.
+        """
+        host = get_host(url)
+        attempt = 0
+        while True:
+            try:
+                res = send()
+            except httpx.TransportError as e:
+                if not self._should_retry(host, attempt, idempotent, error=e):
+                    raise
+            else:
+                if not self._should_retry(host, attempt, idempotent, res=res):
+                    return res
+            self.clock.sleep(self.backoff(attempt))
+            attempt += 1
+
+    async def call_async(
+        self,
+        url: str,
+        send: Callable[[], Awaitable[httpx.Response]],
+        idempotent: bool = True,
+    ) -> httpx.Response:
+        """Same as ``call``, for a coroutine function ``send``."""
+        host = get_host(url)
+        attempt = 0
+        while True:
+            try:
+                res = await send()
+            except httpx.TransportError as e:
+                if not self._should_retry(host, attempt, idempotent, error=e):
+                    raise
+            else:
+                if not self._should_retry(host, attempt, idempotent, res=res):
+                    return res
+            await self.clock.sleep_async(self.backoff(attempt))
+            attempt += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable summary of the retries for the run report."""
+        return {
+            "retries_used": self.retries_used,
+            "global_budget": self.global_budget,
+            "by_host": dict(self.retries_by_host),
+        }
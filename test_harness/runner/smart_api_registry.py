@@ -3,12 +3,20 @@
 import json
 import logging
 import re
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
 
 import httpx
 
 LOGGER = logging.getLogger(__name__)
 
+# Pre-flight endpoint probes should answer in seconds; anything slower is
+# treated as dead rather than letting a real query wait out its full timeout.
+PROBE_TIMEOUT = 5
+PROBE_WORKERS = 16
+
 
 def retrieve_registry_from_smartapi(
     target_trapi_version="1.6.0",
@@ -119,6 +127,57 @@ def retrieve_registry_from_smartapi(
     return registry
 
 
+def probe_endpoint(
+    url: str, timeout: float = PROBE_TIMEOUT
+) -> Tuple[bool, Optional[float]]:
+    """Check that an endpoint is reachable and measure its round trip time.
+
+    Lots of TRAPI services don't serve anything at their base url, so any
+    answer below 500 counts as reachable. Connection errors, timeouts and
+    gateway errors mark the endpoint as dead.
+    """
+    start_time = time.time()
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            res = client.get(url)
+    except httpx.HTTPError as e:
+        LOGGER.warning(f"Failed to reach {url}: {e}")
+        return False, None
+    rtt = time.time() - start_time
+    if res.status_code >= 500:
+        LOGGER.warning(f"{url} is unhealthy, got status code {res.status_code}")
+        return False, rtt
+    return True, rtt
+
+
+def probe_registry(
+    registry: Dict[str, Dict[str, list]],
+    maturity: str,
+    components: Iterable[str],
+    timeout: float = PROBE_TIMEOUT,
+) -> Dict[str, Tuple[bool, Optional[float]]]:
+    """Concurrently probe every registry endpoint of the given components.
+
+    Each probed endpoint is annotated in place with ``healthy`` and ``rtt``
+    (seconds, None when unreachable). Returns the probe results by url.
+    """
+    endpoints = [
+        endpoint
+        for component in components
+        for endpoint in registry.get(maturity, {}).get(component, [])
+    ]
+    urls = list(dict.fromkeys(endpoint["url"] for endpoint in endpoints))
+    if len(urls) == 0:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(urls))) as executor:
+        probes = dict(
+            zip(urls, executor.map(lambda url: probe_endpoint(url, timeout), urls))
+        )
+    for endpoint in endpoints:
+        endpoint["healthy"], endpoint["rtt"] = probes[endpoint["url"]]
+    return probes
+
+
 if __name__ == "__main__":
     registry = retrieve_registry_from_smartapi()
     print(json.dumps(registry))
@@ -1,6 +1,5 @@
 """Slack notification integration class."""
 
-import json
 import logging
 import os
 import re
@@ -9,6 +8,8 @@ import tempfile
 import httpx
 from slack_sdk import WebClient
 
+from test_harness import json_codec
+
 # Slack rejects section blocks whose text exceeds 3000 chars. Leave a small
 # safety margin so we never end up at the boundary.
 SLACK_SECTION_TEXT_LIMIT = 2900
@@ -104,7 +105,7 @@ class Slacker:
                 if extension == "csv":
                     f.write(results)
                 elif extension == "json":
-                    json.dump(results, f, indent=2)
+                    json_codec.dump(results, f, indent=2)
             self.client.files_upload_v2(
                 channel=self.channel,
                 title=filename,
@@ -173,7 +174,7 @@ class LocalSlacker(Slacker):
             if extension == "csv":
                 f.write(results)
             elif extension == "json":
-                json.dump(results, f, indent=2)
+                json_codec.dump(results, f, indent=2)
             else:
                 f.write(str(results))
         self.logger.info(f"Saved test results to {path}")
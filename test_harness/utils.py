@@ -1,9 +1,10 @@
 """General utilities for the Test Harness."""
 
-from dataclasses import dataclass
+from contextlib import nullcontext
+from dataclasses import dataclass, field
 from enum import Enum
 import logging
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import httpx
 from translator_testing_model.datamodel.pydanticmodel import (
@@ -13,6 +14,9 @@ from translator_testing_model.datamodel.pydanticmodel import (
     TestCase,
 )
 
+from test_harness import json_codec
+from test_harness.runner.retry import RetryPolicy
+
 NODE_NORM_URL = {
     "dev": "https://nodenormalization-sri.renci.org/1.4",
     "ci": "https://nodenorm-es.ci.transltr.io",
@@ -29,36 +33,168 @@ class AgentStatus(str, Enum):
     ERROR = "ERROR"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class ActualOutput:
+    """Scores and rank of the expected output in an agent's results.
+
+    Immutable, so the analysis indexes hand out the same record to every
+    report that looks the output up.
+    """
+
+    ars_score: Optional[float] = None
+    ars_rank: Optional[int] = None
+    ara_score: Optional[float] = None
+    ara_rank: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Optional[float]]:
+        return {
+            "ars_score": self.ars_score,
+            "ars_rank": self.ars_rank,
+            "ara_score": self.ara_score,
+            "ara_rank": self.ara_rank,
+        }
+
+
+# the expected output wasn't found in the results
+NO_OUTPUT = ActualOutput()
+
+
+@dataclass(slots=True)
 class AgentReport:
     """Dictionary for single agent report."""
 
     status: AgentStatus
     message: Optional[str]
-    actual_output: Optional[dict[str, Optional[int]]]
+    actual_output: Optional[ActualOutput]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON ready form of the report, as uploaded and logged."""
+        return {
+            "status": self.status.value,
+            "message": self.message,
+            "actual_output": (
+                self.actual_output.to_dict() if self.actual_output is not None else None
+            ),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AgentReport":
+        actual_output = data.get("actual_output")
+        return cls(
+            status=AgentStatus(data["status"]),
+            message=data.get("message"),
+            actual_output=(
+                ActualOutput(**actual_output) if actual_output is not None else None
+            ),
+        )
 
 
-@dataclass
+def summarize_response(response: dict, agent_report: Optional[AgentReport]) -> dict:
+    """Compact summary of an agent response, once analyzed if it ever was."""
+    actual_output = (agent_report and agent_report.actual_output) or NO_OUTPUT
+    rank = actual_output.ars_rank
+    score = actual_output.ars_score
+    return {
+        "status": agent_report.status.value if agent_report else None,
+        "status_code": response.get("status_code"),
+        "rank": rank if rank is not None else actual_output.ara_rank,
+        "score": score if score is not None else actual_output.ara_score,
+        "result_count": response.get("result_count"),
+        "bytes": response.get("bytes"),
+    }
+
+
+@dataclass(slots=True)
 class PathfinderReport(AgentReport):
     """Dictionary for single Pathfinder agent report."""
 
-    expected_nodes_found: str
+    expected_nodes_found: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **AgentReport.to_dict(self),
+            "expected_nodes_found": self.expected_nodes_found,
+        }
+
+
+@dataclass(slots=True)
+class ValidationSummary:
+    """Outcome of validating one agent response against TRAPI."""
+
+    trapi_version: str
+    # distinct message codes of each severity
+    critical: int = 0
+    errors: int = 0
+    warnings: int = 0
+    # codes of the most severe messages
+    codes: List[str] = field(default_factory=list)
+    # why the validator itself failed
+    failure: Optional[str] = None
 
+    @property
+    def status(self) -> str:
+        if self.failure is not None:
+            return "failed"
+        if self.critical:
+            return "critical"
+        if self.errors:
+            return "errors"
+        if self.warnings:
+            return "warnings"
+        return "valid"
 
-@dataclass
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "trapi_version": self.trapi_version,
+            "critical": self.critical,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "codes": self.codes,
+            "failure": self.failure,
+        }
+
+
+@dataclass(slots=True)
 class TestReport:
     """Dictionary for single test report."""
 
     pks: dict[str, str]
     result: dict[str, AgentReport]
     test_details: Optional[dict[str, str | int]]
+    # seconds from submission to each milestone of the ARS query
+    timings: Optional[dict[str, Any]] = None
+    # TRAPI validation of each agent's response, if enabled
+    validation: Optional[dict[str, ValidationSummary]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON ready form of the report, without asdict's deep copies."""
+        return {
+            "pks": self.pks,
+            "result": {
+                agent: report.to_dict() for agent, report in self.result.items()
+            },
+            "test_details": self.test_details,
+            "timings": self.timings,
+            "validation": (
+                {agent: summary.to_dict() for agent, summary in self.validation.items()}
+                if self.validation is not None
+                else None
+            ),
+        }
 
 
 def normalize_curies(
     test: Union[TestCase, PathfinderTestCase],
     logger: logging.Logger = logging.getLogger(__name__),
+    retry_policy: Optional[RetryPolicy] = None,
+    client: Optional[httpx.Client] = None,
 ) -> Dict[str, Dict[str, Union[Dict[str, str], List[str]]]]:
-    """Normalize a list of curies."""
+    """Normalize a list of curies.
+
+    Transient NodeNorm failures are retried with ``retry_policy`` (if given)
+    before falling back to the original curies.
+    """
     node_norm = NODE_NORM_URL.get(test.test_env)
     # collect all curies from test
     if isinstance(test, PathfinderTestCase):
@@ -78,18 +214,24 @@ def normalize_curies(
         curies.add(test.test_case_input_id)
 
     normalized_curies = {}
-    with httpx.Client() as client:
+    # reuse the caller's connection pool if given one
+    with nullcontext(client) if client is not None else httpx.Client() as client:
         try:
-            response = client.post(
-                node_norm + "/get_normalized_nodes",
-                json={
-                    "curies": list(curies),
-                    "conflate": True,
-                    "drug_chemical_conflate": True,
-                },
-            )
+            url = node_norm + "/get_normalized_nodes"
+            payload = {
+                # sorted, so the same test case always sends the same request
+                "curies": sorted(curies),
+                "conflate": True,
+                "drug_chemical_conflate": True,
+            }
+            if retry_policy is not None:
+                response = retry_policy.call(
+                    url, lambda: client.post(url, **json_codec.json_body(payload))
+                )
+            else:
+                response = client.post(url, **json_codec.json_body(payload))
             response.raise_for_status()
-            response = response.json()
+            response = json_codec.loads(response.content)
             for curie, attrs in response.items():
                 if attrs is None:
                     # keep original curie
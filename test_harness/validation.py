@@ -0,0 +1,94 @@
+"""TRAPI validation of agent responses in worker processes."""
+
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Union
+
+from test_harness.runner.response_store import ResponseHandle
+from test_harness.utils import ValidationSummary
+
+# Message codes kept in a summary.
+SUMMARY_CODES = 5
+
+
+@dataclass
+class ValidationTask:
+    """Validation of one response, spooled or small enough to send as is."""
+
+    trapi_version: str
+    response: Union[Dict[str, Any], ResponseHandle]
+    biolink_version: Optional[str] = None
+
+
+def validate_response(task: ValidationTask) -> ValidationSummary:
+    """Validate a response with reasoner-validator and summarize the outcome."""
+    try:
+        # only imported in the workers, it's heavy
+        from reasoner_validator.message import MessageType
+        from reasoner_validator.validator import TRAPIResponseValidator
+
+        response = (
+            task.response.load()
+            if isinstance(task.response, ResponseHandle)
+            else task.response
+        )
+        validator = TRAPIResponseValidator(
+            trapi_version=task.trapi_version,
+            biolink_version=task.biolink_version,
+        )
+        validator.check_compliance_of_trapi_response(response)
+        summary = ValidationSummary(task.trapi_version)
+        for message_type, attribute in (
+            (MessageType.critical, "critical"),
+            (MessageType.error, "errors"),
+            (MessageType.warning, "warnings"),
+        ):
+            messages = validator.get_all_messages_of_type(message_type)
+            setattr(summary, attribute, len(messages))
+            summary.codes.extend(messages)
+        del summary.codes[SUMMARY_CODES:]
+        return summary
+    except Exception as e:
+        return ValidationSummary(task.trapi_version, failure=f"{type(e).__name__}: {e}")
+
+
+class ValidationPool:
+    """Worker processes validating responses while they're being analyzed.
+
+    Outcomes are cached by response digest, so a response shared by several
+    test assets, or returned again for another query, is validated once.
+    """
+
+    def __init__(
+        self, workers: int, trapi_version: str, biolink_version: Optional[str] = None
+    ):
+        self.workers = workers
+        self.trapi_version = trapi_version
+        self.biolink_version = biolink_version
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        # response digest -> validation
+        self.cache: Dict[str, "Future[ValidationSummary]"] = {}
+        self.tasks = 0
+        self.cache_hits = 0
+
+    def submit(self, entry: Dict[str, Any]) -> "Future[ValidationSummary]":
+        """Validate the response of a response entry in one of the workers."""
+        digest = entry.get("digest")
+        if digest is not None and digest in self.cache:
+            self.cache_hits += 1
+            return self.cache[digest]
+        self.tasks += 1
+        future = self.executor.submit(
+            validate_response,
+            ValidationTask(self.trapi_version, entry["response"], self.biolink_version),
+        )
+        if digest is not None:
+            self.cache[digest] = future
+        return future
+
+    def close(self):
+        """Stop the workers."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,119 @@
+"""Verdicts of earlier runs, reused for responses that haven't changed."""
+
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from test_harness import json_codec
+from test_harness.utils import AgentReport, AgentStatus
+
+# Bump when a change to the analysis could change the verdict of a response.
+CACHE_VERSION = 1
+
+
+class VerdictCache:
+    """Acceptance verdicts by test asset and agent, saved across runs.
+
+    Each verdict is kept with the fingerprint of the response it was reached
+    from (see fingerprint_results) and the expected output it looked for, and
+    is only reused while all of them are the same.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        logger: logging.Logger = logging.getLogger(__name__),
+    ):
+        self.path = path
+        self.logger = logger
+        self.verdicts: Dict[str, Dict[str, Any]] = {}
+        # verdicts reused this run
+        self.reused = 0
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    data = json_codec.loads(f.read())
+                if data.get("version") == CACHE_VERSION:
+                    self.verdicts = data["verdicts"]
+            except Exception as e:
+                self.logger.warning(f"Failed to load verdict cache {path}: {e}")
+
+    @staticmethod
+    def key(test_id: str, asset_id: str, agent: str) -> str:
+        return f"{test_id}/{asset_id}/{agent}"
+
+    def candidate(
+        self, key: str, out_curie: str, expect_output: str
+    ) -> Optional[Tuple[str, AgentReport]]:
+        """Fingerprint and verdict of an earlier run, to check a response against.
+
+        For responses only fingerprinted once they're loaded, eg spooled ones
+        analyzed in an AnalysisPool worker.
+        """
+        verdict = self.verdicts.get(key)
+        if (
+            verdict is None
+            or verdict["out_curie"] != out_curie
+            or verdict["expect_output"] != expect_output
+        ):
+            return None
+        return verdict["fingerprint"], AgentReport.from_dict(verdict["report"])
+
+    def get(
+        self,
+        key: str,
+        fingerprint: Optional[str],
+        out_curie: str,
+        expect_output: str,
+    ) -> Optional[AgentReport]:
+        """Verdict of an earlier run on the same response, if there was one."""
+        candidate = self.candidate(key, out_curie, expect_output)
+        if fingerprint is None or candidate is None or candidate[0] != fingerprint:
+            return None
+        self.reused += 1
+        return candidate[1]
+
+    def put(
+        self,
+        key: str,
+        fingerprint: Optional[str],
+        out_curie: str,
+        expect_output: str,
+        report: AgentReport,
+    ):
+        """Remember the verdict reached on a response.
+
+        Only clean passes and failures are kept: errors are worth retrying.
+        """
+        if (
+            fingerprint is None
+            or report.status not in (AgentStatus.PASSED, AgentStatus.FAILED)
+            or report.message is not None
+        ):
+            self.verdicts.pop(key, None)
+            return
+        self.verdicts[key] = {
+            "fingerprint": fingerprint,
+            "out_curie": out_curie,
+            "expect_output": expect_output,
+            "report": report.to_dict(),
+        }
+
+    def save(self):
+        """Write the verdicts back to the cache file."""
+        if self.path is None:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(
+                json_codec.dumps_bytes(
+                    {"version": CACHE_VERSION, "verdicts": self.verdicts}
+                )
+            )
+        os.replace(tmp_path, self.path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "reused": self.reused,
+            "cached": len(self.verdicts),
+        }
@@ -76,6 +76,10 @@ class MockQueryRunner(QueryRunner):
             },
         }
 
+    def probe_registry(self, tests):
+        # the mock registry is static, there's nothing to probe
+        pass
+
 
 class MockResultCollector(ResultCollector):
     def collect_acceptance_result(
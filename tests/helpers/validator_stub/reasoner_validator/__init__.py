@@ -0,0 +1 @@
+"""Stand-in for reasoner-validator, so validation tests don't depend on it."""
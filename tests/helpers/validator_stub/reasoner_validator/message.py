@@ -0,0 +1,9 @@
+from enum import Enum
+
+
+class MessageType(Enum):
+    info = "information"
+    skipped = "skipped tests"
+    warning = "warnings"
+    error = "errors"
+    critical = "critical errors"
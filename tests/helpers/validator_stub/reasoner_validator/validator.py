@@ -0,0 +1,22 @@
+from reasoner_validator.message import MessageType
+
+
+class TRAPIResponseValidator:
+    """Flags a response without a message, or a message without a query graph."""
+
+    def __init__(self, trapi_version=None, biolink_version=None):
+        self.messages = {message_type: {} for message_type in MessageType}
+
+    def check_compliance_of_trapi_response(self, response):
+        message = response.get("message")
+        if not isinstance(message, dict):
+            self.messages[MessageType.critical][
+                "critical.trapi.response.unexpected"
+            ] = {}
+        elif "query_graph" not in message:
+            self.messages[MessageType.error][
+                "error.trapi.response.query_graph.missing"
+            ] = {}
+
+    def get_all_messages_of_type(self, message_type):
+        return self.messages[message_type]
@@ -0,0 +1,90 @@
+"""Test the Acceptance Test pass fail analysis."""
+
+from test_harness.acceptance_test_runner import (
+    ResultIndex,
+    run_acceptance_pass_fail_analysis,
+)
+from test_harness.utils import ActualOutput, AgentReport, AgentStatus
+
+
+def _results(num_results):
+    return [
+        {
+            "node_bindings": {
+                "sn": [{"id": "MONDO:0000001"}],
+                "on": [{"id": f"DRUG:{idx}"}],
+            },
+            "analyses": [{"score": 1 - idx / num_results}],
+        }
+        for idx in range(num_results)
+    ]
+
+
+def _analyze(results, out_curie, expect_output, index=None):
+    report = {"ara": AgentReport(AgentStatus.SKIPPED, None, None)}
+    run_acceptance_pass_fail_analysis(
+        report, "ara", results, out_curie, expect_output, index=index
+    )
+    return report["ara"]
+
+
+def test_verdicts_follow_result_windows():
+    """Each expected output looks at its own window of the ranked results."""
+    results = _results(100)
+    index = ResultIndex(results)
+    assert index.ranks[index.curies.lookup("MONDO:0000001")] == (0, 99)
+    verdicts = {
+        (out_curie, expect_output): _analyze(
+            results, out_curie, expect_output, index
+        ).status
+        for out_curie in ("DRUG:10", "DRUG:40", "DRUG:80", "DRUG:missing")
+        for expect_output in (
+            "TopAnswer",
+            "Acceptable",
+            "BadButForgivable",
+            "NeverShow",
+        )
+    }
+    assert verdicts == {
+        ("DRUG:10", "TopAnswer"): AgentStatus.PASSED,
+        ("DRUG:10", "Acceptable"): AgentStatus.PASSED,
+        ("DRUG:10", "BadButForgivable"): AgentStatus.FAILED,
+        ("DRUG:10", "NeverShow"): AgentStatus.FAILED,
+        ("DRUG:40", "TopAnswer"): AgentStatus.FAILED,
+        ("DRUG:40", "Acceptable"): AgentStatus.PASSED,
+        ("DRUG:40", "BadButForgivable"): AgentStatus.FAILED,
+        ("DRUG:40", "NeverShow"): AgentStatus.FAILED,
+        ("DRUG:80", "TopAnswer"): AgentStatus.FAILED,
+        ("DRUG:80", "Acceptable"): AgentStatus.FAILED,
+        ("DRUG:80", "BadButForgivable"): AgentStatus.PASSED,
+        ("DRUG:80", "NeverShow"): AgentStatus.FAILED,
+        ("DRUG:missing", "TopAnswer"): AgentStatus.FAILED,
+        ("DRUG:missing", "Acceptable"): AgentStatus.FAILED,
+        ("DRUG:missing", "BadButForgivable"): AgentStatus.PASSED,
+        ("DRUG:missing", "NeverShow"): AgentStatus.PASSED,
+    }
+    assert _analyze(
+        results, "DRUG:40", "Acceptable", index
+    ).actual_output == ActualOutput(ara_score=0.6, ara_rank=41)
+
+
+def test_unscorable_results_only_fail_their_curies():
+    """A result missing its analyses fails the curies it binds, like a rescan would."""
+    results = _results(3)
+    del results[1]["analyses"]
+    index = ResultIndex(results)
+    assert _analyze(results, "DRUG:0", "TopAnswer", index).status == (
+        AgentStatus.PASSED
+    )
+    # DRUG:1 and the curie bound by every result hit the broken result
+    for out_curie in ("DRUG:1", "MONDO:0000001"):
+        agent_report = _analyze(results, out_curie, "TopAnswer", index)
+        assert agent_report.status == AgentStatus.FAILED
+        assert "KeyError" in agent_report.message
+    # the scores of the results before the broken one are kept
+    assert (
+        _analyze(results, "MONDO:0000001", "TopAnswer", index).actual_output.ara_rank
+        == 1
+    )
+    broken = ResultIndex([{"analyses": []}])
+    assert _analyze([], "DRUG:0", "TopAnswer", broken).status == AgentStatus.FAILED
@@ -0,0 +1,97 @@
+"""Test the analysis of spooled responses in worker processes."""
+
+import json
+import subprocess
+import sys
+
+from test_harness.analysis_pool import (
+    AnalysisPool,
+    AnalysisTask,
+    analyze_spooled_response,
+)
+from test_harness.runner.ars_lifecycle import fingerprint_results
+from test_harness.runner.response_store import ResponseStore
+from test_harness.utils import AgentReport, AgentStatus
+
+RESPONSE = {
+    "message": {
+        "results": [
+            {
+                "node_bindings": {"sn": [{"id": "MONDO:1"}], "on": [{"id": "DRUG:1"}]},
+                "analyses": [{"score": 0.9}],
+            }
+        ]
+    }
+}
+
+
+def test_spooled_responses_are_analyzed_from_disk(tmp_path):
+    """Workers only get the spool handle and send the agent report back."""
+    store = ResponseStore(str(tmp_path), threshold=0)
+    handle = store.put(json.dumps(RESPONSE).encode())
+    agent_report, error, counts = analyze_spooled_response(
+        AnalysisTask("ara", handle, out_curie="DRUG:1", expect_output="TopAnswer")
+    )
+    assert error is None
+    assert agent_report.status == AgentStatus.PASSED
+    assert agent_report.actual_output.ara_rank == 1
+    # counted once decoded, since it wasn't on arrival
+    assert counts == {
+        "result_count": 1,
+        "fingerprint": fingerprint_results(RESPONSE),
+    }
+    empty = store.put(json.dumps({"message": {"results": []}}).encode())
+    agent_report, _, _ = analyze_spooled_response(
+        AnalysisTask("ara", empty, out_curie="DRUG:1", expect_output="TopAnswer")
+    )
+    assert agent_report.status == AgentStatus.NO_RESULTS
+    # a pathfinder response without paths fails the analysis
+    agent_report, error, _ = analyze_spooled_response(
+        AnalysisTask("ara", handle, path_nodes=[["DRUG:1"]])
+    )
+    assert agent_report.status == AgentStatus.FAILED
+    assert error == "'path_bindings'"
+
+
+def test_verdict_of_unchanged_response_is_taken(tmp_path):
+    """A worker takes the last run's verdict while the fingerprint matches."""
+    store = ResponseStore(str(tmp_path), threshold=0)
+    handle = store.put(json.dumps(RESPONSE).encode())
+    verdict = AgentReport(AgentStatus.FAILED, None, None)
+    task = AnalysisTask(
+        "ara",
+        handle,
+        out_curie="DRUG:1",
+        expect_output="TopAnswer",
+        verdict=(fingerprint_results(RESPONSE), verdict),
+    )
+    assert analyze_spooled_response(task)[0] is verdict
+    task.verdict = ("changed", verdict)
+    assert analyze_spooled_response(task)[0].status == AgentStatus.PASSED
+
+
+def test_analysis_pool_round_trip(tmp_path):
+    """A worker process decodes the spooled response and reports back."""
+    # in a fresh interpreter, since other tests monkey-patch this one with
+    # gevent after its selectors were imported
+    script = f"""
+import json
+from test_harness.analysis_pool import AnalysisPool, AnalysisTask
+from test_harness.runner.response_store import ResponseStore
+
+if __name__ == "__main__":
+    store = ResponseStore({str(tmp_path)!r}, threshold=0)
+    handle = store.put({json.dumps(RESPONSE)!r}.encode())
+    pool = AnalysisPool(1)
+    task = AnalysisTask("ara", handle, out_curie="DRUG:2", expect_output="NeverShow")
+    agent_report, error, _ = pool.submit(task).result(timeout=60)
+    pool.close()
+    print(agent_report.status.value, error)
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.stdout.split() == ["PASSED", "None"], result.stderr
@@ -0,0 +1,293 @@
+"""Test the ARS query lifecycle."""
+
+import json
+
+import httpx
+
+from test_harness.runner.ars_lifecycle import (
+    NOT_WAITED_STATUS,
+    ARSQuery,
+    ARSState,
+    fingerprint_results,
+    load_ars_message,
+)
+from test_harness.runner.circuit_breaker import CIRCUIT_OPEN_STATUS, CircuitOpenError
+from test_harness.runner.response_store import (
+    ResponseHandle,
+    ResponseStore,
+    content_digest,
+)
+
+from .helpers.logger import setup_logger
+
+logger = setup_logger()
+
+TRACE = {
+    "status": "Running",
+    "merged_version": None,
+    "children": [
+        {"message": "child-a", "actor": {"inforesid": "infores:ara-a"}},
+        {"message": "child-b", "actor": {"inforesid": "infores:ara-b"}},
+    ],
+}
+
+
+def _child(status, code=200):
+    return {"fields": {"status": status, "code": code, "data": {"status": status}}}
+
+
+def test_lifecycle_walks_every_state():
+    """A query goes from submitted to retained, one request at a time."""
+    query = ARSQuery("parent", "http://ars", logger, submitted_at=0)
+    assert query.wake_at == 10
+    assert query.next_request().url == "http://ars/ars/api/messages/parent?trace=y"
+    query.handle_response(TRACE, now=10)
+    assert query.state == ARSState.POLLING_CHILDREN
+    assert query.next_request().url == "http://ars/ars/api/messages/child-a"
+    query.handle_response(_child("Running"), now=11)
+    # the other children are polled in the same round
+    assert query.wake_at == 11
+    assert query.next_request().url == "http://ars/ars/api/messages/child-b"
+    query.handle_error(CircuitOpenError("ars"), now=12)
+    # the next round starts a poll interval after the last one, without
+    # blocking anyone
+    assert query.wake_at == 20
+    assert query.next_request().url == "http://ars/ars/api/messages/child-a"
+    query.handle_response(_child("Done"), now=21)
+    assert query.state == ARSState.POLLING_MERGED
+    query.handle_response({**TRACE, "status": "Done", "merged_version": "m"}, now=23)
+    assert query.next_request().url == "http://ars/ars/api/messages/m"
+    query.handle_response(_child("Done"), now=24)
+    request = query.next_request()
+    assert (request.method, request.idempotent) == ("POST", False)
+    query.handle_response({"success": True}, now=25)
+    assert query.done
+    assert query.next_request() is None
+    assert query.responses["ara-a"]["status_code"] == 200
+    assert query.responses["ara-b"]["status_code"] == CIRCUIT_OPEN_STATUS
+    assert query.pks == {
+        "parent_pk": "parent",
+        "ara-a": "child-a",
+        "ara-b": "child-b",
+        "ars": "m",
+    }
+    timings = query.timings()
+    assert timings["first_trace"] == 10
+    assert timings["agents"] == {"ara-a": 21, "ara-b": 12}
+    assert timings["merged_available"] == 23
+    assert timings["merged_fetched"] == 24
+    assert [transition["state"] for transition in query.transitions] == [
+        "SUBMITTED",
+        "POLLING_CHILDREN",
+        "POLLING_MERGED",
+        "FETCHING_MERGED",
+        "RETAINING",
+        "DONE",
+    ]
+
+
+def test_lifecycle_timeouts():
+    """Each child gets its own deadline, merging has one for the whole query."""
+    query = ARSQuery("parent", "http://ars", logger, submitted_at=0)
+    query.handle_response(TRACE, now=10)
+    query.handle_response(_child("Running", code=202), now=10 + query.max_ara_time + 1)
+    # the last Running message is kept
+    assert query.responses["ara-a"]["status_code"] == 202
+    # the other child's time started with the trace, not after the first one
+    assert query.children[1]["started_at"] == 10
+    query.handle_response(_child("Done"), now=400)
+    query.handle_response(TRACE, now=10 + query.max_query_time + 1)
+    assert query.responses["ars"]["status_code"] == 598
+    assert query.pks["ars"] == "None"
+    assert query.state == ARSState.RETAINING
+
+
+def test_failed_poll_after_running_keeps_int_status():
+    """A poll failing after a Running one gives the child a 500, not "Running"."""
+    query = ARSQuery("parent", "http://ars", logger, submitted_at=0)
+    query.handle_response(TRACE, now=10)
+    query.handle_response(_child("Running", code=202), now=11)
+    query.handle_response(_child("Done"), now=12)
+    assert query.next_request().url == "http://ars/ars/api/messages/child-a"
+    query.handle_error(httpx.ReadError("connection dropped"), now=21)
+    assert query.responses["ara-a"]["status_code"] == 500
+    assert query.state == ARSState.POLLING_MERGED
+
+
+def test_failed_retain_keeps_responses():
+    """Retaining is bookkeeping, a fast-failed retain still finishes the query."""
+    query = ARSQuery("parent", "http://ars", logger, submitted_at=0)
+    query.handle_response(TRACE, now=10)
+    query.handle_response(_child("Done"), now=11)
+    query.handle_response(_child("Done"), now=12)
+    query.handle_response({**TRACE, "status": "Done", "merged_version": "m"}, now=13)
+    query.handle_response(_child("Done"), now=14)
+    assert query.state == ARSState.RETAINING
+    query.handle_error(CircuitOpenError("ars"), now=15)
+    assert query.done
+    assert set(query.responses) == {"ara-a", "ara-b", "ars"}
+
+
+def test_lifecycle_resumes_from_snapshot():
+    """An interrupted query picks up from its last state."""
+    query = ARSQuery("parent", "http://ars", logger, submitted_at=0)
+    query.handle_response(TRACE, now=10)
+    query.handle_response(_child("Done"), now=11)
+    resumed = ARSQuery.from_dict(query.to_dict(), logger)
+    assert resumed.state == ARSState.POLLING_CHILDREN
+    assert resumed.next_request().url == "http://ars/ars/api/messages/child-b"
+    resumed.handle_error(httpx.ReadTimeout("timed out"), now=12)
+    assert resumed.responses["ara-b"]["status_code"] == 500
+    assert resumed.responses["ara-a"] == query.responses["ara-a"]
+    assert resumed.to_dict()["transitions"][:2] == query.to_dict()["transitions"]
+
+
+def test_early_completion_skips_unneeded_agents():
+    """Agents outside required_agents aren't waited for."""
+    query = ARSQuery(
+        "parent", "http://ars", logger, submitted_at=0, required_agents=["ara-a"]
+    )
+    query.handle_response(TRACE, now=10)
+    assert [child["infores"] for child in query.children] == ["ara-a"]
+    assert query.responses["ara-b"]["status_code"] == NOT_WAITED_STATUS
+    query.handle_response(_child("Done"), now=40)
+    # the merged message isn't needed either, straight on to retaining
+    assert query.state == ARSState.RETAINING
+    assert query.pks["ars"] == "None"
+    assert query.skipped_agents == ["ara-b", "ars"]
+    assert query.time_saved == 10 + query.max_query_time - 40
+
+
+def test_early_completion_only_counts_pending_skips():
+    """A skipped child that was done by the time the merge was isn't time saved."""
+    query = ARSQuery(
+        "parent",
+        "http://ars",
+        logger,
+        submitted_at=0,
+        required_agents=["ars", "ara-a"],
+    )
+    query.handle_response(TRACE, now=10)
+    query.handle_response(_child("Done"), now=40)
+    assert query.state == ARSState.POLLING_MERGED
+    done_trace = {
+        "status": "Done",
+        "merged_version": "m",
+        "children": [{**child, "status": "Done"} for child in TRACE["children"]],
+    }
+    query.handle_response(done_trace, now=50)
+    query.handle_response(_child("Done"), now=51)
+    assert query.responses["ara-b"]["status_code"] == NOT_WAITED_STATUS
+    assert query.time_saved == 0
+
+
+def test_large_responses_are_spooled(tmp_path):
+    """Big agent responses only keep a handle in memory, even across snapshots."""
+    store = ResponseStore(str(tmp_path), threshold=128)
+    query = ARSQuery("parent", "http://ars", logger, submitted_at=0, store=store)
+    query.handle_response(TRACE, now=10)
+    small = {"fields": {"status": "Done", "code": 200, "data": {"message": {}}}}
+    query.handle_response(small, now=11, content=json.dumps(small).encode())
+    results = [{"node_bindings": {}, "analyses": []}] * 5
+    big = {
+        "fields": {
+            "status": "Done",
+            "code": 200,
+            "data": {"message": {"results": results}},
+        }
+    }
+    content = json.dumps(big).encode()
+    query.handle_response(big, now=12, content=content)
+    assert isinstance(query.responses["ara-a"]["response"], dict)
+    handle = query.responses["ara-b"]["response"]
+    assert isinstance(handle, ResponseHandle)
+    assert query.responses["ara-b"]["bytes"] == len(content)
+    assert query.responses["ara-b"]["result_count"] == 5
+    resumed = ARSQuery.from_dict(json.loads(json.dumps(query.to_dict())), logger)
+    assert resumed.responses["ara-b"]["response"] == handle
+    assert resumed.responses["ara-b"]["digest"] == content_digest(content)
+    assert handle.load() == {"message": {"results": results}}
+    assert store.to_dict() == {
+        "threshold": 128,
+        "spooled": 1,
+        "spooled_bytes": len(content),
+    }
+    # a store only cleans up a directory it made itself
+    store.close()
+    assert handle.load() == {"message": {"results": results}}
+
+
+def test_unretained_responses_only_keep_their_summary():
+    """Agents that aren't reported on never hold on to their payloads."""
+    query = ARSQuery("parent", "http://ars", logger, retained_agents=["ara-a"])
+    query.handle_response(TRACE, now=10)
+    done = {"fields": {"status": "Done", "code": 200, "data": {"message": {}}}}
+    query.handle_response(done, now=11, content=b"x" * 10)
+    query.handle_response(done, now=12, content=b"x" * 10)
+    assert query.responses["ara-a"]["response"] == {"message": {}}
+    assert query.responses["ara-b"] == {
+        "status_code": 200,
+        "bytes": 10,
+        "result_count": 0,
+        "digest": None,
+        "fingerprint": None,
+        "discarded": True,
+    }
+
+
+def test_fingerprints_cover_bindings_and_scores():
+    """Only what the analysis looks at changes a response's fingerprint."""
+
+    def response(score, attributes=()):
+        return {
+            "message": {
+                "results": [
+                    {
+                        "node_bindings": {
+                            "sn": [{"id": "MONDO:1", "attributes": list(attributes)}],
+                            "on": [{"id": "DRUG:1"}],
+                        },
+                        "analyses": [{"score": score}],
+                    }
+                ]
+            }
+        }
+
+    fingerprint = fingerprint_results(response(0.5))
+    assert fingerprint is not None
+    assert fingerprint_results(response(0.5, [{"value": 1}])) == fingerprint
+    assert fingerprint_results(response(0.6)) != fingerprint
+    assert fingerprint_results({"message": {"results": []}}) is None
+    assert fingerprint_results({"message": {"results": [{}]}}) is None
+
+
+def test_streamed_messages_only_decode_their_status(tmp_path, mocker):
+    """The data of a message streamed to disk is left there, if it can be."""
+    store = ResponseStore(str(tmp_path))
+    message = {
+        "pk": "child",
+        "fields": {
+            "status": "Done",
+            "code": 200,
+            "data": {"message": {"results": [{}] * 3}},
+        },
+    }
+    writer = store.writer()
+    writer.write(json.dumps(message).encode())
+    content = writer.close()
+    loads = mocker.spy(ResponseHandle, "load")
+    assert load_ars_message(content) == {
+        "pk": "child",
+        "fields": {"status": "Done", "code": 200, "data": None},
+    }
+    assert loads.call_count == 0
+    # the status after the data is only found decoding all of it
+    message["fields"] = {
+        "data": message["fields"]["data"],
+        "status": "Done",
+        "code": 200,
+    }
+    writer = store.writer()
+    writer.write(json.dumps(message).encode())
+    assert load_ars_message(writer.close()) == message
+    assert loads.call_count == 1
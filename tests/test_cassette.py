@@ -0,0 +1,208 @@
+"""Test recording and replaying the http exchanges of a run."""
+
+import gzip
+import sqlite3
+import time
+
+import httpx
+from pytest_httpx import HTTPXMock
+
+from test_harness import json_codec
+from test_harness.run import get_retry_policy
+from test_harness.runner import ars_lifecycle
+from test_harness.runner.async_query_runner import AsyncQueryRunner
+from test_harness.runner.cassette import Cassette, RecordingTransport
+from test_harness.runner.query_runner import QueryRunner
+from test_harness.runner.response_store import ResponseHandle, ResponseStore
+from test_harness.runner.retry import RetryPolicy
+
+from .helpers.example_tests import example_test_cases
+from .helpers.logger import setup_logger
+
+logger = setup_logger()
+
+REGISTRY = {
+    "staging": {
+        "ars": [
+            {
+                "_id": "ars",
+                "title": "ARS",
+                "infores": "infores:ars",
+                "url": "http://ars",
+                "healthy": True,
+                "rtt": 0.1,
+            }
+        ]
+    }
+}
+
+
+def test_replay_serves_recorded_run(mocker, monkeypatch, tmp_path, httpx_mock):
+    """A replay gets the recorded responses in order, without network or waits."""
+    mocker.patch(
+        "test_harness.runner.query_runner.retrieve_registry_from_smartapi",
+        return_value=REGISTRY,
+    )
+    monkeypatch.setattr(ars_lifecycle, "ARS_TRACE_DELAY", 0)
+    monkeypatch.setattr(ars_lifecycle, "POLL_INTERVAL", 0)
+    httpx_mock.add_response(
+        url="https://nodenorm-es.ci.transltr.io/get_normalized_nodes",
+        json={"MONDO:0010794": None, "DRUGBANK:DB00313": None, "MESH:D001463": None},
+    )
+    httpx_mock.add_response(url="http://ars/ars/api/submit", json={"pk": "parent"})
+    httpx_mock.add_response(
+        url="http://ars/ars/api/messages/parent?trace=y",
+        json={
+            "status": "Done",
+            "merged_version": "merged",
+            "children": [
+                {"message": "child", "actor": {"inforesid": "infores:ara"}},
+            ],
+        },
+    )
+    # still running on the first poll
+    httpx_mock.add_response(
+        url="http://ars/ars/api/messages/child",
+        json={"fields": {"status": "Running", "code": 202}},
+    )
+    for pk in ("child", "merged"):
+        httpx_mock.add_response(
+            url=f"http://ars/ars/api/messages/{pk}",
+            json={"fields": {"status": "Done", "code": 200, "data": {"pk": pk}}},
+        )
+    httpx_mock.add_response(
+        url="http://ars/ars/api/retain/parent", json={"success": True}
+    )
+    path = str(tmp_path / "run.cassette")
+    query_runner = QueryRunner(logger, cassette=Cassette(path))
+    query_runner.retrieve_registry("1.5.0")
+    test_case = example_test_cases["TestCase_1"].model_copy(deep=True)
+    recorded, _ = query_runner.run_queries(test_case)
+    assert query_runner.get_stats()["cassette"]["recorded"] == 8
+    query_runner.close()
+
+    # the ARS timings as they are in production, and nothing left to mock
+    monkeypatch.setattr(ars_lifecycle, "ARS_TRACE_DELAY", 10)
+    monkeypatch.setattr(ars_lifecycle, "POLL_INTERVAL", 10)
+    query_runner = AsyncQueryRunner(logger, cassette=Cassette(path, replay=True))
+    query_runner.retrieve_registry("1.5.0")
+    assert query_runner.registry == REGISTRY
+    test_case = example_test_cases["TestCase_1"].model_copy(deep=True)
+    start_time = time.time()
+    replayed, _ = query_runner.run_queries(test_case)
+    assert time.time() - start_time < 5
+    query = list(replayed.values())[0]
+    assert query["pks"] == list(recorded.values())[0]["pks"]
+    assert query["responses"]["ara"]["response"] == {"pk": "child"}
+    assert query["responses"]["ars"]["response"] == {"pk": "merged"}
+    # the trace delay and the poll passed on the replayed clock
+    assert query["lifecycle"]["timings"]["agents"]["ara"] >= 20
+    assert query_runner.get_stats()["cassette"] == {
+        "mode": "replay",
+        "recorded": 0,
+        "replayed": 8,
+        "missed": 0,
+    }
+    query_runner.close()
+
+
+def test_recording_streams_big_responses(mocker, tmp_path, httpx_mock: HTTPXMock):
+    """Recording doesn't read a body the runner streams to disk."""
+    results = [
+        {"node_bindings": {"n0": [{"id": "MONDO:1"}]}, "analyses": [{"score": 1}]}
+    ] * 50
+    query = json_codec.dumps_bytes({"message": {"results": results}})
+    httpx_mock.add_response(url="http://ara/query", content=query)
+    store = ResponseStore(str(tmp_path), threshold=128)
+    mocker.patch.object(store, "put", side_effect=AssertionError("read whole"))
+    path = str(tmp_path / "run.cassette")
+    query_runner = QueryRunner(logger, response_store=store, cassette=Cassette(path))
+    _, responses, _ = query_runner.run_query(1, {}, "http://ara", "infores:ara")
+    assert isinstance(responses["ara"]["response"], ResponseHandle)
+    # exchanges are committed in batches, and when the cassette is closed
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM exchanges").fetchone() == (0,)
+    query_runner.close()
+
+    cassette = Cassette(path, replay=True)
+    with httpx.Client(transport=cassette.transport(httpx.Limits())) as client:
+        assert client.post("http://ara/query", json={}).content == query
+    cassette.close()
+
+
+def test_recorded_bodies_keep_their_encoding(tmp_path):
+    """Bodies are recorded as they came over the wire, and decoded on replay."""
+    query = json_codec.dumps_bytes({"message": {"results": []}})
+    network = httpx.MockTransport(
+        lambda request: httpx.Response(
+            200,
+            content=iter([gzip.compress(query)]),
+            headers={"Content-Encoding": "gzip"},
+        )
+    )
+    path = str(tmp_path / "run.cassette")
+    cassette = Cassette(path)
+    with httpx.Client(transport=RecordingTransport(cassette, network)) as client:
+        assert client.get("http://ara/meta").content == query
+    cassette.close()
+
+    cassette = Cassette(path, replay=True)
+    with httpx.Client(transport=cassette.transport(httpx.Limits())) as client:
+        assert client.get("http://ara/meta").content == query
+    cassette.close()
+
+
+def test_replay_raises_recorded_errors(tmp_path, httpx_mock: HTTPXMock):
+    """Transport errors are replayed, and unrecorded requests never connect."""
+    httpx_mock.add_exception(httpx.ReadTimeout("timed out"), url="http://ara/query")
+    path = str(tmp_path / "run.cassette")
+    query_runner = QueryRunner(
+        logger, retry_policy=RetryPolicy(max_retries=0), cassette=Cassette(path)
+    )
+    _, responses, _ = query_runner.run_query(1, {}, "http://ara", "infores:ara")
+    assert responses["ara"]["status_code"] == 418
+    query_runner.close()
+
+    cassette = Cassette(path, replay=True)
+    with httpx.Client(transport=cassette.transport(httpx.Limits())) as client:
+        try:
+            client.post("http://ara/query", json={})
+        except httpx.ReadTimeout as e:
+            assert str(e) == "timed out"
+        else:
+            raise AssertionError("the recorded timeout wasn't replayed")
+        try:
+            client.post("http://ara/query", json={"other": "query"})
+        except httpx.ConnectError:
+            pass
+        else:
+            raise AssertionError("an unrecorded request got a response")
+    assert cassette.to_dict()["missed"] == 1
+    cassette.close()
+
+
+def test_replayed_retries_dont_wait(mocker, tmp_path, httpx_mock: HTTPXMock):
+    """Backoffs of replayed 5xx responses pass on the replayed clock."""
+    for status_code in (503, 503, 200):
+        httpx_mock.add_response(url="http://ara/meta", status_code=status_code)
+    path = str(tmp_path / "run.cassette")
+    query_runner = QueryRunner(
+        logger, retry_policy=RetryPolicy(base_delay=0), cassette=Cassette(path)
+    )
+    res = query_runner.send_request("GET", "http://ara/meta", 5, idempotent=True)
+    assert res.status_code == 200
+    query_runner.close()
+
+    mocker.patch.object(RetryPolicy, "backoff", return_value=30)
+    cassette = Cassette(path, replay=True)
+    query_runner = QueryRunner(
+        logger, retry_policy=get_retry_policy({}, cassette), cassette=cassette
+    )
+    start_time = time.time()
+    replayed_start = query_runner.clock.time()
+    res = query_runner.send_request("GET", "http://ara/meta", 5, idempotent=True)
+    assert res.status_code == 200
+    assert time.time() - start_time < 5
+    assert query_runner.clock.time() - replayed_start >= 60
+    assert query_runner.get_stats()["retries"]["retries_used"] == 2
+    query_runner.close()
@@ -0,0 +1,22 @@
+"""Test the harness JSON codec."""
+
+import json
+
+from test_harness import json_codec
+from test_harness.utils import AgentStatus
+
+
+def test_codec_round_trips_like_stdlib():
+    """Whatever the backend, documents decode to the same objects."""
+    document = {"message": {"results": [{"score": 0.5, "id": "MONDO:1"}]}, "n": None}
+    content = json_codec.dumps_bytes(document)
+    assert json_codec.loads(content) == document
+    assert json.loads(json_codec.dumps(document, indent=4)) == document
+    # str enums and huge integers are encoded like stdlib json does
+    assert json_codec.loads(json_codec.dumps({"status": AgentStatus.PASSED})) == {
+        "status": "PASSED"
+    }
+    assert json_codec.dumps(2**70) == str(2**70)
+    body = json_codec.json_body(document)
+    assert body["headers"] == {"Content-Type": "application/json"}
+    assert json.loads(body["content"]) == document
@@ -9,10 +9,12 @@ import json
 import os
 
 from test_harness.main import main
+from test_harness.preflight import PreflightReport
 from test_harness.reporter import LocalReporter, Reporter
 from test_harness.slacker import LocalSlacker, Slacker
 
 from .helpers.example_tests import example_test_cases
+from .helpers.mocks import MockQueryRunner
 
 
 def test_slacker_is_configured(monkeypatch):
@@ -94,6 +96,10 @@ def test_main_local_flag_uses_local_stand_ins(mocker, monkeypatch, tmp_path):
     monkeypatch.setenv("ZE_REFRESH_TOKEN", "tok")
 
     run_tests = mocker.patch("test_harness.main.run_tests", return_value={})
+    mocker.patch("test_harness.main.run_preflight", return_value=PreflightReport())
+    mocker.patch(
+        "test_harness.main.get_query_runner", return_value=MockQueryRunner(None)
+    )
     reporter_cls = mocker.patch("test_harness.main.Reporter", wraps=Reporter)
     slacker_cls = mocker.patch("test_harness.main.Slacker", wraps=Slacker)
     local_reporter = mocker.patch(
@@ -1,18 +1,27 @@
 import pytest
 
 from test_harness.main import main
+from test_harness.preflight import PreflightReport
 
 from .helpers.example_tests import example_test_cases
+from .helpers.logger import setup_logger
 from .helpers.mocks import (
+    MockQueryRunner,
     MockReporter,
     MockSlacker,
 )
 
+logger = setup_logger()
+
 
 def test_main(mocker):
     """Test the main function."""
     # This article is awesome: https://nedbatchelder.com/blog/201908/why_your_mock_doesnt_work.html
     run_tests = mocker.patch("test_harness.main.run_tests", return_value={})
+    mocker.patch(
+        "test_harness.main.get_query_runner", return_value=MockQueryRunner(logger)
+    )
+    mocker.patch("test_harness.main.run_preflight", return_value=PreflightReport())
     mocker.patch("test_harness.main.Slacker", return_value=MockSlacker())
     mocker.patch("test_harness.main.Reporter", return_value=MockReporter())
     main(
@@ -25,3 +34,60 @@ def test_main(mocker):
         }
     )
     run_tests.assert_called_once()
+
+
+def test_main_aborts_on_failed_preflight(mocker):
+    """An unhealthy environment stops the run with a single notification."""
+    run_tests = mocker.patch("test_harness.main.run_tests", return_value={})
+    query_runner = MockQueryRunner(logger)
+    mocker.patch("test_harness.main.get_query_runner", return_value=query_runner)
+    mocker.patch(
+        "test_harness.main.run_preflight",
+        return_value=PreflightReport(critical=["ARS in ci is unreachable"]),
+    )
+    slacker = MockSlacker()
+    post_notification = mocker.spy(slacker, "post_notification")
+    mocker.patch("test_harness.main.Slacker", return_value=slacker)
+    reporter = mocker.patch("test_harness.main.Reporter", return_value=MockReporter())
+    main(
+        {
+            "tests": example_test_cases,
+            "suite": "testing",
+            "save_to_dashboard": False,
+            "json_output": False,
+            "log_level": "ERROR",
+        }
+    )
+    run_tests.assert_not_called()
+    reporter.assert_not_called()
+    assert query_runner.closed
+    post_notification.assert_called_once()
+    assert (
+        "ARS in ci is unreachable" in post_notification.call_args.kwargs["messages"][0]
+    )
+
+
+def test_main_reanalyzes_previous_run(mocker, tmp_path):
+    """A previous run is reanalyzed without a new run or any reporting."""
+    run_tests = mocker.patch("test_harness.main.run_tests", return_value={})
+    reanalyze = mocker.patch("test_harness.main.reanalyze", return_value=[])
+    reporter = mocker.patch("test_harness.main.Reporter", return_value=MockReporter())
+    previous_run = tmp_path / "previous.csv"
+    previous_run.write_text(
+        "name,url,pk,TestCase,TestAsset,ars\n"
+        '"Valproic_Acid",http://ir/1,https://arax.ci.transltr.io/?r=parent,'
+        "TestCase_1,Asset_3,PASSED\n"
+    )
+    main(
+        {
+            "tests": example_test_cases,
+            "suite": "testing",
+            "previous_run": str(previous_run),
+            "output_dir": str(tmp_path / "results"),
+            "log_level": "ERROR",
+        }
+    )
+    run_tests.assert_not_called()
+    reporter.assert_not_called()
+    reanalyze.assert_called_once()
+    assert (tmp_path / "results" / "testing_reanalysis.csv").exists()
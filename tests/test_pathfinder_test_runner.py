@@ -0,0 +1,69 @@
+"""Test the Pathfinder pass fail analysis."""
+
+from test_harness.curies import CurieTable
+from test_harness.pathfinder_test_runner import (
+    PathNodeIndex,
+    pathfinder_pass_fail_analysis,
+)
+from test_harness.utils import AgentStatus, PathfinderReport
+
+MESSAGE = {
+    "results": [
+        {"analyses": [{"path_bindings": {"p0": [{"id": "a0"}]}}]},
+        {"analyses": [{"path_bindings": {"p0": [{"id": "a1"}, {"id": "a0"}]}}]},
+    ],
+    "auxiliary_graphs": {
+        "a0": {"edges": ["e0"]},
+        "a1": {"edges": ["e0", "e1", "e2"]},
+    },
+    "knowledge_graph": {
+        "edges": {
+            "e0": {"subject": "SOURCE:1", "object": "GENE:1"},
+            "e1": {"subject": "GENE:1", "object": "GENE:2"},
+            "e2": {"subject": "GENE:2", "object": "TARGET:1"},
+        }
+    },
+}
+PATH_NODES = [["GENE:1", "GENE:2"], ["TARGET:1"]]
+
+
+def _analyze(all_results):
+    report = {"ara": PathfinderReport(AgentStatus.SKIPPED, None, None)}
+    pathfinder_pass_fail_analysis(
+        report, "ara", MESSAGE, PATH_NODES, 2, all_results=all_results
+    )
+    return report["ara"]
+
+
+def test_path_nodes_match_one_curie_per_group():
+    """A path counts each expected path node group once."""
+    curies = CurieTable()
+    index = PathNodeIndex(PATH_NODES, curies)
+    assert index.groups == {
+        curies.lookup("GENE:1"): [0],
+        curies.lookup("GENE:2"): [0],
+        curies.lookup("TARGET:1"): [1],
+    }
+    edges = MESSAGE["knowledge_graph"]["edges"]
+    matched = index.match(edges[edge_id] for edge_id in ("e0", "e1", "e2"))
+    assert index.names(matched) == "GENE:1,TARGET:1"
+
+
+def test_curies_are_interned_once():
+    """Indexes sharing a table share the integers of their curies."""
+    curies = CurieTable()
+    PathNodeIndex(PATH_NODES, curies)
+    PathNodeIndex([["TARGET:1", "GENE:3"]], curies)
+    assert len(curies) == 4
+    assert curies.curie(curies.lookup("GENE:3")) == "GENE:3"
+    assert curies.lookup("GENE:4") is None
+
+
+def test_all_results_can_be_analyzed():
+    """Only the top result is analyzed, unless asked for all of them."""
+    top_result = _analyze(all_results=False)
+    assert top_result.status == AgentStatus.FAILED
+    assert top_result.expected_nodes_found == "GENE:1"
+    all_results = _analyze(all_results=True)
+    assert all_results.status == AgentStatus.PASSED
+    assert set(all_results.expected_nodes_found.split(",")) == {"GENE:1", "TARGET:1"}
@@ -0,0 +1,52 @@
+"""Test the pre-flight health checks."""
+
+import httpx
+from pytest_httpx import HTTPXMock
+
+from test_harness.preflight import run_preflight
+from test_harness.runner.query_runner import QueryRunner
+
+from .helpers.example_tests import example_test_cases
+from .helpers.logger import setup_logger
+
+logger = setup_logger()
+
+NODE_NORM = "https://nodenorm-es.ci.transltr.io/get_normalized_nodes"
+
+
+def _query_runner():
+    query_runner = QueryRunner(logger)
+    query_runner.registry = {
+        "staging": {
+            "ars": [
+                {
+                    "_id": "ars",
+                    "title": "ARS",
+                    "infores": "infores:ars",
+                    "url": "http://ars",
+                }
+            ],
+        },
+    }
+    return query_runner
+
+
+def test_preflight_healthy(httpx_mock: HTTPXMock):
+    """A reachable ARS and NodeNorm pass the pre-flight checks."""
+    httpx_mock.add_response(url="http://ars")
+    httpx_mock.add_response(url="http://ars/ars/api/status", json={})
+    httpx_mock.add_response(url=NODE_NORM, json={"MONDO:0005148": None})
+    report = run_preflight(example_test_cases.values(), _query_runner(), logger)
+    assert report.healthy
+    assert report.critical == [] and report.degraded == []
+
+
+def test_preflight_dead_ars_is_critical(httpx_mock: HTTPXMock):
+    """A dead ARS fails the pre-flight, a dead NodeNorm only degrades it."""
+    httpx_mock.add_exception(httpx.ConnectError("refused"), url="http://ars")
+    httpx_mock.add_response(url=NODE_NORM, status_code=502)
+    report = run_preflight(example_test_cases.values(), _query_runner(), logger)
+    assert not report.healthy
+    assert len(report.critical) == 1 and "ARS in ci" in report.critical[0]
+    assert len(report.degraded) == 1 and "NodeNorm" in report.degraded[0]
+    assert "CRITICAL" in report.summary()
@@ -0,0 +1,635 @@
+"""Test the Query Runner."""
+
+import asyncio
+import threading
+import time
+
+import httpx
+from pytest_httpx import HTTPXMock
+
+from test_harness import json_codec
+
+from test_harness.runner.ars_lifecycle import (
+    NOT_WAITED_STATUS,
+    count_response,
+    fingerprint_results,
+)
+from test_harness.runner.async_query_runner import AsyncQueryRunner
+from test_harness.runner.circuit_breaker import (
+    CIRCUIT_OPEN_STATUS,
+    FAILURE_THRESHOLD,
+    CircuitBreaker,
+    CircuitState,
+)
+from test_harness.runner.concurrency import (
+    AdaptiveConcurrencyLimiter,
+    MemoryBudget,
+    get_pool_name,
+)
+from test_harness.runner.query_runner import QueryRunner
+from test_harness.runner.response_store import (
+    ResponseHandle,
+    ResponseStore,
+    content_digest,
+)
+from test_harness.runner.rate_limit import (
+    POLL_RATE_LIMITS,
+    RATE_LIMITS,
+    HostRateLimiter,
+    RateLimit,
+    TokenBucket,
+    parse_rate_limit,
+)
+from test_harness.runner.retry import MAX_RETRIES, RetryPolicy
+from test_harness.runner.smart_api_registry import probe_registry
+
+from .helpers.example_tests import example_test_cases
+from .helpers.logger import setup_logger
+
+logger = setup_logger()
+
+
+def _registry():
+    return {
+        "staging": {
+            "ars": [
+                {
+                    "_id": "ars-slow",
+                    "title": "ARS",
+                    "infores": "infores:ars",
+                    "url": "http://ars-slow",
+                },
+                {
+                    "_id": "ars-dead",
+                    "title": "ARS",
+                    "infores": "infores:ars",
+                    "url": "http://ars-dead",
+                },
+                {
+                    "_id": "ars-fast",
+                    "title": "ARS",
+                    "infores": "infores:ars",
+                    "url": "http://ars-fast",
+                },
+            ],
+        },
+    }
+
+
+def test_probe_registry_annotates_endpoints(httpx_mock: HTTPXMock):
+    """Reachable endpoints are marked healthy with an rtt, dead ones are not."""
+    httpx_mock.add_response(url="http://ars-slow", status_code=404)
+    httpx_mock.add_response(url="http://ars-fast", status_code=200)
+    httpx_mock.add_exception(httpx.ConnectError("refused"), url="http://ars-dead")
+    registry = _registry()
+
+    probes = probe_registry(registry, "staging", ["ars"])
+
+    assert set(probes) == {"http://ars-slow", "http://ars-dead", "http://ars-fast"}
+    slow, dead, fast = registry["staging"]["ars"]
+    assert slow["healthy"] and slow["rtt"] is not None
+    assert fast["healthy"] and fast["rtt"] is not None
+    assert not dead["healthy"] and dead["rtt"] is None
+
+
+def test_runner_skips_dead_and_picks_fastest(httpx_mock: HTTPXMock):
+    """Dead endpoints are skipped and the lowest rtt server is chosen."""
+    httpx_mock.add_response(url="http://ars-slow", status_code=200)
+    httpx_mock.add_response(url="http://ars-fast", status_code=200)
+    httpx_mock.add_response(url="http://ars-dead", status_code=503)
+    query_runner = QueryRunner(logger)
+    query_runner.registry = _registry()
+    query_runner.probe_registry(example_test_cases.values())
+
+    services = query_runner.get_services("ci", "ars")
+    assert [service["_id"] for service in services] == ["ars-slow", "ars-fast"]
+
+    services[0]["rtt"] = 2.0
+    services[1]["rtt"] = 0.1
+    assert query_runner.get_fastest_service("ci", "ars")["_id"] == "ars-fast"
+    assert query_runner.get_fastest_service("ci", "kp") is None
+
+
+def test_circuit_breaker_trips_and_recovers(mocker):
+    """Consecutive failures open the circuit, a half-open probe closes it."""
+    circuit_breaker = CircuitBreaker("ara", failure_threshold=2, reset_timeout=60)
+    assert circuit_breaker.allow_request()
+    circuit_breaker.record_failure("timeout")
+    assert circuit_breaker.state == CircuitState.CLOSED
+    circuit_breaker.record_failure("timeout")
+    assert circuit_breaker.state == CircuitState.OPEN
+    assert not circuit_breaker.allow_request()
+    assert circuit_breaker.fast_failures == 1
+
+    # once the reset timeout passes, a single probe is let through
+    mocker.patch(
+        "test_harness.runner.circuit_breaker.time.time",
+        return_value=circuit_breaker.opened_at + 61,
+    )
+    assert circuit_breaker.allow_request()
+    assert circuit_breaker.state == CircuitState.HALF_OPEN
+    assert not circuit_breaker.allow_request()
+    circuit_breaker.record_success()
+    assert circuit_breaker.state == CircuitState.CLOSED
+    assert [event["state"] for event in circuit_breaker.timeline] == [
+        "OPEN",
+        "HALF_OPEN",
+        "CLOSED",
+    ]
+
+
+def test_failed_probe_reopens_circuit(mocker):
+    """A half-open probe that raises anything but a response re-opens the circuit."""
+    query_runner = QueryRunner(logger)
+    circuit_breaker = query_runner.get_circuit_breaker("http://ara/query")
+    circuit_breaker.state = CircuitState.OPEN
+    circuit_breaker.opened_at = 0
+    mocker.patch.object(
+        query_runner.bulkheads["ara"].client,
+        "request",
+        side_effect=ValueError("bad body"),
+    )
+    try:
+        query_runner.send_request("POST", "http://ara/query", timeout=5)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("the probe's error was swallowed")
+    assert circuit_breaker.state == CircuitState.OPEN
+    # not left waiting on a probe that will never report back
+    assert not circuit_breaker._probe_in_flight
+    query_runner.close()
+
+
+def test_run_query_fast_fails_open_circuit(httpx_mock: HTTPXMock):
+    """Once a host's circuit is open, queries to it aren't sent at all."""
+    for _ in range(FAILURE_THRESHOLD):
+        httpx_mock.add_exception(httpx.ReadTimeout("timed out"), url="http://ara/query")
+    query_runner = QueryRunner(logger)
+    for _ in range(FAILURE_THRESHOLD):
+        _, responses, _ = query_runner.run_query(1, {}, "http://ara", "infores:ara")
+        assert responses["ara"]["status_code"] == 418
+
+    _, responses, _ = query_runner.run_query(1, {}, "http://ara", "infores:ara")
+    assert responses["ara"]["status_code"] == CIRCUIT_OPEN_STATUS
+    stats = query_runner.get_stats()["circuit_breakers"]["ara"]
+    assert stats["state"] == "OPEN"
+    assert stats["fast_failures"] == 1
+
+
+def test_polls_are_retried_on_transient_errors(mocker, httpx_mock: HTTPXMock):
+    """A dropped connection or 5xx on a poll is retried, not taken as final."""
+    mocker.patch("test_harness.runner.ars_lifecycle.ARS_TRACE_DELAY", 0)
+    httpx_mock.add_response(
+        url="http://ars/ars/api/messages/parent?trace=y",
+        json={
+            "status": "Done",
+            "children": [{"message": "child", "actor": {"inforesid": "infores:ara"}}],
+        },
+    )
+    url = "http://ars/ars/api/messages/child"
+    httpx_mock.add_exception(httpx.ReadError("connection dropped"), url=url)
+    httpx_mock.add_response(url=url, status_code=502)
+    httpx_mock.add_response(
+        url=url,
+        json={"fields": {"status": "Done", "code": 200, "data": {"message": {}}}},
+    )
+    httpx_mock.add_response(
+        url="http://ars/ars/api/retain/parent", json={"success": True}
+    )
+    query_runner = QueryRunner(logger, retry_policy=RetryPolicy(base_delay=0))
+    responses, _ = query_runner.get_ars_responses("parent", "http://ars")
+    assert responses["ara"]["status_code"] == 200
+    # no merged version
+    assert responses["ars"]["status_code"] == 410
+    assert query_runner.get_stats()["retries"]["by_host"] == {"ars": 2}
+
+
+def test_big_responses_are_streamed_to_disk(mocker, tmp_path, httpx_mock: HTTPXMock):
+    """Bodies announced as big go straight to the spool, never read whole."""
+    mocker.patch("test_harness.runner.ars_lifecycle.ARS_TRACE_DELAY", 0)
+    results = [
+        {"node_bindings": {"n0": [{"id": "MONDO:1"}]}, "analyses": [{"score": 1}]}
+    ] * 5
+    query = json_codec.dumps_bytes({"message": {"results": results}})
+    httpx_mock.add_response(url="http://ara/query", content=query)
+    httpx_mock.add_response(
+        url="http://ars/ars/api/messages/parent?trace=y",
+        json={
+            "status": "Done",
+            "children": [{"message": "child", "actor": {"inforesid": "infores:ara"}}],
+        },
+    )
+    message = json_codec.dumps_bytes(
+        {
+            "fields": {
+                "status": "Done",
+                "code": 200,
+                "data": {"message": {"results": results}},
+            }
+        }
+    )
+    httpx_mock.add_response(url="http://ars/ars/api/messages/child", content=message)
+    httpx_mock.add_response(
+        url="http://ars/ars/api/retain/parent", json={"success": True}
+    )
+    store = ResponseStore(str(tmp_path), threshold=128)
+    mocker.patch.object(store, "put", side_effect=AssertionError("read whole"))
+    loads = mocker.spy(ResponseHandle, "load")
+    query_runner = QueryRunner(logger, response_store=store)
+
+    _, responses, _ = query_runner.run_query(1, {}, "http://ara", "infores:ara")
+    ara_entry = responses["ara"]
+    responses, _ = query_runner.get_ars_responses("parent", "http://ars")
+    ars_entry = responses["ara"]
+    # nothing is decoded until it's analyzed, not even for its counts
+    assert loads.call_count == 0
+    assert store.to_dict()["spooled"] == 2
+
+    assert isinstance(ara_entry["response"], ResponseHandle)
+    assert ara_entry["bytes"] == len(query)
+    assert ara_entry["digest"] == content_digest(query)
+    assert ara_entry["result_count"] is None
+    assert ara_entry["fingerprint"] is None
+    count_response(ara_entry, ara_entry["response"].load())
+    assert ara_entry["result_count"] == 5
+    assert ara_entry["fingerprint"] == fingerprint_results(
+        {"message": {"results": results}}
+    )
+
+    assert ars_entry["response"].key_path == ("fields", "data")
+    assert ars_entry["response"].load() == {"message": {"results": results}}
+    assert ars_entry["status_code"] == 200
+    assert ars_entry["digest"] == content_digest(message)
+    assert ars_entry["result_count"] is None
+
+
+def test_retries_count_as_one_host_failure(httpx_mock: HTTPXMock):
+    """A flaky call that runs out of retries doesn't open its host's circuit."""
+    url = "http://ars/ars/api/messages/child"
+    for _ in range(MAX_RETRIES + 1):
+        httpx_mock.add_response(url=url, status_code=502)
+    query_runner = QueryRunner(logger, retry_policy=RetryPolicy(base_delay=0))
+    res = query_runner.send_request("GET", url, timeout=30, idempotent=True)
+    assert res.status_code == 502
+    circuit_breaker = query_runner.get_circuit_breaker(url)
+    assert circuit_breaker.state == CircuitState.CLOSED
+    assert circuit_breaker.consecutive_failures == 1
+    query_runner.close()
+
+
+def test_submissions_only_retried_when_never_sent(httpx_mock: HTTPXMock):
+    """Query submissions aren't idempotent, so a 5xx is final."""
+    httpx_mock.add_exception(httpx.ConnectError("refused"), url="http://ara/query")
+    httpx_mock.add_response(url="http://ara/query", status_code=500)
+    query_runner = QueryRunner(logger, retry_policy=RetryPolicy(base_delay=0))
+    _, responses, _ = query_runner.run_query(1, {}, "http://ara", "infores:ara")
+    assert responses["ara"]["status_code"] == 500
+    assert query_runner.retry_policy.retries_used == 1
+
+
+def test_global_retry_budget():
+    """Once the run's retry budget is spent, failures are final."""
+    retry_policy = RetryPolicy(max_retries=5, global_budget=2, base_delay=0)
+    calls = []
+
+    def send():
+        calls.append(1)
+        return httpx.Response(503)
+
+    assert retry_policy.call("http://ars/poll", send).status_code == 503
+    assert len(calls) == 3
+    assert retry_policy.call("http://ars/poll", send).status_code == 503
+    assert len(calls) == 4
+    assert retry_policy.to_dict()["by_host"] == {"ars": 2}
+
+
+def test_token_bucket_bursts_then_throttles(mocker):
+    """The burst goes out immediately, then requests are spaced by the rate."""
+    mocker.patch("test_harness.runner.rate_limit.time.monotonic", return_value=0)
+    bucket = TokenBucket(rate=2, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+
+
+def test_rate_limits_follow_environment(httpx_mock: HTTPXMock):
+    """Hosts get the rate limits of the environment being tested."""
+    httpx_mock.add_response(url="http://ara/query", json={})
+    query_runner = QueryRunner(logger)
+    query_runner.set_environment("prod")
+    query_runner.run_query(1, {}, "http://ara", "infores:ara")
+    stats = query_runner.get_stats()["rate_limits"]["ara"]
+    assert stats["max_in_flight"] == RATE_LIMITS["prod"].max_in_flight
+    assert stats["requests"] == 1
+    assert stats["peak_in_flight"] == 1
+
+
+def test_ars_polls_have_their_own_rate_limit(mocker, httpx_mock: HTTPXMock):
+    """Status polls don't queue up behind a host's query rate limit."""
+    mocker.patch("test_harness.runner.ars_lifecycle.ARS_TRACE_DELAY", 0)
+    httpx_mock.add_response(
+        url="http://ars/ars/api/messages/parent?trace=y",
+        json={"status": "Done", "children": []},
+    )
+    httpx_mock.add_response(
+        url="http://ars/ars/api/retain/parent", json={"success": True}
+    )
+    query_runner = QueryRunner(logger)
+    query_runner.set_environment("prod")
+    query_runner.required_agents = set()
+    query_runner.get_ars_responses("parent", "http://ars")
+    stats = query_runner.get_stats()["rate_limits"]
+    assert stats["ars polls"]["rate"] == POLL_RATE_LIMITS["prod"].rate
+    assert stats["ars polls"]["requests"] == 1
+    # the retain isn't a poll
+    assert stats["ars"]["rate"] == RATE_LIMITS["prod"].rate
+    assert stats["ars"]["requests"] == 1
+
+
+def test_rate_limits_override_environment():
+    """Rate limits given on the cli apply to every environment."""
+    query_runner = QueryRunner(
+        logger,
+        rate_limit=parse_rate_limit("3,6,9"),
+        poll_rate_limit=parse_rate_limit("30,60,90"),
+    )
+    query_runner.set_environment("prod")
+    assert query_runner.get_rate_limiter("http://ara").rate_limit == RateLimit(3, 6, 9)
+    assert query_runner.get_rate_limiter(
+        "http://ara", poll=True
+    ).rate_limit == RateLimit(30, 60, 90)
+    try:
+        parse_rate_limit("3,6")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("an incomplete rate limit was accepted")
+
+
+def test_adaptive_concurrency_aimd(mocker):
+    """Healthy queries raise the limit by one, failures and spikes halve it."""
+    clock = mocker.patch("test_harness.runner.concurrency.time.time", return_value=0)
+    limiter = AdaptiveConcurrencyLimiter("ars", initial_limit=4, max_limit=8)
+
+    def query(latency, failed=False):
+        clock.return_value = 0
+        with limiter.acquire() as outcome:
+            clock.return_value = latency
+            if failed:
+                outcome.fail("timed out")
+
+    query(10)
+    query(10)
+    assert limiter.limit == 6
+    query(10, failed=True)
+    assert limiter.limit == 3
+    # a query taking far longer than the baseline is a sign of overload
+    query(60)
+    assert limiter.limit == 1.5
+    assert [event["limit"] for event in limiter.timeline] == [4, 5, 6, 3, 1]
+    assert limiter.in_flight == 0
+
+
+def test_made_up_statuses_dont_cut_concurrency(mocker, httpx_mock: HTTPXMock):
+    """Agents not waited for and fast-failed queries don't back the limiter off."""
+    mocker.patch("test_harness.runner.ars_lifecycle.ARS_TRACE_DELAY", 0)
+    httpx_mock.add_response(url="http://ars/ars/api/submit", json={"pk": "parent"})
+    httpx_mock.add_response(
+        url="http://ars/ars/api/messages/parent?trace=y",
+        json={"status": "Running", "children": []},
+    )
+    httpx_mock.add_response(
+        url="http://ars/ars/api/retain/parent", json={"success": True}
+    )
+    query_runner = QueryRunner(logger)
+    query_runner.required_agents = {"aragorn"}
+    _, responses, _ = query_runner.run_adaptive_query(
+        1, {}, "http://ars", "infores:ars"
+    )
+    assert responses["ars"]["status_code"] == NOT_WAITED_STATUS
+    limiter = query_runner.get_concurrency_limiter("http://ars")
+    assert limiter.limit > limiter.timeline[0]["limit"]
+
+    circuit_breaker = query_runner.get_circuit_breaker("http://ara/query")
+    circuit_breaker.state = CircuitState.OPEN
+    circuit_breaker.opened_at = float("inf")
+    _, responses, _ = query_runner.run_adaptive_query(
+        1, {}, "http://ara", "infores:ara"
+    )
+    assert responses["ara"]["status_code"] == CIRCUIT_OPEN_STATUS
+    limiter = query_runner.get_concurrency_limiter("http://ara")
+    assert limiter.limit > limiter.timeline[0]["limit"]
+    query_runner.close()
+
+
+def test_memory_budget_holds_requests_over_budget():
+    """Requests wait while the expected responses wouldn't fit in the budget."""
+    budget = MemoryBudget(limit=100)
+    # a response bigger than the budget still gets through on its own
+    with budget.admit("merged") as reservation:
+        reservation.charge(150)
+        assert budget.try_admit("merged") is None
+    assert budget.estimates == {"merged": 150}
+    budget.estimates["merged"] = 60
+    with budget.admit("merged"):
+        # small responses still fit next to a merged message
+        small = budget.try_admit("trace")
+        assert small is not None
+        assert budget.try_admit("merged") is None
+        budget._release(small)
+    assert budget.in_use == 0
+    assert budget.to_dict()["peak"] == 150
+
+    async def admit_while_held():
+        with budget.admit("merged"):
+            task = asyncio.create_task(held())
+            await asyncio.sleep(0.05)
+            assert not task.done()
+        await task
+
+    async def held():
+        async with budget.admit_async("merged"):
+            pass
+
+    asyncio.run(admit_while_held())
+    assert budget.held == 1
+
+
+def test_async_waiters_woken_by_threads():
+    """A task waiting for a slot held by a worker thread wakes once it's freed."""
+    rate_limiter = HostRateLimiter(
+        "ars", RateLimit(rate=1e6, burst=100, max_in_flight=1)
+    )
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with rate_limiter.acquire():
+            held.set()
+            release.wait()
+
+    async def wait_for_slot():
+        async with rate_limiter.acquire_async():
+            return rate_limiter.in_flight
+
+    async def main():
+        task = asyncio.create_task(wait_for_slot())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        release.set()
+        return await asyncio.wait_for(task, timeout=1)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    assert asyncio.run(main()) == 1
+    thread.join()
+    assert rate_limiter.in_flight == 0
+
+
+def test_run_queries_uses_limiters_and_pools(mocker, httpx_mock: HTTPXMock):
+    """Every submission goes through the host's adaptive limiter."""
+    httpx_mock.add_response(
+        url="https://nodenorm-es.ci.transltr.io/get_normalized_nodes",
+        json={"MONDO:0010794": None, "DRUGBANK:DB00313": None, "MESH:D001463": None},
+    )
+    httpx_mock.add_response(url="http://ara/query", json={"message": {}})
+    query_runner = QueryRunner(logger)
+    query_runner.registry = {
+        "staging": {
+            "ars": [
+                {
+                    "_id": "ara",
+                    "title": "ARA",
+                    "infores": "infores:ara",
+                    "url": "http://ara",
+                }
+            ]
+        }
+    }
+    test_case = example_test_cases["TestCase_1"].model_copy(deep=True)
+    queries, _ = query_runner.run_queries(test_case)
+    assert len(queries) == 1
+    for query in queries.values():
+        assert query["responses"]["ara"]["status_code"] == 200
+    stats = query_runner.get_stats()
+    assert stats["concurrency"]["ara"]["limit"] == 3
+    # NodeNorm and the queries ran in separate bulkhead pools
+    assert stats["pools"]["utilities"]["tasks"] == 1
+    assert stats["pools"]["ars"]["tasks"] == 1
+    assert stats["pools"]["ara"]["tasks"] == 0
+    query_runner.close()
+
+
+def test_run_queries_waits_for_host_limit_before_taking_workers(
+    mocker, httpx_mock: HTTPXMock
+):
+    """Queries a host has no room for don't sit on pool workers."""
+    httpx_mock.add_response(
+        url="https://nodenorm-es.ci.transltr.io/get_normalized_nodes",
+        json={"MONDO:0010794": None, "DRUGBANK:DB00313": None, "MESH:D001463": None},
+    )
+    query_runner = QueryRunner(logger)
+    query_runner.registry = {
+        "staging": {
+            "ars": [
+                {
+                    "_id": "ara",
+                    "title": "ARA",
+                    "infores": "infores:ara",
+                    "url": "http://ara",
+                }
+            ]
+        }
+    }
+    query_runner.concurrency_limiters["ara"] = AdaptiveConcurrencyLimiter(
+        "ara", initial_limit=1, max_limit=1
+    )
+    mocker.patch.object(
+        query_runner,
+        "build_queries",
+        return_value={
+            query_hash: {"query": {}, "responses": {}, "pks": {}}
+            for query_hash in range(5)
+        },
+    )
+
+    def run_query(query_hash, message, base_url, infores, component):
+        time.sleep(0.01)
+        return query_hash, {"ara": {"status_code": 200}}, {}
+
+    mocker.patch.object(query_runner, "run_query", side_effect=run_query)
+    test_case = example_test_cases["TestCase_1"].model_copy(deep=True)
+    queries, _ = query_runner.run_queries(test_case)
+    assert all(query["responses"] for query in queries.values())
+    pool = query_runner.get_stats()["pools"]["ars"]
+    assert pool["tasks"] == 5
+    assert pool["peak_busy"] == 1
+    query_runner.close()
+
+
+def test_components_map_to_pools():
+    """Registry components each get their own pool, unknown ones share one."""
+    assert get_pool_name("ars") == "ars"
+    assert get_pool_name("kp") == "kp"
+    assert get_pool_name("utility") == "utilities"
+    assert get_pool_name("aragorn") == "ara"
+
+
+def test_async_runner_polls_ars_children(mocker, httpx_mock: HTTPXMock):
+    """The asyncio engine gives the same responses and pks as the threaded one."""
+    mocker.patch("test_harness.runner.ars_lifecycle.ARS_TRACE_DELAY", 0)
+    httpx_mock.add_response(
+        url="https://nodenorm-es.ci.transltr.io/get_normalized_nodes",
+        json={"MONDO:0010794": None, "DRUGBANK:DB00313": None, "MESH:D001463": None},
+    )
+    httpx_mock.add_response(url="http://ars/ars/api/submit", json={"pk": "parent"})
+    httpx_mock.add_response(
+        url="http://ars/ars/api/messages/parent?trace=y",
+        json={
+            "status": "Done",
+            "merged_version": "merged",
+            "children": [
+                {"message": "child-a", "actor": {"inforesid": "infores:ara-a"}},
+                {"message": "child-b", "actor": {"inforesid": "infores:ara-b"}},
+            ],
+        },
+    )
+    for pk in ("child-a", "child-b", "merged"):
+        httpx_mock.add_response(
+            url=f"http://ars/ars/api/messages/{pk}",
+            json={"fields": {"status": "Done", "code": 200, "data": {"pk": pk}}},
+        )
+    httpx_mock.add_response(
+        url="http://ars/ars/api/retain/parent", json={"success": True}
+    )
+    query_runner = AsyncQueryRunner(logger)
+    query_runner.registry = {
+        "staging": {
+            "ars": [
+                {
+                    "_id": "ars",
+                    "title": "ARS",
+                    "infores": "infores:ars",
+                    "url": "http://ars",
+                }
+            ]
+        }
+    }
+    test_case = example_test_cases["TestCase_1"].model_copy(deep=True)
+    queries, _ = query_runner.run_queries(test_case)
+    query = list(queries.values())[0]
+    assert query["pks"] == {
+        "parent_pk": "parent",
+        "ara-a": "child-a",
+        "ara-b": "child-b",
+        "ars": "merged",
+    }
+    assert query["responses"]["ara-b"]["response"] == {"pk": "child-b"}
+    assert query["responses"]["ara-b"]["status_code"] == 200
+    assert query["responses"]["ara-b"]["bytes"] > 0
+    assert query["responses"]["ars"]["response"] == {"pk": "merged"}
+    assert query_runner.get_stats()["pools"]["ars"]["tasks"] == 1
+    query_runner.close()
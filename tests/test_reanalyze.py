@@ -0,0 +1,105 @@
+"""Test re-analyzing the responses of an earlier run."""
+
+from pytest_httpx import HTTPXMock
+
+from test_harness.reanalyze import read_previous_run, reanalyze
+from test_harness.result_collector import ResultCollector
+
+from .helpers.example_tests import example_test_cases
+from .helpers.logger import setup_logger
+
+logger = setup_logger()
+
+REGISTRY = {
+    "staging": {
+        "ars": [
+            {
+                "_id": "ars",
+                "title": "ARS",
+                "infores": "infores:ars",
+                "url": "http://ars",
+            }
+        ]
+    }
+}
+
+
+def _message(pk, output, ranked=False):
+    result = {
+        "node_bindings": {
+            "sn": [{"id": "MONDO:0010794"}],
+            "on": [{"id": output}],
+        },
+        "analyses": [{"score": 0.5}],
+    }
+    if ranked:
+        result.update(sugeno=0.5, rank=1)
+    data = {"pk": pk, "message": {"results": [result]}}
+    return {"fields": {"status": "Done", "code": 200, "data": data}}
+
+
+def test_reanalyze_previous_run(mocker, tmp_path, httpx_mock: HTTPXMock):
+    """Messages are fetched by pk, not resubmitted, and changed verdicts listed."""
+    mocker.patch(
+        "test_harness.runner.query_runner.retrieve_registry_from_smartapi",
+        return_value=REGISTRY,
+    )
+    previous_run = tmp_path / "previous.csv"
+    previous_run.write_text(
+        "name,url,pk,TestCase,TestAsset,ars,shepherd-aragorn\n"
+        '"Valproic_Acid",http://ir/1,https://arax.ci.transltr.io/?r=parent,'
+        "TestCase_1,Asset_3,PASSED,PASSED\n"
+        '"Barbiturates",http://ir/2,,TestCase_1,Asset_4,SKIPPED,SKIPPED\n'
+    )
+    previous = read_previous_run(str(previous_run))
+    assert [(result.test_asset, result.parent_pk) for result in previous] == [
+        ("Asset_3", "parent")
+    ]
+
+    httpx_mock.add_response(
+        url="https://nodenorm-es.ci.transltr.io/get_normalized_nodes",
+        json={"MONDO:0010794": None, "DRUGBANK:DB00313": None, "MESH:D001463": None},
+    )
+    httpx_mock.add_response(
+        url="http://ars/ars/api/messages/parent?trace=y",
+        json={
+            "status": "Done",
+            "merged_version": "merged",
+            "children": [
+                {"message": "child", "actor": {"inforesid": "infores:shepherd-aragorn"}}
+            ],
+        },
+    )
+    # the NeverShow output is in the aragorn results now
+    httpx_mock.add_response(
+        url="http://ars/ars/api/messages/child",
+        json=_message("child", "DRUGBANK:DB00313"),
+    )
+    httpx_mock.add_response(
+        url="http://ars/ars/api/messages/merged",
+        json=_message("merged", "CHEBI:18295", ranked=True),
+    )
+    collector = ResultCollector("ci", logger)
+    changes = reanalyze(
+        example_test_cases,
+        previous,
+        collector,
+        logger,
+        {"trapi_version": "1.6.0"},
+    )
+    assert changes == [
+        {
+            "TestCase": "TestCase_1",
+            "TestAsset": "Asset_3",
+            "agent": "shepherd-aragorn",
+            "before": "PASSED",
+            "after": "FAILED",
+        }
+    ]
+    assert collector.acceptance_report["PASSED"] == 1
+    assert "?r=parent" in collector.acceptance_csv
+    # nothing was submitted or retained again
+    assert all(
+        request.method == "GET" or "nodenorm" in str(request.url)
+        for request in httpx_mock.get_requests()
+    )
@@ -21,7 +21,15 @@ from translator_testing_model.datamodel.pydanticmodel import (
 
 from test_harness.result_collector import ResultCollector
 from test_harness.run import run_tests
-from test_harness.utils import AgentReport, AgentStatus, TestReport
+from test_harness.utils import (
+    ActualOutput,
+    AgentReport,
+    AgentStatus,
+    PathfinderReport,
+    TestReport,
+    ValidationSummary,
+    summarize_response,
+)
 
 from .helpers.example_tests import example_test_cases
 from .helpers.logger import setup_logger
@@ -328,3 +336,160 @@ def test_skipped_test_case_marks_all_assets_and_agents_skipped(mocker):
     for label_set in reporter.labels:
         assert {label["key"] for label in label_set} == set(collector.agents)
         assert all(label["value"] == AgentStatus.SKIPPED.value for label in label_set)
+
+
+def test_query_timings_are_aggregated_per_agent():
+    """ARS query milestones end up as per-agent latency distributions."""
+    collector = ResultCollector("dev", logger)
+    for slowest in (30, 40, 300):
+        collector.collect_query_timings(
+            {
+                "submitted_at": "2024-01-01T00:00:00+00:00",
+                "first_trace": 10,
+                "agents": {"shepherd-arax": 20.5, "shepherd-bte": slowest},
+                "merged_available": slowest + 5,
+                "merged_fetched": slowest + 6,
+            }
+        )
+    latency = collector.runner_stats["latency"]
+    assert latency["time_to_answer"]["shepherd-bte"] == {
+        "count": 3,
+        "p50": 40,
+        "p95": 40,
+        "max": 300,
+    }
+    assert latency["time_to_answer"]["ars"]["max"] == 306
+    assert latency["ars_merge_overhead"]["p50"] == 5
+    assert "ARS Merge Overhead" in collector.dump_result_summary()
+
+
+def test_agent_leaderboard_ranks_slowest_first():
+    """Every reported agent gets a time / payload row, slowest p95 first."""
+    collector = ResultCollector("dev", logger)
+    collector.collect_query_timings(
+        {
+            "submitted_at": "2024-01-01T00:00:00+00:00",
+            "first_trace": 10,
+            "agents": {"shepherd-arax": 20, "shepherd-bte": 200, "other-ara": 900},
+            "merged_available": 205,
+            "merged_fetched": 206,
+        }
+    )
+    result = {"node_bindings": {}, "analyses": []}
+    collector.collect_query_payloads(
+        {
+            "shepherd-bte": {
+                "response": {"message": {"results": [result] * 3}},
+                "status_code": 200,
+                "bytes": 4096,
+            },
+            "shepherd-arax": {
+                "response": {"message": {"results": []}},
+                "status_code": 200,
+                "bytes": None,
+            },
+            "shepherd-aragorn": {"response": {}, "status_code": 598},
+        }
+    )
+    # a status that isn't a status code is skipped, not compared
+    collector.collect_query_payloads(
+        {"shepherd-aragorn": {"response": {}, "status_code": "Running"}}
+    )
+    leaderboard = collector.acceptance_stats["leaderboard"]
+    # agents the collector doesn't report on are left out
+    assert [row["agent"] for row in leaderboard] == [
+        "ars",
+        "shepherd-bte",
+        "shepherd-arax",
+    ]
+    assert leaderboard[1]["p95_kib"] == 4
+    assert leaderboard[1]["p95_results"] == 3
+    assert "1. ars: 206s/206s/206s" in collector.dump_result_summary()
+
+
+def test_analyzed_responses_are_summarized():
+    """Only the compact summary of a response is kept once it's analyzed."""
+    response = {
+        "response": {"message": {"results": [{}, {}]}},
+        "status_code": 200,
+        "bytes": 2048,
+        "result_count": 2,
+    }
+    report = AgentReport(
+        status=AgentStatus.PASSED,
+        message=None,
+        actual_output=ActualOutput(ara_score=0.0, ara_rank=2),
+    )
+    assert summarize_response(response, report) == {
+        "status": "PASSED",
+        "status_code": 200,
+        "rank": 2,
+        "score": 0.0,
+        "result_count": 2,
+        "bytes": 2048,
+    }
+
+
+def test_reports_serialize_like_asdict():
+    """The compact reports upload the same JSON the dataclass dicts did."""
+    report = TestReport(
+        pks={"parent_pk": "123"},
+        result={
+            "ars": AgentReport(
+                AgentStatus.PASSED, None, ActualOutput(ars_score=0.9, ars_rank=1)
+            ),
+            "ara": PathfinderReport(
+                AgentStatus.FAILED, None, None, expected_nodes_found="GENE:1"
+            ),
+        },
+        test_details=None,
+    )
+    assert not hasattr(report.result["ars"], "__dict__")
+    assert report.to_dict() == {
+        "pks": {"parent_pk": "123"},
+        "result": {
+            "ars": {
+                "status": "PASSED",
+                "message": None,
+                "actual_output": {
+                    "ars_score": 0.9,
+                    "ars_rank": 1,
+                    "ara_score": None,
+                    "ara_rank": None,
+                },
+            },
+            "ara": {
+                "status": "FAILED",
+                "message": None,
+                "actual_output": None,
+                "expected_nodes_found": "GENE:1",
+            },
+        },
+        "test_details": None,
+        "timings": None,
+        "validation": None,
+    }
+
+
+def test_validation_is_summarized_per_agent():
+    """Validation outcomes are counted by agent for the Slack summary."""
+    collector = ResultCollector("dev", logger)
+    for errors in (0, 2):
+        report = TestReport(
+            pks={},
+            result={},
+            test_details=None,
+            validation={
+                "ars": ValidationSummary("1.5.0", errors=errors),
+                "shepherd-arax": ValidationSummary("1.5.0", failure="boom"),
+            },
+        )
+        collector.collect_acceptance_result(_Case(), _Asset(), report, "pk", "url")
+    assert report.to_dict()["validation"]["ars"]["status"] == "errors"
+    assert collector.runner_stats["validation"] == {
+        "ars": {"valid": 1, "errors": 1},
+        "shepherd-arax": {"failed": 2},
+    }
+    summary = collector.dump_result_summary()
+    assert "> - ars: 1 valid, 1 errors" in summary
+    assert "> - shepherd-arax: 2 failed" in summary
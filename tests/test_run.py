@@ -17,6 +17,19 @@ from .helpers.mock_responses import kp_response
 
 logger = setup_logger()
 
+NORMALIZED_NODES = {
+    "MONDO:0010794": None,
+    "DRUGBANK:DB00313": None,
+    "MESH:D001463": None,
+    "CHEBI:18295": None,
+    "CHEBI:31690": None,
+    "CL:0000097": None,
+    "MONDO:0004979": None,
+    "NCBIGene:3815": None,
+    "NCBIGene:4254": None,
+    "PR:000049994": None,
+}
+
 
 def test_run_tests(mocker, httpx_mock: HTTPXMock):
     """Test the run_tests function."""
@@ -31,18 +44,7 @@ def test_run_tests(mocker, httpx_mock: HTTPXMock):
     )
     httpx_mock.add_response(
         url="https://nodenorm-es.ci.transltr.io/get_normalized_nodes",
-        json={
-            "MONDO:0010794": None,
-            "DRUGBANK:DB00313": None,
-            "MESH:D001463": None,
-            "CHEBI:18295": None,
-            "CHEBI:31690": None,
-            "CL:0000097": None,
-            "MONDO:0004979": None,
-            "NCBIGene:3815": None,
-            "NCBIGene:4254": None,
-            "PR:000049994": None,
-        },
+        json=NORMALIZED_NODES,
     )
     run_tests(
         tests=example_test_cases,
@@ -56,3 +58,97 @@ def test_run_tests(mocker, httpx_mock: HTTPXMock):
             "trapi_version": "1.6.0",
         },
     )
+
+
+def test_unchanged_responses_reuse_verdicts(mocker, httpx_mock: HTTPXMock, tmp_path):
+    """A second run on the same responses takes the verdicts of the first."""
+    mocker.patch(
+        "test_harness.run.QueryRunner",
+        side_effect=lambda *args, **kwargs: MockQueryRunner(logger),
+    )
+    # tqdm's monitor thread can't be joined at exit once gevent has patched it
+    mocker.patch("tqdm.tqdm.monitor_interval", 0)
+    httpx_mock.add_response(url="http://tester/query", json=kp_response)
+    httpx_mock.add_response(
+        url="https://nodenorm-es.ci.transltr.io/get_normalized_nodes",
+        json=NORMALIZED_NODES,
+    )
+    args = {
+        "suite": "testing",
+        "trapi_version": "1.6.0",
+        "keep_responses": True,
+        "verdict_cache": str(tmp_path / "verdicts.json"),
+    }
+    stats = []
+    for _ in range(2):
+        collector = MockResultCollector("dev", logger)
+        run_tests(
+            tests=example_test_cases,
+            reporter=MockReporter(base_url="http://test"),
+            collector=collector,
+            logger=logger,
+            args=args,
+        )
+        stats.append(collector.runner_stats["verdicts"])
+    assert stats[0]["reused"] == 0
+    assert stats[0]["cached"] > 0
+    assert stats[1]["reused"] == stats[0]["cached"]
+
+
+def test_failed_run_still_cleans_up(mocker, tmp_path):
+    """The runner is closed and the verdicts saved even if the run blows up."""
+    mocker.patch("tqdm.tqdm.monitor_interval", 0)
+    query_runner = MockQueryRunner(logger)
+    mocker.patch.object(
+        query_runner, "run_queries", side_effect=RuntimeError("lost the ARS")
+    )
+    verdict_cache = tmp_path / "verdicts.json"
+    with pytest.raises(RuntimeError):
+        run_tests(
+            tests=example_test_cases,
+            reporter=MockReporter(base_url="http://test"),
+            collector=MockResultCollector("dev", logger),
+            logger=logger,
+            args={
+                "suite": "testing",
+                "trapi_version": "1.6.0",
+                "verdict_cache": str(verdict_cache),
+            },
+            query_runner=query_runner,
+        )
+    assert query_runner.closed
+    assert verdict_cache.exists()
+
+
+def test_responses_released_when_test_creation_fails(mocker, httpx_mock: HTTPXMock):
+    """An asset whose test couldn't be created still releases its query's responses."""
+    mocker.patch("tqdm.tqdm.monitor_interval", 0)
+    httpx_mock.add_response(url="http://tester/query", json=kp_response)
+    httpx_mock.add_response(
+        url="https://nodenorm-es.ci.transltr.io/get_normalized_nodes",
+        json=NORMALIZED_NODES,
+    )
+    query_runner = MockQueryRunner(logger)
+    query_runner.retrieve_registry("1.6.0")
+    ran = []
+
+    def run_queries(test):
+        queries, normalized_curies = MockQueryRunner.run_queries(query_runner, test)
+        ran.append(queries)
+        return queries, normalized_curies
+
+    mocker.patch.object(query_runner, "run_queries", side_effect=run_queries)
+    reporter = MockReporter(base_url="http://test")
+    mocker.patch.object(reporter, "create_test", side_effect=RuntimeError("down"))
+    run_tests(
+        tests={"TestCase_1": example_test_cases["TestCase_1"]},
+        reporter=reporter,
+        collector=MockResultCollector("dev", logger),
+        logger=logger,
+        args={"suite": "testing", "trapi_version": "1.6.0"},
+        query_runner=query_runner,
+    )
+    for query in ran[0].values():
+        for response in query["responses"].values():
+            assert "response" not in response
+            assert response["status"] is None
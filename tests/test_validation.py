@@ -0,0 +1,78 @@
+"""Test the TRAPI validation stage."""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from test_harness.runner.response_store import content_digest
+from test_harness.validation import ValidationTask, validate_response
+
+RESPONSE = {"message": {"query_graph": {"nodes": {}, "edges": {}}, "results": []}}
+# reasoner-validator stand-in, flagging a response without a message as critical
+VALIDATOR_STUB = str(Path(__file__).parent / "helpers" / "validator_stub")
+
+
+@pytest.fixture
+def validator_stub(mocker, monkeypatch):
+    """Validate with the stand-in instead of reasoner-validator."""
+    mocker.patch.dict(sys.modules)
+    for module in list(sys.modules):
+        if module.split(".")[0] == "reasoner_validator":
+            del sys.modules[module]
+    monkeypatch.syspath_prepend(VALIDATOR_STUB)
+
+
+def test_valid_response_is_valid(validator_stub):
+    """A compliant response is summarized as valid, without any codes."""
+    summary = validate_response(ValidationTask("1.5.0", RESPONSE))
+    assert summary.status == "valid"
+    assert summary.codes == []
+    assert summary.failure is None
+
+
+def test_invalid_response_is_critical(validator_stub):
+    """A response without a message is summarized by its most severe code."""
+    summary = validate_response(ValidationTask("1.5.0", {"pk": "123"}))
+    assert summary.status == "critical"
+    assert summary.critical == 1
+    assert summary.codes == ["critical.trapi.response.unexpected"]
+
+
+def test_validations_are_cached_by_digest(tmp_path):
+    """The same response is only validated once, however many assets share it."""
+    content = json.dumps(RESPONSE).encode()
+    # in a fresh interpreter, since other tests monkey-patch this one with
+    # gevent after its selectors were imported
+    script = f"""
+from test_harness.validation import ValidationPool
+
+if __name__ == "__main__":
+    pool = ValidationPool(1, "1.5.0")
+    entry = {{"response": {RESPONSE!r}, "digest": {content_digest(content)!r}}}
+    first = pool.submit(entry)
+    again = pool.submit(dict(entry))
+    undigested = pool.submit({{"response": {RESPONSE!r}}})
+    summary = first.result(timeout=120)
+    undigested.result(timeout=120)
+    pool.close()
+    print(first is again, undigested is not first, pool.tasks, pool.cache_hits)
+    print(summary.trapi_version, summary.status)
+"""
+    # the spawned workers pick the stand-in validator up from the environment
+    python_path = os.pathsep.join(
+        filter(None, [VALIDATOR_STUB, os.environ.get("PYTHONPATH")])
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=300,
+        env={**os.environ, "PYTHONPATH": python_path},
+    )
+    lines = result.stdout.splitlines()
+    assert lines[0].split() == ["True", "True", "2", "1"], result.stderr
+    assert lines[1].split() == ["1.5.0", "valid"]
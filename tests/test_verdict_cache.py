@@ -0,0 +1,32 @@
+"""Test the reuse of verdicts across runs."""
+
+from test_harness.utils import ActualOutput, AgentReport, AgentStatus
+from test_harness.verdict_cache import VerdictCache
+
+
+def test_verdicts_are_reused_for_unchanged_responses(tmp_path):
+    """A verdict is only reused for the same results and expected output."""
+    path = str(tmp_path / "verdicts.json")
+    cache = VerdictCache(path)
+    key = VerdictCache.key("TestCase_1", "Asset_1", "ara")
+    report = AgentReport(AgentStatus.PASSED, None, ActualOutput(ara_rank=1))
+    cache.put(key, "abc", "DRUG:1", "TopAnswer", report)
+    failed = AgentReport(AgentStatus.FAILED, "Test Error", None)
+    cache.put(VerdictCache.key("TestCase_1", "Asset_1", "arax"), "abc", "", "", failed)
+    cache.save()
+
+    cache = VerdictCache(path)
+    assert cache.get(key, "abc", "DRUG:1", "TopAnswer") == report
+    assert cache.get(key, "def", "DRUG:1", "TopAnswer") is None
+    assert cache.get(key, "abc", "DRUG:2", "TopAnswer") is None
+    assert cache.get(key, "abc", "DRUG:1", "NeverShow") is None
+    assert cache.get(key, None, "DRUG:1", "TopAnswer") is None
+    # errors are analyzed again
+    assert cache.to_dict() == {"reused": 1, "cached": 1}
+
+
+def test_unreadable_cache_starts_empty(tmp_path):
+    """A corrupt cache file only means everything is analyzed again."""
+    path = tmp_path / "verdicts.json"
+    path.write_text("{not json")
+    assert VerdictCache(str(path)).verdicts == {}